@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+媒体组（相册）聚合器 - 把同一 grouped_id 的多条消息合并为一次处理
+"""
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, List, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingAlbum:
+    __slots__ = ('messages', 'first_seen', 'timer')
+
+    def __init__(self, first_seen: float):
+        self.messages: List[Any] = []
+        self.first_seen = first_seen
+        self.timer = None
+
+
+class AlbumAggregator:
+    """
+    相册聚合器（运行在客户端事件循环中）
+
+    Telegram 的相册以多条共享 grouped_id 的 NewMessage 事件到达。
+    聚合器按 (聊天ID, grouped_id) 缓冲这些消息：每收到一条就把刷新时间
+    顺延一个窗口（最长不超过 3 个窗口），凑满 10 条（相册上限）时立即刷新，
+    刷新后把整组消息交给回调统一处理。
+    """
+
+    # Telegram 单个相册最多 10 个媒体
+    MAX_ALBUM_SIZE = 10
+
+    def __init__(self, on_album: Callable[[int, List[Any]], Awaitable[None]], window: float = None):
+        self.on_album = on_album
+        self.window = max(0.05, window or Config.ALBUM_WAIT_WINDOW)
+        self.max_hold = self.window * 3
+
+        self._pending: Dict[Tuple[int, int], _PendingAlbum] = {}
+        self._tasks = set()
+
+        # 统计信息
+        self.albums = 0
+        self.messages = 0
+
+    def add(self, chat_id: int, message):
+        """缓冲一条属于相册的消息"""
+        loop = asyncio.get_running_loop()
+        key = (chat_id, message.grouped_id)
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = _PendingAlbum(loop.time())
+            self._pending[key] = pending
+
+        pending.messages.append(message)
+        if pending.timer:
+            pending.timer.cancel()
+
+        if len(pending.messages) >= self.MAX_ALBUM_SIZE:
+            self._flush(key)
+            return
+
+        # 防抖：顺延刷新时间，但不超过最长等待
+        delay = min(self.window, pending.first_seen + self.max_hold - loop.time())
+        pending.timer = loop.call_later(max(0.0, delay), self._flush, key)
+
+    def _flush(self, key: Tuple[int, int]):
+        pending = self._pending.pop(key, None)
+        if not pending or not pending.messages:
+            return
+        if pending.timer:
+            pending.timer.cancel()
+
+        messages = sorted(pending.messages, key=lambda m: m.id)
+        self.albums += 1
+        self.messages += len(messages)
+
+        task = asyncio.get_running_loop().create_task(self._dispatch(key[0], messages))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, chat_id: int, messages: List[Any]):
+        try:
+            await self.on_album(chat_id, messages)
+        except Exception as e:
+            logger.error(f"相册处理失败: {e}")
+
+    async def flush_all(self):
+        """立即刷新所有缓冲中的相册，并等待处理完成"""
+        for key in list(self._pending.keys()):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def discard_all(self) -> int:
+        """丢弃所有缓冲中的相册（连接已断开，无法再发送），等待处理中的相册结束，返回丢弃的相册数"""
+        pending, self._pending = self._pending, {}
+        for album in pending.values():
+            if album.timer:
+                album.timer.cancel()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        return len(pending)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取聚合统计"""
+        return {
+            "pending_albums": len(self._pending),
+            "albums": self.albums,
+            "messages": self.messages,
+            # 每个相册合并为一次发送，节省的 API 调用数
+            "api_calls_saved": self.messages - self.albums,
+            "window": self.window
+        }
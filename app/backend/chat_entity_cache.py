@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+聊天实体缓存 - 持久化聊天标题、用户名、类型和 access hash，规则列表和日志直接读取，缺失的按批并发解析
+"""
+import asyncio
+import logging
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from telethon import utils
+from telethon.tl import types
+
+from config import Config
+from database import db_manager
+from models import ChatEntity, get_local_now
+
+logger = logging.getLogger(__name__)
+
+# 占位名称前缀（无法获取真实名称时使用 "聊天 <ID>"）
+PLACEHOLDER_PREFIX = '聊天 '
+# 单次写入的最大行数
+SAVE_CHUNK_SIZE = 500
+
+
+def is_placeholder(name: Optional[str]) -> bool:
+    """名称为空或为占位格式"""
+    return not name or not name.strip() or name.startswith(PLACEHOLDER_PREFIX)
+
+
+def chat_type_of(entity) -> str:
+    """与会话列表一致的聊天类型：普通群和超级群为 group，广播频道为 channel"""
+    if isinstance(entity, types.Chat):
+        return "group"
+    if isinstance(entity, types.Channel):
+        return "group" if entity.megagroup else "channel"
+    return "user"
+
+
+def _to_int(chat_id) -> Optional[int]:
+    try:
+        return int(chat_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class ChatEntityCache:
+    """
+    进程级聊天实体缓存
+
+    - 数据保存在 chat_entities 表（每个客户端一行，access hash 只对获取它的账号有效），
+      启动时整表载入内存；标题查询只读内存，不产生网络请求
+    - 会话列表加载、收到未知会话的消息、会话改名时写入
+    - resolve_titles() 解析缺失或超过 CHAT_ENTITY_TTL_HOURS 的条目：在客户端事件循环中
+      并发 get_entity（同时最多 CHAT_RESOLVE_CONCURRENCY 个），有已保存的 access hash 时直接构造 InputPeer；
+      解析失败的过期条目仍返回旧标题
+    - 客户端工作进程中写入的条目通过保存监听转发给主进程（remember_rows），主进程内存缓存保持最新
+    """
+
+    def __init__(self):
+        # 聊天ID -> (标题, 用户名, 类型, 更新时间)，多个客户端都有时取最近更新的
+        self._entries: Dict[int, Tuple[str, Optional[str], str, datetime]] = {}
+        # (客户端ID, 聊天ID) -> access hash
+        self._hashes: Dict[Tuple[str, int], int] = {}
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._lock = threading.Lock()
+        self._save_listeners: List[Callable[[str, List[Dict[str, Any]]], None]] = []
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.resolved = 0
+        self.failed = 0
+        self.writes = 0
+
+    async def warm_up(self) -> bool:
+        """从 chat_entities 表载入内存"""
+        try:
+            async with db_manager.async_session() as db:
+                result = await db.execute(select(
+                    ChatEntity.client_id, ChatEntity.chat_id, ChatEntity.title, ChatEntity.username,
+                    ChatEntity.chat_type, ChatEntity.access_hash, ChatEntity.updated_at
+                ))
+                rows = result.fetchall()
+
+            with self._lock:
+                for client_id, chat_id, title, username, chat_type, access_hash, updated_at in rows:
+                    self._remember(client_id, chat_id, title, username, chat_type, access_hash,
+                                   updated_at or datetime.min)
+                self._loaded = True
+
+            logger.info(f"✅ 聊天实体缓存已加载: {len(self._entries)} 个聊天")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 加载聊天实体缓存失败: {e}")
+            return False
+
+    async def ensure_loaded(self):
+        """首次使用时载入（只载入一次）"""
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self._loaded:
+                await self.warm_up()
+
+    def _remember(self, client_id: str, chat_id: int, title: Optional[str], username: Optional[str],
+                  chat_type: Optional[str], access_hash: Optional[int], updated_at: datetime):
+        """写入内存（调用方持有锁）"""
+        current = self._entries.get(chat_id)
+        if title and (current is None or updated_at >= current[3]):
+            self._entries[chat_id] = (title, username, chat_type or "user", updated_at)
+        if access_hash is not None:
+            self._hashes[(client_id, chat_id)] = access_hash
+
+    # ---------- 写入 ----------
+
+    def add_save_listener(self, callback: Callable[[str, List[Dict[str, Any]]], None]):
+        """添加保存监听：callback(客户端ID, 已保存的行)"""
+        self._save_listeners.append(callback)
+
+    def remember_rows(self, client_id: str, rows: List[Dict[str, Any]]):
+        """只写入内存（其他进程已保存到数据库的行）"""
+        with self._lock:
+            for row in rows:
+                self._remember(client_id, row["chat_id"], row["title"], row["username"],
+                               row["chat_type"], row["access_hash"], row["updated_at"])
+
+    async def save(self, client_id: str, entities: Iterable[Tuple[int, Any]]):
+        """
+        保存一组 Telethon 实体（任意事件循环中调用）
+
+        Args:
+            entities: [(带标记的聊天ID, 实体), ...]
+        """
+        now = get_local_now().replace(tzinfo=None)
+        rows = []
+        with self._lock:
+            for chat_id, entity in entities:
+                if entity is None:
+                    continue
+                title = utils.get_display_name(entity) or None
+                if not title:
+                    continue
+                row = {
+                    "client_id": client_id,
+                    "chat_id": int(chat_id),
+                    "title": title[:200],
+                    "username": getattr(entity, 'username', None),
+                    "chat_type": chat_type_of(entity),
+                    "access_hash": getattr(entity, 'access_hash', None),
+                    "updated_at": now
+                }
+                self._remember(client_id, row["chat_id"], row["title"], row["username"],
+                               row["chat_type"], row["access_hash"], now)
+                rows.append(row)
+        if not rows:
+            return
+        for callback in self._save_listeners:
+            try:
+                callback(client_id, rows)
+            except Exception as e:
+                logger.error(f"❌ 聊天实体保存通知失败: {e}")
+
+        try:
+            stmt = sqlite_insert(ChatEntity)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['client_id', 'chat_id'],
+                set_={
+                    "title": stmt.excluded.title,
+                    "username": stmt.excluded.username,
+                    "chat_type": stmt.excluded.chat_type,
+                    "access_hash": stmt.excluded.access_hash,
+                    "updated_at": stmt.excluded.updated_at,
+                }
+            )
+            async with db_manager.async_session() as db:
+                for start in range(0, len(rows), SAVE_CHUNK_SIZE):
+                    await db.execute(stmt, rows[start:start + SAVE_CHUNK_SIZE])
+                await db.commit()
+            self.writes += len(rows)
+        except Exception as e:
+            logger.error(f"❌ 保存聊天实体失败 (客户端 {client_id}): {e}")
+
+    # ---------- 读取（只读内存） ----------
+
+    def get_title(self, chat_id) -> Optional[str]:
+        """已缓存的聊天标题（不产生网络请求）"""
+        entry = self._entries.get(_to_int(chat_id))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def display_name(self, chat_id, name: Optional[str]) -> Optional[str]:
+        """名称为空或为占位格式时换成缓存中的标题"""
+        if not is_placeholder(name):
+            return name
+        return self.get_title(chat_id) or name
+
+    def _is_fresh(self, chat_id: int) -> bool:
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return False
+        ttl = timedelta(hours=Config.CHAT_ENTITY_TTL_HOURS)
+        return get_local_now().replace(tzinfo=None) - entry[3] < ttl
+
+    # ---------- 解析 ----------
+
+    async def resolve_titles(self, chat_ids: Iterable, clients: List[Any] = None) -> Dict[str, str]:
+        """
+        批量获取聊天标题
+
+        Args:
+            chat_ids: 聊天ID（字符串或整数）
+            clients: 可用于网络解析的客户端（提供 resolve_chat_entities），按顺序尝试；为空时只读缓存
+
+        Returns:
+            {聊天ID字符串: 标题}，无法获取的不包含在内
+        """
+        await self.ensure_loaded()
+        ids = {chat_id for chat_id in (_to_int(chat_id) for chat_id in chat_ids) if chat_id is not None}
+        pending = [chat_id for chat_id in ids if not self._is_fresh(chat_id)]
+
+        for client in clients or []:
+            if not pending:
+                break
+            if not client.connected:
+                continue
+            try:
+                resolved_ids = set(await client.resolve_chat_entities(pending))
+            except Exception as e:
+                logger.warning(f"⚠️ 客户端 {client.client_id} 解析聊天实体失败: {e!r}")
+                continue
+            pending = [chat_id for chat_id in pending if chat_id not in resolved_ids]
+
+        titles = {}
+        for chat_id in ids:
+            entry = self._entries.get(chat_id)
+            if entry is not None:
+                titles[str(chat_id)] = entry[0]
+        return titles
+
+    @staticmethod
+    def resolve_timeout(count: int) -> float:
+        """解析一批实体的总超时：每轮并发请求按单次调用超时估算"""
+        return Config.CLIENT_CALL_TIMEOUT * math.ceil(count / max(1, Config.CHAT_RESOLVE_CONCURRENCY))
+
+    async def resolve_with(self, client, chat_ids: List[int]) -> Set[int]:
+        """用一个本进程的 TelegramClientManager 在其事件循环中并发解析一批实体并保存，返回解析成功的聊天ID"""
+        concurrency = max(1, Config.CHAT_RESOLVE_CONCURRENCY)
+        found = await client.call(self._fetch_entities(client, chat_ids, concurrency),
+                                  timeout=self.resolve_timeout(len(chat_ids)))
+        logger.info(f"✅ 客户端 {client.client_id} 解析聊天实体: {len(found)}/{len(chat_ids)}")
+        if found:
+            await self.save(client.client_id, found)
+        return {chat_id for chat_id, _entity in found}
+
+    async def _fetch_entities(self, client, chat_ids: List[int], concurrency: int) -> List[Tuple[int, Any]]:
+        """（客户端事件循环中）按并发上限逐个 get_entity"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(chat_id: int):
+            async with semaphore:
+                try:
+                    entity = await asyncio.wait_for(
+                        client.client.get_entity(self._input_peer(client.client_id, chat_id)),
+                        timeout=Config.CLIENT_CALL_TIMEOUT
+                    )
+                    self.resolved += 1
+                    return chat_id, entity
+                except Exception as e:
+                    self.failed += 1
+                    logger.debug(f"解析聊天 {chat_id} 失败: {e}")
+                    return None
+
+        results = await asyncio.gather(*(fetch(chat_id) for chat_id in chat_ids))
+        return [result for result in results if result is not None]
+
+    def _input_peer(self, client_id: str, chat_id: int):
+        """有该客户端保存的 access hash 时直接构造 InputPeer，否则交给 Telethon 按ID查找"""
+        access_hash = self._hashes.get((client_id, chat_id))
+        real_id, peer_type = utils.resolve_id(chat_id)
+        if peer_type is types.PeerChat:
+            return types.InputPeerChat(real_id)
+        if access_hash is None:
+            return chat_id
+        if peer_type is types.PeerChannel:
+            return types.InputPeerChannel(real_id, access_hash)
+        return types.InputPeerUser(real_id, access_hash)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "size": len(self._entries),
+            "loaded": self._loaded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "resolved": self.resolved,
+            "failed": self.failed,
+            "writes": self.writes
+        }
+
+
+# 全局聊天实体缓存实例
+chat_entity_cache = ChatEntityCache()
@@ -0,0 +1,813 @@
+#!/usr/bin/env python3
+"""
+客户端工作进程 - 把客户端分配到多个子进程中运行，规则匹配和消息处理不再受单个进程的 GIL 限制
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import signal
+import threading
+from typing import Dict, Any, List, Optional
+
+from config import Config
+from rule_index import rule_index
+from event_bus import event_bus
+from chat_entity_cache import chat_entity_cache
+from dedup_guard import dedup_guard
+
+logger = logging.getLogger(__name__)
+
+# 工作进程推送客户端状态快照的间隔（秒，内容变化时才发送）
+STATE_INTERVAL = 1.0
+# 等待工作进程就绪（数据库、规则索引、缓存加载完成）的超时（秒）
+READY_TIMEOUT = 60
+# 工作进程意外退出后重新启动前的等待时间（秒）
+RESTART_DELAY = 3
+# 同步停止客户端、关闭工作进程的超时（秒）
+STOP_TIMEOUT = 15
+# 各工作进程的投递ID段大小（投递ID在进程之间不重复）
+DELIVERY_ID_SPAN = 10 ** 9
+
+
+class _Channel:
+    """进程间通道（multiprocessing.Pipe 的一端）：发送加锁，可在任意线程调用"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def send(self, message: tuple) -> bool:
+        try:
+            with self._lock:
+                self.conn.send(message)
+            return True
+        except (OSError, EOFError, ValueError):
+            # 通道已关闭（对方进程已退出）
+            return False
+        except Exception as e:
+            logger.error(f"❌ 发送进程间消息失败 ({message[0]}): {e!r}")
+            return False
+
+    def receive_forever(self, handle):
+        """阻塞接收消息直到通道关闭（在专用线程中调用）"""
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                logger.error(f"❌ 接收进程间消息失败: {e!r}")
+                continue
+            handle(message)
+
+    def close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+# ---------- 工作进程 ----------
+
+class _MainProcessDedup:
+    """工作进程中的去重委托：占用需等待主进程判定，确认和释放直接通知主进程"""
+
+    def __init__(self, runtime: "_WorkerRuntime"):
+        self.runtime = runtime
+
+    async def claim(self, rule_id: int, source_chat_id: int, message_id: int, verified: bool) -> bool:
+        return await self.runtime.call('dedup_claim', rule_id, source_chat_id, message_id, verified)
+
+    def confirm(self, rule_id: int, source_chat_id: int, message_id: int):
+        self.runtime.channel.send(('call', None, 'dedup_confirm', (rule_id, source_chat_id, message_id)))
+
+    def release(self, rule_id: int, source_chat_id: int, message_id: int):
+        self.runtime.channel.send(('call', None, 'dedup_release', (rule_id, source_chat_id, message_id)))
+
+
+def _worker_main(index: int, conn):
+    """工作进程入口（spawn 方式启动，主进程负责处理中断信号）"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_WorkerRuntime(index, conn).run())
+
+
+class _WorkerRuntime:
+    """
+    工作进程中的客户端宿主
+
+    - 本进程的客户端以共享事件循环方式运行，规则索引、去重高水位、聊天实体缓存各自从数据库加载
+    - 转发前的去重占用由主进程判定（不同进程中的客户端可能监听同一源聊天、命中同一规则）
+    - 主进程的请求在事件循环中执行，带请求ID的返回结果；规则变更后刷新本进程的规则索引
+    - 事件总线和聊天实体缓存的写入转发给主进程，客户端状态快照定期推送
+    """
+
+    def __init__(self, index: int, conn):
+        self.index = index
+        self.channel = _Channel(conn)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._tasks = set()
+        # 发往主进程、等待回复的调用
+        self._calls: Dict[int, asyncio.Future] = {}
+        self._call_ids = itertools.count(1)
+
+    async def run(self):
+        # 本进程内不再启动工作进程，客户端运行在本进程的事件循环中
+        Config.CLIENT_WORKER_PROCESSES = 0
+        Config.CLIENT_LOOP_MODE = 'shared'
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        from database import db_manager
+        from delivery_queue import set_id_base
+
+        set_id_base((self.index + 1) * DELIVERY_ID_SPAN)
+        await db_manager.init_db()
+        await rule_index.rebuild()
+        await dedup_guard.warm_up()
+        await chat_entity_cache.warm_up()
+
+        dedup_guard.set_delegate(_MainProcessDedup(self))
+        event_bus.set_forwarder(lambda event_type, data: self.channel.send(('event', event_type, data)))
+        chat_entity_cache.add_save_listener(lambda client_id, rows: self.channel.send(('entities', client_id, rows)))
+
+        threading.Thread(target=self._receive, name=f"ClientWorker-{self.index}-reader", daemon=True).start()
+        state_task = self.loop.create_task(self._push_state())
+        self.channel.send(('ready', self.index))
+        logger.info(f"✅ 客户端工作进程 {self.index} 已就绪")
+
+        await self._stopped.wait()
+        state_task.cancel()
+        await self._stop_clients()
+        await db_manager.close()
+        self.channel.close()
+
+    def _receive(self):
+        """接收线程：消息交给事件循环处理；通道关闭（主进程退出）时结束本进程"""
+        try:
+            self.channel.receive_forever(lambda message: self.loop.call_soon_threadsafe(self._dispatch, message))
+            self.loop.call_soon_threadsafe(self._stopped.set)
+        except RuntimeError:
+            # 事件循环已关闭（正常停止）
+            pass
+
+    async def call(self, method: str, *args, timeout: float = None):
+        """调用主进程并等待回复（在本进程事件循环中调用）"""
+        timeout = Config.CLIENT_CALL_TIMEOUT if timeout is None else timeout
+        call_id = next(self._call_ids)
+        future = self.loop.create_future()
+        self._calls[call_id] = future
+        try:
+            if not self.channel.send(('call', call_id, method, args)):
+                raise RuntimeError("主进程不可用")
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._calls.pop(call_id, None)
+
+    def _dispatch(self, message: tuple):
+        kind = message[0]
+        if kind == 'shutdown':
+            self._stopped.set()
+        elif kind == 'reply':
+            _kind, call_id, ok, result = message
+            future = self._calls.get(call_id)
+            if future is not None and not future.done():
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+        elif kind == 'request':
+            _kind, request_id, method, args = message
+            task = self.loop.create_task(self._serve(request_id, method, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _serve(self, request_id: Optional[int], method: str, args: tuple):
+        """执行一条请求；带请求ID时返回结果或错误"""
+        handler = getattr(self, f"_cmd_{method}", None)
+        try:
+            if handler is None:
+                raise ValueError(f"未知请求: {method}")
+            result, ok = await handler(*args), True
+        except Exception as e:
+            result, ok = f"{type(e).__name__}: {e}", False
+            if request_id is None:
+                logger.warning(f"⚠️ 工作进程 {self.index} 执行 {method} 失败: {result}")
+        if request_id is not None:
+            self.channel.send(('reply', request_id, ok, result))
+
+    @staticmethod
+    def _client(client_id: str):
+        from telegram_client_manager import multi_client_manager
+        client = multi_client_manager.get_client(client_id)
+        if client is None:
+            raise KeyError(f"客户端 {client_id} 不在工作进程中")
+        return client
+
+    def _forward_status(self, client_id: str, status: str, data: Dict[str, Any]):
+        from telegram_client_manager import multi_client_manager
+        client = multi_client_manager.get_client(client_id)
+        self.channel.send(('status', client_id, status, data, client.get_status() if client else None))
+
+    async def _push_state(self):
+        """定期推送各客户端的状态、计数和待投递列表（变化时才发送）"""
+        from telegram_client_manager import multi_client_manager
+        last_state = None
+        while True:
+            await asyncio.sleep(STATE_INTERVAL)
+            try:
+                state = {
+                    client_id: {
+                        "status": client.get_status(),
+                        "counters": client.get_counters(),
+                        "deliveries": client.delivery_queue.list_pending() if client.delivery_queue else []
+                    }
+                    for client_id, client in list(multi_client_manager.clients.items())
+                }
+            except Exception as e:
+                logger.error(f"❌ 采集客户端状态失败: {e}")
+                continue
+            if state != last_state:
+                last_state = state
+                self.channel.send(('state', state))
+
+    async def _stop_clients(self):
+        from telegram_client_manager import multi_client_manager
+        await asyncio.gather(
+            *(self._cmd_stop(client_id) for client_id in list(multi_client_manager.clients)),
+            return_exceptions=True
+        )
+        multi_client_manager.clients.clear()
+        logger.info(f"✅ 客户端工作进程 {self.index} 已停止")
+
+    # ---------- 请求 ----------
+
+    async def _cmd_add(self, client_id: str, client_type: str, config_data: dict):
+        from telegram_client_manager import multi_client_manager
+        if multi_client_manager.get_client(client_id):
+            return
+        client = multi_client_manager.add_client_with_config(client_id, client_type, config_data=config_data)
+        client.add_status_callback(self._forward_status)
+
+    async def _cmd_remove(self, client_id: str):
+        from telegram_client_manager import multi_client_manager
+        if multi_client_manager.get_client(client_id):
+            await self._cmd_stop(client_id)
+            multi_client_manager.remove_client(client_id)
+
+    async def _cmd_start(self, client_id: str, timeout: float = None) -> bool:
+        client = self._client(client_id)
+        if timeout is None:
+            return client.start()
+        return await client.start_async(timeout)
+
+    async def _cmd_stop(self, client_id: str):
+        client = self._client(client_id)
+        task = client.task
+        client.stop()
+        if task is not None and not task.done():
+            await asyncio.wait({task}, timeout=STOP_TIMEOUT)
+
+    async def _cmd_query_chats(self, client_id: str, search: str, chat_type: str):
+        return await self._client(client_id).query_chats(search, chat_type)
+
+    async def _cmd_refresh_chats(self, client_id: str, timeout: float) -> int:
+        return await self._client(client_id).refresh_chats(timeout=timeout)
+
+    async def _cmd_refresh_monitored_chats(self, client_id: str):
+        await self._client(client_id).refresh_monitored_chats()
+
+    async def _cmd_send_verification_code(self, client_id: str):
+        return await self._client(client_id).send_verification_code()
+
+    async def _cmd_submit_verification_code(self, client_id: str, code: str):
+        return await self._client(client_id).submit_verification_code(code)
+
+    async def _cmd_submit_password(self, client_id: str, password: str):
+        return await self._client(client_id).submit_password(password)
+
+    async def _cmd_resolve_chat_entities(self, client_id: str, chat_ids: List[int]) -> List[int]:
+        return await self._client(client_id).resolve_chat_entities(chat_ids)
+
+    async def _cmd_cancel_delivery(self, delivery_id: int) -> bool:
+        from telegram_client_manager import multi_client_manager
+        return multi_client_manager.cancel_delivery(delivery_id)
+
+    async def _cmd_history(self, rule_id: int):
+        from services import ForwardRuleService
+        from telegram_client_manager import multi_client_manager
+        rule = await ForwardRuleService.get_rule_by_id(rule_id)
+        if rule is None:
+            return {"success": False, "message": f"规则 {rule_id} 不存在"}
+        return multi_client_manager.process_history_messages(rule)
+
+    async def _cmd_rule_changed(self, action: str, rule_id: Optional[int]):
+        """主进程的规则索引发生变更：从数据库刷新本进程的规则索引"""
+        if action == 'rebuild':
+            await rule_index.rebuild()
+        elif action == 'refresh':
+            await rule_index.refresh_rule(rule_id)
+        elif action == 'remove':
+            rule_index.remove_rule(rule_id)
+
+
+# ---------- 主进程 ----------
+
+class _RemoteDeliveryQueue:
+    """工作进程中客户端的待投递列表（读取状态快照，取消转为请求）"""
+
+    def __init__(self, client: "RemoteClientManager"):
+        self.client = client
+
+    def list_pending(self) -> List[Dict[str, Any]]:
+        return [dict(item) for item in self.client._deliveries]
+
+    def cancel(self, delivery_id: int) -> bool:
+        deliveries = self.client._deliveries
+        if not any(item["id"] == delivery_id for item in deliveries):
+            return False
+        self.client._deliveries = [item for item in deliveries if item["id"] != delivery_id]
+        return self.client.worker.notify('cancel_delivery', delivery_id)
+
+
+class RemoteClientManager:
+    """
+    运行在工作进程中的客户端在主进程中的代理（接口与 TelegramClientManager 一致）
+
+    - running/connected、状态、计数和待投递列表读取工作进程推送的快照，不产生进程间往返
+    - 启动、停止、会话列表、登录、聊天实体解析转为对所在工作进程的请求
+    """
+
+    loop_mode = 'process'
+
+    def __init__(self, worker: "ClientWorkerProcess", client_id: str, client_type: str = "user",
+                 config_data: dict = None):
+        self.worker = worker
+        self.client_id = client_id
+        self.client_type = client_type
+        self.config_data = dict(config_data or {})
+        # 期望运行状态（工作进程重启后据此重新启动客户端）
+        self.wanted_running = False
+        self.status_callbacks = []
+        self.delivery_queue = _RemoteDeliveryQueue(self)
+
+        self._status: Dict[str, Any] = {}
+        self._counters: Dict[str, Any] = {}
+        self._deliveries: List[Dict[str, Any]] = []
+
+        self.logger = logging.getLogger(f"TelegramClient-{client_id}")
+
+    @property
+    def running(self) -> bool:
+        return bool(self._status.get("running"))
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._status.get("connected"))
+
+    @property
+    def login_state(self) -> str:
+        return self._status.get("login_state", "idle")
+
+    def add_status_callback(self, callback):
+        """添加状态变化回调"""
+        self.status_callbacks.append(callback)
+
+    def start(self) -> bool:
+        """启动客户端（请求发出后立即返回，连接结果通过状态回调通知）"""
+        if self.running:
+            self.logger.warning("客户端已在运行中")
+            return True
+        self.wanted_running = True
+        if not self.worker.notify('start', self.client_id):
+            self.logger.error(f"启动客户端失败: 工作进程 {self.worker.index} 不可用")
+            return False
+        self.logger.info(f"🚀 客户端 {self.client_id} 已在工作进程 {self.worker.index} 中启动")
+        return True
+
+    async def start_async(self, timeout: float = None) -> bool:
+        """启动客户端并等待工作进程中的客户端启动完成，返回是否已连接"""
+        from telegram_client_manager import STARTUP_TIMEOUT
+        timeout = timeout or STARTUP_TIMEOUT
+        if self.running:
+            self.logger.warning("客户端已在运行中")
+            return True
+        self.wanted_running = True
+        try:
+            return await self.worker.request('start', self.client_id, timeout, timeout=timeout + 5)
+        except Exception as e:
+            self.logger.error(f"启动客户端失败: {e!r}")
+            return False
+
+    def stop(self):
+        """停止客户端（在主事件循环外调用时等待工作进程中的客户端停止）"""
+        self.wanted_running = False
+        try:
+            if self.worker.in_pool_loop():
+                self.worker.notify('stop', self.client_id)
+            else:
+                self.worker.request_sync('stop', self.client_id, timeout=STOP_TIMEOUT)
+            self.logger.info(f"✅ 客户端 {self.client_id} 已停止")
+        except Exception as e:
+            self.logger.warning(f"等待工作进程停止客户端失败: {e!r}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取客户端状态（工作进程最近推送的快照）"""
+        return {
+            "client_id": self.client_id,
+            "client_type": self.client_type,
+            "running": False,
+            "connected": False,
+            "login_state": "idle",
+            "user_info": None,
+            "monitored_chats": [],
+            **self._status,
+            "loop_mode": self.loop_mode,
+            "worker": self.worker.index,
+            "thread_alive": self.worker.is_alive() and bool(self._status.get("thread_alive"))
+        }
+
+    def get_counters(self) -> Dict[str, Any]:
+        """获取客户端各组件的运行计数（工作进程最近推送的快照）"""
+        return dict(self._counters)
+
+    async def query_chats(self, search: str = None, chat_type: str = None) -> tuple:
+        """筛选工作进程中的会话缓存，返回 (会话条目, 缓存信息)"""
+        if not self.connected:
+            return [], {"chat_count": 0, "display_name": self.client_id, "loaded": False, "last_refreshed": None}
+        return await self.worker.request('query_chats', self.client_id, search, chat_type)
+
+    async def refresh_chats(self, timeout: float = 120) -> int:
+        """重新完整加载会话列表，返回会话数"""
+        if not self.connected:
+            return 0
+        return await self.worker.request('refresh_chats', self.client_id, timeout, timeout=timeout + 5)
+
+    async def refresh_monitored_chats(self):
+        """刷新监听聊天列表"""
+        if self.running:
+            await self.worker.request('refresh_monitored_chats', self.client_id)
+
+    async def send_verification_code(self) -> Dict[str, Any]:
+        return await self.worker.request('send_verification_code', self.client_id, timeout=60)
+
+    async def submit_verification_code(self, code: str) -> Dict[str, Any]:
+        return await self.worker.request('submit_verification_code', self.client_id, code, timeout=60)
+
+    async def submit_password(self, password: str) -> Dict[str, Any]:
+        return await self.worker.request('submit_password', self.client_id, password, timeout=60)
+
+    async def resolve_chat_entities(self, chat_ids: List[int]) -> List[int]:
+        """在工作进程中解析并保存一批聊天实体（结果经保存监听同步到主进程缓存）"""
+        timeout = chat_entity_cache.resolve_timeout(len(chat_ids)) + Config.CLIENT_CALL_TIMEOUT
+        return await self.worker.request('resolve_chat_entities', self.client_id, list(chat_ids), timeout=timeout)
+
+    def _on_status(self, status: str, data: Dict[str, Any], snapshot: Optional[Dict[str, Any]]):
+        """工作进程中的客户端状态变化"""
+        if snapshot is not None:
+            self._status = snapshot
+        for callback in self.status_callbacks:
+            try:
+                callback(self.client_id, status, data or {})
+            except Exception as e:
+                self.logger.error(f"状态回调执行失败: {e}")
+
+    def _on_state(self, state: Dict[str, Any]):
+        self._status = state["status"]
+        self._counters = state["counters"]
+        self._deliveries = state["deliveries"]
+
+    def _on_worker_lost(self):
+        """所在工作进程意外退出：标记为已断开并通知"""
+        was_running = self.running
+        self._status = {**self._status, "running": False, "connected": False}
+        self._deliveries = []
+        if was_running:
+            error = f"工作进程 {self.worker.index} 已退出"
+            self._on_status("error", {"error": error}, None)
+            event_bus.publish('client_status', {
+                "client_id": self.client_id,
+                "event": "error",
+                "data": {"error": error},
+                "status": self.get_status()
+            })
+
+
+class ClientWorkerProcess:
+    """
+    主进程中的单个工作进程句柄
+
+    - spawn 方式启动子进程，通过一条 Pipe 双向通信；接收线程把消息交给主事件循环处理
+    - request() 等待带请求ID的回复，notify() 不等待；子进程退出时未完成的请求立即失败
+    - 子进程的调用（去重占用、确认、释放）在主事件循环中执行，带调用ID的返回结果
+    - 子进程意外退出后等待 RESTART_DELAY 秒重新启动，重新添加其中的客户端并启动原本在运行的客户端
+    """
+
+    def __init__(self, pool: "ClientWorkerPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.channel: Optional[_Channel] = None
+        self.client_ids: set = set()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._request_ids = itertools.count(1)
+        self._ready: Optional[asyncio.Future] = None
+        self._restart_task: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+        # 统计信息
+        self.requests = 0
+        self.request_errors = 0
+        self.restarts = 0
+
+    async def start(self):
+        """启动子进程并等待就绪"""
+        context = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = context.Pipe()
+        channel = _Channel(parent_conn)
+        self.channel = channel
+        self._ready = self.pool.loop.create_future()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.index, child_conn),
+            name=f"ClientWorker-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        threading.Thread(
+            target=self._receive, args=(channel,),
+            name=f"ClientWorker-{self.index}-reader", daemon=True
+        ).start()
+
+        await asyncio.wait_for(asyncio.shield(self._ready), timeout=READY_TIMEOUT)
+        logger.info(f"✅ 客户端工作进程 {self.index} 已启动 (pid {self.process.pid})")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def in_pool_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.pool.loop
+        except RuntimeError:
+            return False
+
+    # ---------- 发送 ----------
+
+    def notify(self, method: str, *args) -> bool:
+        """发送不需要回复的请求（任意线程）"""
+        return self.channel is not None and self.channel.send(('request', None, method, args))
+
+    async def request(self, method: str, *args, timeout: float = None):
+        """
+        发送请求并等待工作进程回复（在主事件循环中调用）
+
+        Raises:
+            RuntimeError: 工作进程不可用或执行失败
+            asyncio.TimeoutError: 超时
+        """
+        timeout = Config.CLIENT_CALL_TIMEOUT if timeout is None else timeout
+        request_id = next(self._request_ids)
+        future = self.pool.loop.create_future()
+        self._pending[request_id] = future
+        try:
+            if self.channel is None or not self.channel.send(('request', request_id, method, args)):
+                raise RuntimeError(f"工作进程 {self.index} 不可用")
+            self.requests += 1
+            return await asyncio.wait_for(future, timeout=timeout)
+        except Exception:
+            self.request_errors += 1
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+    def request_sync(self, method: str, *args, timeout: float = None):
+        """在主事件循环以外的线程中发送请求并阻塞等待回复"""
+        timeout = Config.CLIENT_CALL_TIMEOUT if timeout is None else timeout
+        future = asyncio.run_coroutine_threadsafe(self.request(method, *args, timeout=timeout), self.pool.loop)
+        return future.result(timeout=timeout + 1)
+
+    # ---------- 接收 ----------
+
+    def _receive(self, channel: _Channel):
+        """接收线程"""
+        channel.receive_forever(lambda message: self._call_in_loop(self._dispatch, message))
+        self._call_in_loop(self._on_exit, channel)
+
+    def _call_in_loop(self, callback, *args):
+        try:
+            self.pool.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # 主事件循环已关闭
+            pass
+
+    def _dispatch(self, message: tuple):
+        kind = message[0]
+        if kind == 'reply':
+            _kind, request_id, ok, result = message
+            future = self._pending.get(request_id)
+            if future is not None and not future.done():
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+        elif kind == 'event':
+            _kind, event_type, data = message
+            client = self.pool.clients.get(data.get("client_id")) if event_type == 'client_status' else None
+            if client is not None:
+                # 附带主进程中的完整状态（含工作进程编号）
+                data = {**data, "status": client.get_status()}
+            event_bus.publish(event_type, data)
+        elif kind == 'status':
+            _kind, client_id, status, data, snapshot = message
+            client = self.pool.clients.get(client_id)
+            if client is not None:
+                client._on_status(status, data, snapshot)
+        elif kind == 'state':
+            for client_id, state in message[1].items():
+                client = self.pool.clients.get(client_id)
+                if client is not None:
+                    client._on_state(state)
+        elif kind == 'entities':
+            _kind, client_id, rows = message
+            chat_entity_cache.remember_rows(client_id, rows)
+        elif kind == 'call':
+            _kind, call_id, method, args = message
+            task = self.pool.loop.create_task(self._serve_call(self.channel, call_id, method, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif kind == 'ready':
+            if self._ready is not None and not self._ready.done():
+                self._ready.set_result(True)
+
+    async def _serve_call(self, channel: _Channel, call_id: Optional[int], method: str, args: tuple):
+        """执行子进程的一次调用；带调用ID时返回结果或错误"""
+        handler = getattr(self, f"_call_{method}", None)
+        try:
+            if handler is None:
+                raise ValueError(f"未知调用: {method}")
+            result, ok = await handler(*args), True
+        except Exception as e:
+            result, ok = f"{type(e).__name__}: {e}", False
+            if call_id is None:
+                logger.warning(f"⚠️ 执行工作进程 {self.index} 的调用 {method} 失败: {result}")
+        if call_id is not None:
+            channel.send(('reply', call_id, ok, result))
+
+    @staticmethod
+    async def _call_dedup_claim(rule_id: int, source_chat_id: int, message_id: int, verified: bool) -> bool:
+        return await dedup_guard.claim(rule_id, source_chat_id, message_id, verified=verified)
+
+    @staticmethod
+    async def _call_dedup_confirm(rule_id: int, source_chat_id: int, message_id: int):
+        dedup_guard.confirm(rule_id, source_chat_id, message_id)
+
+    @staticmethod
+    async def _call_dedup_release(rule_id: int, source_chat_id: int, message_id: int):
+        dedup_guard.release(rule_id, source_chat_id, message_id)
+
+    def _on_exit(self, channel: _Channel):
+        """子进程退出（通道关闭）"""
+        if channel is not self.channel:
+            return
+        error = RuntimeError(f"工作进程 {self.index} 已退出")
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        if self._ready is not None and not self._ready.done():
+            self._ready.set_exception(error)
+        if self.pool.closing:
+            return
+
+        # 通道已关闭，子进程已经或即将退出
+        self.process.join(1)
+        logger.error(f"❌ 客户端工作进程 {self.index} 意外退出 (exitcode {self.process.exitcode})")
+        for client_id in list(self.client_ids):
+            client = self.pool.clients.get(client_id)
+            if client is not None:
+                client._on_worker_lost()
+        if self._restart_task is None or self._restart_task.done():
+            self._restart_task = self.pool.loop.create_task(self._restart())
+
+    async def _restart(self):
+        """重新启动子进程，恢复其中的客户端"""
+        while not self.pool.closing:
+            await asyncio.sleep(RESTART_DELAY)
+            try:
+                await self.start()
+            except Exception as e:
+                logger.error(f"❌ 重启客户端工作进程 {self.index} 失败，稍后重试: {e!r}")
+                continue
+            self.restarts += 1
+            for client_id in list(self.client_ids):
+                client = self.pool.clients.get(client_id)
+                if client is None:
+                    continue
+                self.notify('add', client.client_id, client.client_type, client.config_data)
+                if client.wanted_running:
+                    self.notify('start', client.client_id)
+            logger.info(f"🔄 客户端工作进程 {self.index} 已重启，恢复 {len(self.client_ids)} 个客户端")
+            return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.is_alive(),
+            "clients": sorted(self.client_ids),
+            "pending_requests": len(self._pending),
+            "requests": self.requests,
+            "request_errors": self.request_errors,
+            "restarts": self.restarts
+        }
+
+
+class ClientWorkerPool:
+    """
+    客户端工作进程池（CLIENT_WORKER_PROCESSES > 0 时由 MultiClientManager 创建）
+
+    - 按账号分片：新客户端分配到当前客户端最少的工作进程，之后固定在该进程中
+    - 主进程规则索引变更后通知所有工作进程刷新各自的规则索引
+    - 主进程只保留 Web 服务和各客户端的代理（RemoteClientManager）
+    """
+
+    def __init__(self, processes: int):
+        self.workers = [ClientWorkerProcess(self, index) for index in range(max(1, processes))]
+        self.clients: Dict[str, RemoteClientManager] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.closing = False
+
+    async def start(self):
+        """启动所有工作进程（在主事件循环中调用）"""
+        self.loop = asyncio.get_running_loop()
+        await asyncio.gather(*(worker.start() for worker in self.workers))
+        rule_index.add_listener(self._on_rule_change)
+        logger.info(f"✅ 已启动 {len(self.workers)} 个客户端工作进程")
+
+    def create_client(self, client_id: str, client_type: str, config_data: dict = None) -> RemoteClientManager:
+        """在客户端最少的工作进程中添加客户端，返回其代理"""
+        worker = min(self.workers, key=lambda item: len(item.client_ids))
+        client = RemoteClientManager(worker, client_id, client_type, config_data)
+        worker.client_ids.add(client_id)
+        self.clients[client_id] = client
+        worker.notify('add', client_id, client_type, client.config_data)
+        logger.info(f"📦 客户端 {client_id} 分配到工作进程 {worker.index}")
+        return client
+
+    def remove_client(self, client_id: str):
+        """从所在工作进程中移除客户端（调用前客户端已停止）"""
+        client = self.clients.pop(client_id, None)
+        if client is None:
+            return
+        client.worker.client_ids.discard(client_id)
+        client.worker.notify('remove', client_id)
+
+    def _on_rule_change(self, action: str, rule_id: Optional[int]):
+        for worker in self.workers:
+            worker.notify('rule_changed', action, rule_id)
+
+    def process_history_messages(self, rule) -> Dict[str, Any]:
+        """在规则所属客户端（不可用时为任一已连接客户端）所在的工作进程中处理历史消息"""
+        client = self.clients.get(rule.client_id)
+        if client is None or not client.connected:
+            client = next((item for item in self.clients.values() if item.connected), None)
+        if client is None or not client.worker.notify('history', rule.id):
+            return {
+                "success": False,
+                "message": f"没有可用的客户端处理规则 {rule.client_id}",
+                "processed": 0,
+                "forwarded": 0,
+                "errors": 0
+            }
+        return {
+            "success": True,
+            "message": "历史消息处理已开始",
+            "processed": 0,
+            "forwarded": 0,
+            "errors": 0
+        }
+
+    def shutdown(self, timeout: float = STOP_TIMEOUT):
+        """停止所有工作进程（各进程先停止其中的客户端、写完日志）；阻塞等待，在主事件循环以外调用"""
+        self.closing = True
+        rule_index.remove_listener(self._on_rule_change)
+        for worker in self.workers:
+            if worker.channel is not None:
+                worker.channel.send(('shutdown',))
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                logger.warning(f"⚠️ 客户端工作进程 {worker.index} 停止超时，强制结束")
+                worker.process.terminate()
+                worker.process.join(5)
+            if worker.channel is not None:
+                worker.channel.close()
+        for client in self.clients.values():
+            client._status = {**client._status, "running": False, "connected": False}
+        logger.info("✅ 客户端工作进程已全部停止")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [worker.get_stats() for worker in self.workers]
@@ -159,6 +159,52 @@ class Config:
     MAX_RETRY_ATTEMPTS = int(os.getenv('MAX_RETRY_ATTEMPTS', '3'))
     RETRY_DELAY = int(os.getenv('RETRY_DELAY', '5'))
     
+    # === 性能配置 ===
+    # 事件处理：工作协程数、事件队列上限、队列满时的策略(block/drop_oldest/spill)
+    EVENT_WORKERS = int(os.getenv('EVENT_WORKERS', '8'))
+    EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '1000'))
+    EVENT_OVERFLOW_POLICY = os.getenv('EVENT_OVERFLOW_POLICY', 'block')
+    # 消息日志批量写入：每批条数、最长刷新间隔(秒)、内存队列上限
+    LOG_WRITER_BATCH_SIZE = int(os.getenv('LOG_WRITER_BATCH_SIZE', '100'))
+    LOG_WRITER_FLUSH_INTERVAL = float(os.getenv('LOG_WRITER_FLUSH_INTERVAL', '1.0'))
+    LOG_WRITER_QUEUE_SIZE = int(os.getenv('LOG_WRITER_QUEUE_SIZE', '10000'))
+    # 发送限速：每个目标聊天/整个账号的每秒发送数与突发量，FloodWait 最大重试次数与可接受的最长等待(秒)
+    SEND_RATE_PER_CHAT = float(os.getenv('SEND_RATE_PER_CHAT', '1.0'))
+    SEND_BURST_PER_CHAT = float(os.getenv('SEND_BURST_PER_CHAT', '3'))
+    SEND_RATE_GLOBAL = float(os.getenv('SEND_RATE_GLOBAL', '20'))
+    SEND_BURST_GLOBAL = float(os.getenv('SEND_BURST_GLOBAL', '30'))
+    SEND_MAX_FLOOD_RETRIES = int(os.getenv('SEND_MAX_FLOOD_RETRIES', '3'))
+    SEND_MAX_FLOOD_WAIT = int(os.getenv('SEND_MAX_FLOOD_WAIT', '600'))
+    # 相册聚合：等待同一相册后续消息的窗口(秒)
+    ALBUM_WAIT_WINDOW = float(os.getenv('ALBUM_WAIT_WINDOW', '1.0'))
+    # 重复转发防护：内存中缓存的最近转发记录条数
+    DEDUP_CACHE_SIZE = int(os.getenv('DEDUP_CACHE_SIZE', '50000'))
+    # 编辑同步：内存中缓存的源消息->目标消息映射条数
+    MESSAGE_MAP_CACHE_SIZE = int(os.getenv('MESSAGE_MAP_CACHE_SIZE', '10000'))
+    # 原生转发/复制：同一目标的消息在该窗口(秒)内合并为一次 ForwardMessages 请求
+    FORWARD_BATCH_WINDOW = float(os.getenv('FORWARD_BATCH_WINDOW', '0.5'))
+    # 日志列表计数：缓存时间(秒)；计数上限，超过后显示为近似值（0 表示始终精确计数）
+    LOG_COUNT_CACHE_TTL = float(os.getenv('LOG_COUNT_CACHE_TTL', '10'))
+    LOG_COUNT_LIMIT = int(os.getenv('LOG_COUNT_LIMIT', '0'))
+    # 转发统计：小时粒度汇总保留天数（天粒度汇总永久保留）
+    STATS_HOURLY_RETENTION_DAYS = int(os.getenv('STATS_HOURLY_RETENTION_DAYS', '30'))
+    # 实时推送：断线续传缓冲的事件数；突发事件合并窗口(秒)；运行计数采集间隔(秒)
+    EVENT_BUFFER_SIZE = int(os.getenv('EVENT_BUFFER_SIZE', '1000'))
+    EVENT_COALESCE_WINDOW = float(os.getenv('EVENT_COALESCE_WINDOW', '0.25'))
+    EVENT_COUNTERS_INTERVAL = float(os.getenv('EVENT_COUNTERS_INTERVAL', '5'))
+    # 客户端运行方式：thread 每个客户端一个线程和事件循环；shared 所有客户端运行在主事件循环中
+    CLIENT_LOOP_MODE = os.getenv('CLIENT_LOOP_MODE', 'thread').lower()
+    # 客户端工作进程数：大于 0 时客户端按账号分配到多个子进程中运行（主进程只运行 Web 服务），0 为不启用
+    CLIENT_WORKER_PROCESSES = int(os.getenv('CLIENT_WORKER_PROCESSES', '0'))
+    # 启动时同时启动（连接、登录、加载监听聊天）的客户端数上限
+    CLIENT_START_CONCURRENCY = int(os.getenv('CLIENT_START_CONCURRENCY', '4'))
+    # 跨线程调用客户端：默认超时(秒)；每个客户端同时执行的调用数上限
+    CLIENT_CALL_TIMEOUT = float(os.getenv('CLIENT_CALL_TIMEOUT', '10'))
+    CLIENT_CALL_CONCURRENCY = int(os.getenv('CLIENT_CALL_CONCURRENCY', '4'))
+    # 聊天实体缓存：标题等信息的有效期(小时)，过期后解析时重新获取；并发解析的请求数上限
+    CHAT_ENTITY_TTL_HOURS = float(os.getenv('CHAT_ENTITY_TTL_HOURS', '24'))
+    CHAT_RESOLVE_CONCURRENCY = int(os.getenv('CHAT_RESOLVE_CONCURRENCY', '5'))
+    
     # === 监控配置 ===
     HEALTH_CHECK_ENABLED = os.getenv('HEALTH_CHECK_ENABLED', 'true').lower() == 'true'
     HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', '30'))
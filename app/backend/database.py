@@ -12,6 +12,30 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# 索引迁移：版本号记录在 SQLite 的 PRAGMA user_version 中，启动时只执行高于当前版本的部分
+# 调整索引时追加新版本（同时更新 models.py 中的 Index 声明），不要修改已发布的版本
+INDEX_MIGRATIONS = [
+    (1, "日志查询与规则查找索引", [
+        "CREATE INDEX IF NOT EXISTS ix_message_logs_created_at ON message_logs (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_message_logs_status_created_at ON message_logs (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_message_logs_rule_created_at ON message_logs (rule_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_message_logs_source_message "
+        "ON message_logs (source_chat_id, source_message_id, rule_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_forward_rules_source_active ON forward_rules (source_chat_id, is_active)",
+        "CREATE INDEX IF NOT EXISTS ix_keywords_rule_id ON keywords (rule_id)",
+        "CREATE INDEX IF NOT EXISTS ix_replace_rules_rule_priority ON replace_rules (rule_id, priority)",
+    ]),
+    # 此前所有替换规则都按正则执行，is_regex 未生效（界面和导入默认保存为 false）。
+    # 现在 is_regex=false 按普通文本替换；模式含正则元字符、或替换内容含反斜杠（正则下有转义/分组引用含义）
+    # 的旧规则改为正则，保持升级前的替换结果
+    (2, "替换规则 is_regex 兼容迁移", [
+        "UPDATE replace_rules SET is_regex = 1 WHERE (is_regex = 0 OR is_regex IS NULL) AND ("
+        + " OR ".join(f"instr(pattern, '{char}') > 0" for char in ".^$*+?{}[]()|")
+        + " OR instr(pattern, char(92)) > 0 OR instr(replacement, char(92)) > 0)",
+    ]),
+]
+SCHEMA_VERSION = INDEX_MIGRATIONS[-1][0]
+
 class DatabaseManager:
     """数据库管理器 - 支持SQLite优化配置"""
     
@@ -208,6 +232,71 @@ async def _auto_migrate_database():
                 else:
                     logger.warning(f"⚠️ 迁移replace_rules表时出错: {e}")
             
+            # 检查forward_rules表是否存在delivery_mode字段
+            try:
+                result = await session.execute(text("PRAGMA table_info(forward_rules)"))
+                columns = [row[1] for row in result.fetchall()]
+                
+                if columns and 'delivery_mode' not in columns:
+                    logger.info("🔧 添加delivery_mode字段到forward_rules表...")
+                    await session.execute(text("ALTER TABLE forward_rules ADD COLUMN delivery_mode VARCHAR(20) DEFAULT 'resend'"))
+                    await session.commit()
+                    logger.info("✅ delivery_mode字段已添加")
+                else:
+                    logger.debug("✅ delivery_mode字段已存在")
+                    
+            except Exception as e:
+                if "no such table" in str(e).lower():
+                    logger.debug("forward_rules表不存在，跳过迁移")
+                else:
+                    logger.warning(f"⚠️ 迁移forward_rules表时出错: {e}")
+            
+            # 为message_logs添加成功转发唯一索引（先把历史重复的成功记录标记为duplicate）
+            try:
+                result = await session.execute(text("PRAGMA index_list(message_logs)"))
+                indexes = [row[1] for row in result.fetchall()]
+                
+                if 'uq_message_logs_forwarded' not in indexes:
+                    logger.info("🔧 创建message_logs成功转发唯一索引...")
+                    result = await session.execute(text(
+                        "UPDATE message_logs SET status = 'duplicate' "
+                        "WHERE status = 'success' AND id NOT IN ("
+                        "SELECT MIN(id) FROM message_logs WHERE status = 'success' "
+                        "GROUP BY rule_id, source_chat_id, source_message_id)"
+                    ))
+                    if result.rowcount:
+                        logger.info(f"🔧 已将 {result.rowcount} 条重复的成功记录标记为duplicate")
+                    await session.execute(text(
+                        "CREATE UNIQUE INDEX IF NOT EXISTS uq_message_logs_forwarded "
+                        "ON message_logs (rule_id, source_chat_id, source_message_id) "
+                        "WHERE status = 'success'"
+                    ))
+                    await session.commit()
+                    logger.info("✅ 成功转发唯一索引已创建")
+                else:
+                    logger.debug("✅ 成功转发唯一索引已存在")
+                    
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"⚠️ 创建message_logs唯一索引时出错: {e}")
+            
+            # 版本化索引迁移
+            await _apply_index_migrations(session)
+
+            # 转发统计汇总表：首次启用时由已有日志回填
+            try:
+                result = await session.execute(text(
+                    "SELECT EXISTS (SELECT 1 FROM message_stats), EXISTS (SELECT 1 FROM message_logs)"
+                ))
+                has_stats, has_logs = result.first()
+                if has_logs and not has_stats:
+                    logger.info("🔧 由历史日志生成转发统计汇总（日志量大时可能需要几分钟）...")
+                    from stats_rollup import stats_rollup
+                    await stats_rollup.rebuild()
+            except Exception as e:
+                await session.rollback()
+                logger.warning(f"⚠️ 生成转发统计汇总失败: {e}")
+
             # 可以在这里添加更多的迁移逻辑
             # 例如：添加其他缺失的字段、索引等
             
@@ -215,4 +304,43 @@ async def _auto_migrate_database():
             
     except Exception as e:
         logger.error(f"❌ 自动数据库迁移失败: {e}")
-        # 不抛出异常，避免影响正常启动
\ No newline at end of file
+        # 不抛出异常，避免影响正常启动
+
+async def _apply_index_migrations(session):
+    """按版本执行索引迁移，并在有新索引时刷新查询规划器统计"""
+    from sqlalchemy import text
+    
+    try:
+        result = await session.execute(text("PRAGMA user_version"))
+        current_version = result.scalar() or 0
+    except Exception as e:
+        logger.warning(f"⚠️ 读取数据库版本失败: {e}")
+        return
+    
+    pending = [migration for migration in INDEX_MIGRATIONS if migration[0] > current_version]
+    if not pending:
+        logger.debug(f"✅ 数据库索引已是最新版本 v{current_version}")
+        return
+    
+    for version, description, statements in pending:
+        try:
+            logger.info(f"🔧 执行索引迁移 v{version}: {description}（日志量大时可能需要几分钟）")
+            for statement in statements:
+                await session.execute(text(statement))
+            # PRAGMA 不支持参数绑定，版本号来自常量
+            await session.execute(text(f"PRAGMA user_version = {int(version)}"))
+            await session.commit()
+            logger.info(f"✅ 索引迁移 v{version} 完成")
+        except Exception as e:
+            await session.rollback()
+            logger.warning(f"⚠️ 索引迁移 v{version} 失败，下次启动将重试: {e}")
+            return
+    
+    # 新索引需要统计信息，规划器才能在多个候选索引间正确选择；限制采样行数避免大表分析过慢
+    try:
+        await session.execute(text("PRAGMA analysis_limit = 1000"))
+        await session.execute(text("ANALYZE"))
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        logger.warning(f"⚠️ 更新查询统计信息失败: {e}")
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+重复转发防护 - 实时转发和历史转发共用的两级去重（内存 LRU + 唯一索引）
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+
+from sqlalchemy import select, func
+
+from config import Config
+from database import db_manager
+from models import MessageLog
+
+logger = logging.getLogger(__name__)
+
+
+class ForwardDedupGuard:
+    """
+    进程级重复转发防护
+
+    键为 (规则ID, 源聊天ID, 源消息ID)，判断顺序：
+    1. 内存 LRU：最近转发过（或正在转发）的键，命中即为重复
+    2. 高水位：每个 (规则, 源聊天) 已成功转发的最大消息ID。同一聊天的消息ID单调递增，
+       大于高水位的消息一定没有转发过，实时消息基本都在这一步以 O(1) 判定
+    3. 以上都无法判定时，走一次 message_logs 唯一部分索引查询
+
+    message_logs 上 (rule_id, source_chat_id, source_message_id) WHERE status='success'
+    的唯一索引是最终保证：即使并发漏判，也不会写入第二条成功记录。
+
+    客户端工作进程中设置了委托（set_delegate）时，占用、确认、释放由主进程的实例统一判定，
+    多个进程中监听同一源聊天的客户端不会各自转发同一条消息。
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max(1, max_size or Config.DEDUP_CACHE_SIZE)
+        self._keys: "OrderedDict[Tuple[int, int, int], bool]" = OrderedDict()
+        self._high_water: Dict[Tuple[int, int], int] = {}
+        self._warmed = False
+        self._lock = threading.Lock()
+        # 权威去重实例的委托（客户端工作进程中指向主进程），None 为本进程判定
+        self._delegate = None
+
+        # 统计信息
+        self.memory_hits = 0
+        self.watermark_skips = 0
+        self.db_lookups = 0
+        self.duplicates = 0
+
+    async def warm_up(self) -> bool:
+        """从日志表加载每个 (规则, 源聊天) 的高水位"""
+        try:
+            async with db_manager.async_session() as db:
+                result = await db.execute(
+                    select(MessageLog.rule_id, MessageLog.source_chat_id, func.max(MessageLog.source_message_id))
+                    .where(MessageLog.status == 'success', MessageLog.rule_id.isnot(None))
+                    .group_by(MessageLog.rule_id, MessageLog.source_chat_id)
+                )
+                rows = result.fetchall()
+
+            high_water = {}
+            for rule_id, source_chat_id, max_message_id in rows:
+                try:
+                    high_water[(rule_id, int(source_chat_id))] = max_message_id or 0
+                except (TypeError, ValueError):
+                    continue
+
+            with self._lock:
+                for pair, message_id in high_water.items():
+                    self._high_water[pair] = max(self._high_water.get(pair, 0), message_id)
+                self._warmed = True
+
+            logger.info(f"✅ 去重高水位已加载: {len(high_water)} 个 (规则, 源聊天) 组合")
+            return True
+        except Exception as e:
+            logger.error(f"❌ 加载去重高水位失败: {e}")
+            return False
+
+    async def is_forwarded(self, rule_id: int, source_chat_id: int, message_id: int) -> bool:
+        """判断消息是否已被该规则成功转发（最多一次索引查询）"""
+        key = (rule_id, source_chat_id, message_id)
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.memory_hits += 1
+                return True
+            high_water = self._high_water.get((rule_id, source_chat_id), 0 if self._warmed else None)
+
+        if high_water is not None and message_id > high_water:
+            self.watermark_skips += 1
+            return False
+
+        self.db_lookups += 1
+        try:
+            async with db_manager.async_session() as db:
+                result = await db.execute(
+                    select(MessageLog.id).where(
+                        MessageLog.rule_id == rule_id,
+                        MessageLog.source_chat_id == str(source_chat_id),
+                        MessageLog.source_message_id == message_id,
+                        MessageLog.status == 'success'
+                    ).limit(1)
+                )
+                found = result.first() is not None
+        except Exception as e:
+            logger.error(f"❌ 查询转发记录失败: {e}")
+            return False
+
+        if found:
+            self._remember(key)
+        return found
+
+    def _remember(self, key: Tuple[int, int, int]):
+        with self._lock:
+            self._keys[key] = True
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def set_delegate(self, delegate):
+        """设置权威去重委托：需提供 async claim(rule_id, source_chat_id, message_id, verified)、confirm、release"""
+        self._delegate = delegate
+
+    async def claim(self, rule_id: int, source_chat_id: int, message_id: int, verified: bool = False) -> bool:
+        """
+        占用一条消息的转发权
+
+        Args:
+            verified: 调用方已通过 is_forwarded 检查，只需防止并发重复
+
+        Returns:
+            bool: True 表示可以转发；False 表示已转发过或正在被转发
+        """
+        key = (rule_id, source_chat_id, message_id)
+        if self._delegate is not None:
+            try:
+                claimed = await self._delegate.claim(rule_id, source_chat_id, message_id, verified)
+            except Exception as e:
+                logger.warning(f"⚠️ 跨进程去重占用失败，改用本进程判定: {e!r}")
+            else:
+                if claimed:
+                    self._remember(key)
+                else:
+                    self.duplicates += 1
+                return claimed
+
+        if not verified and await self.is_forwarded(rule_id, source_chat_id, message_id):
+            self.duplicates += 1
+            return False
+
+        with self._lock:
+            if key in self._keys:
+                self.duplicates += 1
+                return False
+            self._keys[key] = True
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+        return True
+
+    def confirm(self, rule_id: int, source_chat_id: int, message_id: int):
+        """转发成功：推进高水位"""
+        pair = (rule_id, source_chat_id)
+        with self._lock:
+            if message_id > self._high_water.get(pair, 0):
+                self._high_water[pair] = message_id
+        if self._delegate is not None:
+            self._delegate.confirm(rule_id, source_chat_id, message_id)
+
+    def release(self, rule_id: int, source_chat_id: int, message_id: int):
+        """转发失败：释放占用，允许之后重试"""
+        with self._lock:
+            self._keys.pop((rule_id, source_chat_id, message_id), None)
+        if self._delegate is not None:
+            self._delegate.release(rule_id, source_chat_id, message_id)
+
+    def discard_rule(self, rule_id: int):
+        """移除规则的所有去重状态（规则被删除时调用）"""
+        with self._lock:
+            for key in [key for key in self._keys if key[0] == rule_id]:
+                del self._keys[key]
+            for pair in [pair for pair in self._high_water if pair[0] == rule_id]:
+                del self._high_water[pair]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取去重统计"""
+        return {
+            "cached_keys": len(self._keys),
+            "max_size": self.max_size,
+            "tracked_chats": len(self._high_water),
+            "warmed": self._warmed,
+            "memory_hits": self.memory_hits,
+            "watermark_skips": self.watermark_skips,
+            "db_lookups": self.db_lookups,
+            "duplicates": self.duplicates
+        }
+
+
+# 全局去重实例
+dedup_guard = ForwardDedupGuard()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+延迟投递队列 - 用最小堆代替每条消息一个 asyncio.sleep 的延迟转发
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Dict, Any, Callable, Awaitable, List, Optional, Tuple
+
+from models import get_local_now
+from dedup_guard import dedup_guard
+
+logger = logging.getLogger(__name__)
+
+# 投递ID在所有客户端之间唯一，API 可直接按ID取消
+_delivery_ids = itertools.count(1)
+
+# 到期时间相差不超过该值(秒)的投递合并为同一批
+BATCH_TOLERANCE = 0.05
+
+
+def set_id_base(base: int):
+    """设置投递ID的起始值（客户端工作进程各用一段，ID 在进程之间也不重复）"""
+    global _delivery_ids
+    _delivery_ids = itertools.count(base + 1)
+
+
+class DelayedDelivery:
+    """待投递记录：只保存ID等少量字段，不持有 Telethon 消息对象和媒体"""
+
+    __slots__ = ('id', 'rule_id', 'chat_id', 'message_ids', 'kind', 'due', 'due_at', 'created_at', 'cancelled')
+
+    def __init__(self, rule_id: int, chat_id: int, message_ids: Tuple[int, ...], kind: str,
+                 due: float, delay: float):
+        self.id = next(_delivery_ids)
+        self.rule_id = rule_id
+        self.chat_id = chat_id
+        self.message_ids = message_ids
+        self.kind = kind
+        # 事件循环时间（用于排序）与墙上时间（用于展示）
+        self.due = due
+        self.created_at = get_local_now()
+        self.due_at = self.created_at.timestamp() + delay
+        self.cancelled = False
+
+    def release_claim(self):
+        """释放登记时占用的去重键（投递不会再发生时调用；相册以首条消息为键）"""
+        dedup_guard.release(self.rule_id, self.chat_id, self.message_ids[0])
+
+    def to_dict(self) -> Dict[str, Any]:
+        from datetime import datetime
+        return {
+            "id": self.id,
+            "rule_id": self.rule_id,
+            "source_chat_id": str(self.chat_id),
+            "message_ids": list(self.message_ids),
+            "kind": self.kind,
+            "created_at": self.created_at.isoformat(),
+            "due_at": datetime.fromtimestamp(self.due_at, tz=self.created_at.tzinfo).isoformat(),
+            "remaining_seconds": round(max(0.0, self.due_at - get_local_now().timestamp()), 1)
+        }
+
+
+class DeliveryQueue:
+    """
+    延迟投递队列（每个 TelegramClientManager 一个，运行在客户端事件循环中）
+
+    - 待投递记录按到期时间放入最小堆，由单个后台任务等待最早到期的记录
+    - 到期（及即将到期）的记录成批取出，按源聊天合并为一次 get_messages 重新获取消息后再投递
+    - 取消采用惰性删除：记录标记为已取消，出堆时直接丢弃
+    - 登记时已占用去重键；取消、消息已不存在、队列停止时释放，之后仍可重试或补发
+    """
+
+    def __init__(self, name: str, client, on_due: Callable[[DelayedDelivery, List[Any]], Awaitable[None]]):
+        self.name = name
+        self.client = client
+        self.on_due = on_due
+
+        self._heap: List[Tuple[float, int, DelayedDelivery]] = []
+        self._records: Dict[int, DelayedDelivery] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dispatch_tasks = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 统计信息
+        self.scheduled = 0
+        self.delivered = 0
+        self.cancelled = 0
+        self.missing = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动调度任务"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run(), name=f"DeliveryQueue-{self.name}")
+
+    def available(self) -> bool:
+        """当前上下文能否使用队列（需在客户端事件循环中调用）"""
+        return self.running and asyncio.get_running_loop() is self._loop
+
+    def schedule(self, rule_id: int, chat_id: int, message_ids: List[int], delay: float,
+                 kind: str = "message") -> DelayedDelivery:
+        """登记一次延迟投递"""
+        due = self._loop.time() + delay
+        record = DelayedDelivery(rule_id, chat_id, tuple(message_ids), kind, due, delay)
+
+        # 比当前最早的记录更早到期时唤醒调度任务
+        if not self._heap or due < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (due, record.id, record))
+        self._records[record.id] = record
+        self.scheduled += 1
+        return record
+
+    def cancel(self, delivery_id: int) -> bool:
+        """取消一次待投递（可在任意线程调用）"""
+        record = self._records.pop(delivery_id, None)
+        if record is None:
+            return False
+        record.cancelled = True
+        record.release_claim()
+        self.cancelled += 1
+        return True
+
+    def list_pending(self) -> List[Dict[str, Any]]:
+        """列出所有待投递记录（按到期时间排序）"""
+        records = sorted(list(self._records.values()), key=lambda r: r.due)
+        return [record.to_dict() for record in records]
+
+    async def _run(self):
+        """调度循环：等待最早到期的记录，到期后成批派发"""
+        while True:
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            delay = self._heap[0][0] - self._loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            horizon = self._loop.time() + BATCH_TOLERANCE
+            batch = []
+            while self._heap and self._heap[0][0] <= horizon:
+                _due, _id, record = heapq.heappop(self._heap)
+                if record.cancelled:
+                    continue
+                self._records.pop(record.id, None)
+                batch.append(record)
+
+            if batch:
+                task = self._loop.create_task(self._dispatch(batch))
+                self._dispatch_tasks.add(task)
+                task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, batch: List[DelayedDelivery]):
+        """按源聊天合并重新获取消息，再逐条投递"""
+        self.batches += 1
+        by_chat: Dict[int, List[DelayedDelivery]] = {}
+        for record in batch:
+            by_chat.setdefault(record.chat_id, []).append(record)
+
+        deliveries = []
+        for chat_id, records in by_chat.items():
+            message_ids = sorted({mid for record in records for mid in record.message_ids})
+            try:
+                fetched = await self.client.get_messages(chat_id, ids=message_ids)
+                messages = {m.id: m for m in fetched if m is not None}
+            except Exception as e:
+                logger.error(f"❌ [{self.name}] 获取延迟投递消息失败 (聊天 {chat_id}): {e}")
+                messages = {}
+
+            for record in records:
+                found = [messages[mid] for mid in record.message_ids if mid in messages]
+                if not found:
+                    self.missing += 1
+                    record.release_claim()
+                    logger.warning(f"⚠️ [{self.name}] 延迟投递 {record.id} 的消息已不存在，跳过")
+                    continue
+                deliveries.append(self._deliver(record, found))
+
+        if deliveries:
+            await asyncio.gather(*deliveries, return_exceptions=True)
+
+    async def _deliver(self, record: DelayedDelivery, messages: List[Any]):
+        try:
+            await self.on_due(record, messages)
+            self.delivered += 1
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 延迟投递 {record.id} 失败: {e}")
+
+    async def stop(self):
+        """停止调度任务，丢弃尚未到期的投递"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._dispatch_tasks:
+            await asyncio.gather(*list(self._dispatch_tasks), return_exceptions=True)
+        if self._records:
+            logger.warning(f"⚠️ [{self.name}] 客户端停止，丢弃 {len(self._records)} 个未到期的延迟投递")
+        for record in list(self._records.values()):
+            record.release_claim()
+        self._records.clear()
+        self._heap.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计"""
+        return {
+            "pending": len(self._records),
+            "scheduled": self.scheduled,
+            "delivered": self.delivered,
+            "cancelled": self.cancelled,
+            "missing": self.missing,
+            "batches": self.batches
+        }
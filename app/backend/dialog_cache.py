@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+会话列表缓存 - 每个客户端连接后加载一次会话列表，之后由更新事件增量维护，查询直接读内存
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from telethon import utils
+from telethon.tl import types
+
+from chat_entity_cache import chat_entity_cache, chat_type_of
+
+logger = logging.getLogger(__name__)
+
+
+def _iso(date: Optional[datetime]) -> Optional[str]:
+    return date.isoformat() if date else None
+
+
+class DialogCache:
+    """
+    单个客户端的会话列表缓存（读写均线程安全）
+
+    - load() 在客户端事件循环中通过 iter_dialogs 完整加载一次，连接后和手动刷新时调用；
+      加载期间被更新事件改动过的会话以事件为准，不会被加载结果覆盖
+    - 新消息更新最近消息时间和未读数，入群/退群/改名更新对应会话，未知会话按需取实体加入
+    - 加载和按需获取到的实体同时写入持久化的聊天实体缓存（标题、access hash）
+    - 条目按会话顺序保存（最近有消息的在最后），更新时整体替换条目而不原地修改，
+      查询返回的条目可以直接序列化，不受客户端线程后续更新影响
+    - 机器人无法获取会话列表，只能从收到的消息中逐步建立
+    """
+
+    def __init__(self, client_id: str, client_type: str = "user"):
+        self.client_id = client_id
+        self.client_type = client_type
+        self.client_display_name = f"{client_type}: {client_id}"
+
+        self._chats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 每个会话最新一条消息的ID，用于判断已读更新是否读到了最新消息
+        self._top_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loading: Optional[asyncio.Task] = None
+        # 加载期间被事件改动过的会话ID（加载结束时以事件结果为准）
+        self._touched: Optional[set] = None
+        self._pending = set()
+        self._tasks = set()
+
+        self.loaded = False
+        self.last_refreshed: Optional[float] = None
+
+        # 统计信息
+        self.loads = 0
+        self.updates = 0
+        self.fetches = 0
+        self.queries = 0
+
+    def set_client_info(self, display_name: str):
+        """设置条目中的客户端显示名（获取到登录用户信息后调用）"""
+        self.client_display_name = display_name
+
+    # ---------- 加载 ----------
+
+    async def load(self, client) -> int:
+        """完整加载会话列表；已在加载时等待当前加载完成，返回缓存的会话数"""
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.get_running_loop().create_task(self._load(client))
+        return await asyncio.shield(self._loading)
+
+    async def _load(self, client) -> int:
+        start_time = time.time()
+        with self._lock:
+            self._touched = set()
+
+        chats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        top_ids: Dict[str, int] = {}
+        entities = []
+        try:
+            async for dialog in client.iter_dialogs():
+                try:
+                    chat_id = str(dialog.id)
+                    chats[chat_id] = self._build_entry(
+                        dialog.entity, chat_id, dialog.name, dialog.unread_count, dialog.date
+                    )
+                    entities.append((dialog.id, dialog.entity))
+                    if dialog.message:
+                        top_ids[chat_id] = dialog.message.id
+                except Exception as e:
+                    logger.warning(f"⚠️ 处理会话数据失败: {e}")
+        except Exception as e:
+            with self._lock:
+                self._touched = None
+            if self.client_type == "bot":
+                # 机器人不支持获取会话列表，缓存由收到的消息逐步建立
+                logger.info(f"ℹ️ 客户端 {self.client_id} 为机器人，会话列表将从收到的消息中建立")
+                self.loaded = True
+                return len(self._chats)
+            logger.error(f"❌ 客户端 {self.client_id} 加载会话列表失败: {e}")
+            raise
+
+        # iter_dialogs 按最近消息从新到旧返回，缓存中最新的在最后
+        ordered = OrderedDict(reversed(chats.items()))
+        with self._lock:
+            for chat_id in self._touched:
+                live = self._chats.get(chat_id)
+                if live is None:
+                    ordered.pop(chat_id, None)
+                    top_ids.pop(chat_id, None)
+                else:
+                    ordered[chat_id] = live
+                    ordered.move_to_end(chat_id)
+                    if chat_id in self._top_ids:
+                        top_ids[chat_id] = self._top_ids[chat_id]
+            self._chats = ordered
+            self._top_ids = top_ids
+            self._touched = None
+            self.loaded = True
+            self.last_refreshed = time.time()
+            self.loads += 1
+
+        logger.info(f"✅ 客户端 {self.client_id} 会话列表已加载: {len(ordered)} 个，耗时 {time.time() - start_time:.1f}s")
+        await chat_entity_cache.save(self.client_id, entities)
+        return len(ordered)
+
+    def clear(self):
+        """清空缓存（客户端断开时调用）"""
+        with self._lock:
+            self._chats = OrderedDict()
+            self._top_ids = {}
+            self.loaded = False
+
+    def _build_entry(self, entity, chat_id: str, title: Optional[str], unread_count: int,
+                     date: Optional[datetime]) -> Dict[str, Any]:
+        if not title:
+            title = utils.get_display_name(entity) if entity else None
+        return {
+            "id": chat_id,
+            "title": title or "未知聊天",
+            "type": chat_type_of(entity),
+            "username": getattr(entity, 'username', None),
+            "description": getattr(entity, 'about', None),
+            "members_count": getattr(entity, 'participants_count', 0),
+            "client_id": self.client_id,
+            "client_type": self.client_type,
+            "client_display_name": self.client_display_name,
+            "is_verified": getattr(entity, 'verified', False),
+            "is_scam": getattr(entity, 'scam', False),
+            "is_fake": getattr(entity, 'fake', False),
+            "unread_count": unread_count or 0,
+            "last_message_date": _iso(date)
+        }
+
+    # ---------- 增量更新（在客户端事件循环中调用） ----------
+
+    def _put(self, chat_id: str, entry: Dict[str, Any], to_end: bool = False):
+        """写入条目（调用方持有锁）"""
+        self._chats[chat_id] = entry
+        if to_end:
+            self._chats.move_to_end(chat_id)
+        if self._touched is not None:
+            self._touched.add(chat_id)
+        self.updates += 1
+
+    def _remove(self, chat_id: str):
+        with self._lock:
+            self._chats.pop(chat_id, None)
+            self._top_ids.pop(chat_id, None)
+            if self._touched is not None:
+                self._touched.add(chat_id)
+            self.updates += 1
+
+    def on_message(self, event):
+        """新消息：更新最近消息时间和未读数，未知会话取实体后加入"""
+        message = event.message
+        if not message or not getattr(message, 'peer_id', None):
+            return
+        chat_id = str(utils.get_peer_id(message.peer_id))
+        with self._lock:
+            entry = self._chats.get(chat_id)
+            if entry is not None:
+                # 自己发出消息意味着已读到此处
+                unread_count = 0 if message.out else entry["unread_count"] + 1
+                self._put(chat_id, {**entry, "unread_count": unread_count,
+                                    "last_message_date": _iso(message.date)}, to_end=True)
+                self._top_ids[chat_id] = message.id
+                return
+        self._fetch(chat_id, event.get_chat, unread_count=0 if message.out else 1,
+                    date=message.date, top_id=message.id)
+
+    def on_read(self, event):
+        """收件箱已读：读到最新一条消息时未读数清零（部分已读的数量无法得知，刷新时修正）"""
+        if event.outbox:
+            return
+        chat_id = str(event.chat_id)
+        with self._lock:
+            entry = self._chats.get(chat_id)
+            if entry is None or not entry["unread_count"]:
+                return
+            if event.max_id and event.max_id >= self._top_ids.get(chat_id, 0):
+                self._put(chat_id, {**entry, "unread_count": 0})
+
+    def on_chat_action(self, event, self_id: Optional[int]):
+        """成员变动与改名：自己入群/建群时加入，自己退出/被移出时删除，改名时更新标题"""
+        chat_id = str(event.chat_id)
+        involves_me = self_id is not None and self_id in event.user_ids
+
+        if (event.user_left or event.user_kicked) and involves_me:
+            self._remove(chat_id)
+            return
+
+        with self._lock:
+            entry = self._chats.get(chat_id)
+            if entry is not None and event.new_title:
+                self._put(chat_id, {**entry, "title": event.new_title})
+
+        if entry is not None:
+            if event.new_title:
+                # 重新获取实体（来自更新本身，无需网络请求），同步到聊天实体缓存
+                self._fetch(chat_id, event.get_chat, unread_count=0, date=None, refetch=True)
+        elif event.created or ((event.user_joined or event.user_added) and involves_me):
+            date = event.action_message.date if event.action_message else None
+            self._fetch(chat_id, event.get_chat, unread_count=0, date=date)
+
+    def on_channel_update(self, client, update: types.UpdateChannel):
+        """频道状态变化（加入、退出、被移出频道时收到）：重新获取频道实体判断是否仍在其中"""
+        chat_id = str(utils.get_peer_id(types.PeerChannel(update.channel_id)))
+
+        async def get_channel():
+            return await client.get_entity(types.PeerChannel(update.channel_id))
+
+        self._fetch(chat_id, get_channel, unread_count=0, date=None, refetch=True, drop_on_error=True)
+
+    def _fetch(self, chat_id: str, get_entity, unread_count: int, date: Optional[datetime],
+               top_id: int = None, refetch: bool = False, drop_on_error: bool = False):
+        """
+        后台获取实体并加入缓存；同一会话同时只获取一次
+
+        Args:
+            refetch: 更新已有会话（保留未读数和最近消息时间）
+            drop_on_error: 获取失败时从缓存中删除（已无权访问）
+        """
+        if chat_id in self._pending:
+            return
+        self._pending.add(chat_id)
+
+        async def run():
+            try:
+                try:
+                    entity = await get_entity()
+                except Exception as e:
+                    if drop_on_error:
+                        # 已无权访问（被移出或频道已删除）
+                        self._remove(chat_id)
+                    logger.debug(f"获取会话 {chat_id} 实体失败: {e}")
+                    return
+                self.fetches += 1
+                if entity is None:
+                    return
+                if getattr(entity, 'left', False):
+                    self._remove(chat_id)
+                    return
+                with self._lock:
+                    existing = self._chats.get(chat_id)
+                    entry = self._build_entry(
+                        entity, chat_id, None,
+                        existing["unread_count"] if existing and refetch else unread_count,
+                        date
+                    )
+                    if existing and refetch:
+                        entry["last_message_date"] = existing["last_message_date"]
+                    self._put(chat_id, entry, to_end=existing is None or not refetch)
+                    if top_id:
+                        self._top_ids[chat_id] = top_id
+                await chat_entity_cache.save(self.client_id, [(int(chat_id), entity)])
+            finally:
+                self._pending.discard(chat_id)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ---------- 查询（任意线程） ----------
+
+    def query(self, search: str = None, chat_type: str = None,
+              offset: int = 0, limit: int = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        按会话顺序（最近有消息的在前）筛选、搜索并分页
+
+        Args:
+            search: 匹配标题、用户名、ID、简介（不区分大小写）
+            chat_type: user / group / channel
+            offset: 跳过的条数
+            limit: 返回条数，None 为全部
+
+        Returns:
+            (当前页条目, 符合条件的总数)
+        """
+        with self._lock:
+            entries = list(reversed(self._chats.values()))
+        self.queries += 1
+
+        if chat_type:
+            entries = [entry for entry in entries if entry["type"] == chat_type]
+        if search:
+            term = search.strip().lower()
+            entries = [
+                entry for entry in entries
+                if term in entry["id"]
+                or term in (entry["title"] or "").lower()
+                or term in (entry["username"] or "").lower()
+                or term in (entry["description"] or "").lower()
+            ]
+
+        total = len(entries)
+        offset = max(0, offset)
+        if limit is None:
+            return entries[offset:], total
+        return entries[offset:offset + limit], total
+
+    def get(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """按ID获取单个会话"""
+        with self._lock:
+            return self._chats.get(str(chat_id))
+
+    def __len__(self) -> int:
+        return len(self._chats)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "size": len(self._chats),
+            "loaded": self.loaded,
+            "loading": self._loading is not None and not self._loading.done(),
+            "last_refreshed": datetime.fromtimestamp(self.last_refreshed).isoformat() if self.last_refreshed else None,
+            "loads": self.loads,
+            "updates": self.updates,
+            "fetches": self.fetches,
+            "queries": self.queries
+        }
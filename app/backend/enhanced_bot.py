@@ -6,12 +6,16 @@ import asyncio
 import logging
 import signal
 import sys
+import time
 from typing import Dict, Any
 from pathlib import Path
 
 from telegram_client_manager import MultiClientManager, multi_client_manager
 from config import Config, validate_config
 from database import init_database
+from rule_index import rule_index
+from dedup_guard import dedup_guard
+from chat_entity_cache import chat_entity_cache
 from utils import setup_logging
 
 class EnhancedTelegramBot:
@@ -50,12 +54,13 @@ class EnhancedTelegramBot:
                 self.logger.error(f"状态回调执行失败: {e}")
     
     async def _auto_start_clients(self):
-        """自动启动设置了auto_start=True的客户端"""
+        """自动启动设置了auto_start=True的客户端（并发启动，同时启动数不超过 CLIENT_START_CONCURRENCY）"""
         try:
             from models import TelegramClient
             from database import get_db
             from sqlalchemy import select
             
+            auto_start_clients = []
             async for db in get_db():
                 # 查询所有启用自动启动的客户端
                 result = await db.execute(
@@ -65,47 +70,64 @@ class EnhancedTelegramBot:
                     )
                 )
                 auto_start_clients = result.scalars().all()
-                
-                if auto_start_clients:
-                    self.logger.info(f"🔄 发现 {len(auto_start_clients)} 个需要自动启动的客户端")
-                    
-                    for db_client in auto_start_clients:
-                        try:
-                            # 准备配置数据
-                            config_data = {}
-                            if db_client.client_type == 'bot':
-                                config_data = {
-                                    'bot_token': db_client.bot_token,
-                                    'admin_user_id': db_client.admin_user_id
-                                }
-                            elif db_client.client_type == 'user':
-                                config_data = {
-                                    'api_id': db_client.api_id,
-                                    'api_hash': db_client.api_hash,
-                                    'phone': db_client.phone
-                                }
-                            
-                            # 添加到运行时管理器
-                            client = self.multi_client_manager.add_client_with_config(
-                                db_client.client_id,
-                                db_client.client_type,
-                                config_data=config_data
-                            )
-                            client.add_status_callback(self._notify_status_change)
-                            
-                            # 启动客户端
-                            client.start()
-                            self.logger.info(f"✅ 自动启动客户端: {db_client.client_id} ({db_client.client_type})")
-                            
-                        except Exception as client_error:
-                            self.logger.error(f"❌ 自动启动客户端 {db_client.client_id} 失败: {client_error}")
-                else:
-                    self.logger.info("💡 没有设置自动启动的客户端")
                 break
+            
+            if not auto_start_clients:
+                self.logger.info("💡 没有设置自动启动的客户端")
+                return
+            
+            concurrency = max(1, Config.CLIENT_START_CONCURRENCY)
+            self.logger.info(f"🔄 发现 {len(auto_start_clients)} 个需要自动启动的客户端（同时启动 {concurrency} 个）")
+            semaphore = asyncio.Semaphore(concurrency)
+            start_time = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._auto_start_client(db_client, semaphore) for db_client in auto_start_clients)
+            )
+            self.logger.info(
+                f"✅ 自动启动完成: {sum(results)}/{len(results)} 个客户端已连接，"
+                f"耗时 {time.perf_counter() - start_time:.1f}s"
+            )
                 
         except Exception as e:
             self.logger.error(f"❌ 自动启动客户端失败: {e}")
     
+    async def _auto_start_client(self, db_client, semaphore: asyncio.Semaphore) -> bool:
+        """启动单个自动启动客户端并等待启动完成，返回是否已连接"""
+        async with semaphore:
+            try:
+                # 准备配置数据
+                config_data = {}
+                if db_client.client_type == 'bot':
+                    config_data = {
+                        'bot_token': db_client.bot_token,
+                        'admin_user_id': db_client.admin_user_id
+                    }
+                elif db_client.client_type == 'user':
+                    config_data = {
+                        'api_id': db_client.api_id,
+                        'api_hash': db_client.api_hash,
+                        'phone': db_client.phone
+                    }
+                
+                # 添加到运行时管理器
+                client = self.multi_client_manager.add_client_with_config(
+                    db_client.client_id,
+                    db_client.client_type,
+                    config_data=config_data
+                )
+                client.add_status_callback(self._notify_status_change)
+                
+                # 启动客户端（等待期间不阻塞事件循环）
+                if await client.start_async():
+                    self.logger.info(f"✅ 自动启动客户端: {db_client.client_id} ({db_client.client_type})")
+                    return True
+                self.logger.warning(f"⚠️ 自动启动客户端 {db_client.client_id} 未能完成连接")
+                return False
+                
+            except Exception as client_error:
+                self.logger.error(f"❌ 自动启动客户端 {db_client.client_id} 失败: {client_error}")
+                return False
+    
     async def _migrate_legacy_clients(self):
         """迁移传统客户端到数据库"""
         try:
@@ -299,6 +321,16 @@ class EnhancedTelegramBot:
             # 验证数据完整性并自动修复
             await self._verify_and_fix_database()
             
+            # 构建内存规则索引（消息处理热路径不再查询数据库）
+            await rule_index.rebuild()
+            # 加载去重高水位（实时消息无需查询数据库即可判定未转发）
+            await dedup_guard.warm_up()
+            # 加载聊天实体缓存（规则和日志中的聊天名称直接读取，无需网络请求）
+            await chat_entity_cache.warm_up()
+            
+            # 启用时启动客户端工作进程（之后添加的客户端都运行在工作进程中）
+            await self.multi_client_manager.start_workers()
+            
             # 自动启动设置了auto_start=True的客户端
             await self._auto_start_clients()
             
@@ -324,7 +356,8 @@ class EnhancedTelegramBot:
         self.logger.info("🛑 停止机器人...")
         
         self.running = False
-        self.multi_client_manager.stop_all()
+        # 等待各客户端线程退出，不阻塞事件循环
+        await asyncio.to_thread(self.multi_client_manager.stop_all)
         
         self.logger.info("✅ 机器人已停止")
     
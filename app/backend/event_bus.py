@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+服务端事件推送 - 客户端状态、新转发日志和运行计数通过 SSE 推送给前端，取代轮询
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 无事件时发送心跳注释的间隔（秒），防止代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+# 一条推送中最多携带的日志条数（突发时只保留最新的）
+MAX_LOGS_PER_MESSAGE = 100
+# EventSource 断线重连间隔（毫秒）
+RETRY_MS = 3000
+
+
+class EventBus:
+    """
+    进程级事件总线
+
+    - publish() 线程安全，可在客户端线程中调用；事件写入有界环形缓冲区并唤醒订阅者
+    - 事件ID 为 "<启动时间>-<序号>"，重连时浏览器通过 Last-Event-ID 带回，
+      缓冲区仍包含之后的事件则补发，否则（缓冲区已覆盖或服务已重启）发送完整快照
+    - 订阅者被唤醒后等待 EVENT_COALESCE_WINDOW 秒再合并发送：
+      同一客户端的状态只保留最新一条，计数只保留最新值，日志合并为一条推送
+    - 有订阅者时每 EVENT_COUNTERS_INTERVAL 秒采集一次运行计数，变化时才发布
+    """
+
+    def __init__(self, buffer_size: int = None):
+        self.buffer_size = max(10, buffer_size or Config.EVENT_BUFFER_SIZE)
+        self.epoch = str(int(time.time()))
+        self._events: "deque[Tuple[int, str, Dict[str, Any]]]" = deque(maxlen=self.buffer_size)
+        self._next_seq = 1
+        self._lock = threading.Lock()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: set = set()
+        self._wake_pending = False
+        self._counters_task: Optional[asyncio.Task] = None
+        self._last_counters = None
+
+        self._snapshot_provider: Optional[Callable[[], Dict[str, Any]]] = None
+        self._counters_provider: Optional[Callable[[], Dict[str, Any]]] = None
+        # 客户端工作进程中把事件转交给主进程发布，本进程不缓冲
+        self._forwarder: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+        # 统计信息
+        self.published = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.resumed = 0
+        self.snapshots = 0
+
+    def set_snapshot_provider(self, provider: Callable[[], Dict[str, Any]]):
+        """设置完整状态快照的生成函数（新连接和无法续传时发送）"""
+        self._snapshot_provider = provider
+
+    def set_counters_provider(self, provider: Callable[[], Dict[str, Any]]):
+        """设置运行计数的采集函数"""
+        self._counters_provider = provider
+
+    def set_forwarder(self, forwarder: Callable[[str, Dict[str, Any]], None]):
+        """设置事件转发函数（客户端工作进程中使用，事件经进程间通道交给主进程的事件总线）"""
+        self._forwarder = forwarder
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        """发布事件（线程安全）"""
+        if self._forwarder is not None:
+            self._forwarder(event_type, data)
+            return
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._events.append((seq, event_type, data))
+            self.published += 1
+            wake = self._loop is not None and bool(self._subscribers) and not self._wake_pending
+            if wake:
+                self._wake_pending = True
+        if wake:
+            try:
+                self._loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                # 事件循环已关闭
+                self._wake_pending = False
+
+    def _wake(self):
+        self._wake_pending = False
+        for waiter in self._subscribers:
+            waiter.set()
+
+    def _event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _parse_event_id(self, event_id: Optional[str]) -> Optional[int]:
+        """解析重连时带回的事件ID；不是本次启动产生的ID返回 None"""
+        if not event_id:
+            return None
+        epoch, _, seq = event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def _events_after(self, seq: int) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """
+        Returns:
+            (seq 之后的事件, 是否完整)；缓冲区已丢弃部分事件时不完整
+        """
+        with self._lock:
+            last_seq = self._next_seq - 1
+            if seq > last_seq:
+                return [], False
+            if self._events and self._events[0][0] > seq + 1:
+                return [], False
+            return [event for event in self._events if event[0] > seq], True
+
+    def _current_seq(self) -> int:
+        with self._lock:
+            return self._next_seq - 1
+
+    def _coalesce(self, events: List[Tuple[int, str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        """合并一批事件：客户端状态按客户端取最新，计数取最新，日志合并"""
+        statuses: Dict[str, Dict[str, Any]] = {}
+        counters = None
+        logs: List[Dict[str, Any]] = []
+        log_counts: Dict[str, int] = {}
+        others = []
+
+        for _seq, event_type, data in events:
+            if event_type == 'client_status':
+                statuses.pop(data.get('client_id'), None)
+                statuses[data.get('client_id')] = data
+            elif event_type == 'counters':
+                counters = data
+            elif event_type == 'logs':
+                logs.extend(data.get('items', []))
+                for status, count in data.get('counts', {}).items():
+                    log_counts[status] = log_counts.get(status, 0) + count
+            else:
+                others.append((event_type, data))
+
+        messages = others + [('client_status', data) for data in statuses.values()]
+        if logs or log_counts:
+            messages.append(('logs', {
+                "items": logs[-MAX_LOGS_PER_MESSAGE:],
+                "counts": log_counts,
+                "truncated": max(0, len(logs) - MAX_LOGS_PER_MESSAGE)
+            }))
+        if counters is not None:
+            messages.append(('counters', counters))
+        self.coalesced += len(events) - len(messages)
+        return messages
+
+    def _snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        if self._snapshot_provider:
+            try:
+                snapshot = self._snapshot_provider()
+            except Exception as e:
+                logger.error(f"❌ 生成状态快照失败: {e}")
+        if self._last_counters is not None:
+            snapshot["counters"] = self._last_counters
+        self.snapshots += 1
+        return snapshot
+
+    @staticmethod
+    def _format(event_type: str, data: Dict[str, Any], event_id: str = None) -> str:
+        lines = []
+        if event_id:
+            lines.append(f"id: {event_id}")
+        lines.append(f"event: {event_type}")
+        lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+        return "\n".join(lines) + "\n\n"
+
+    def _ensure_started(self):
+        """在 Web 事件循环中绑定并启动计数采集（首个订阅者连接时）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._counters_task = None
+        if self._counters_task is None or self._counters_task.done():
+            self._counters_task = loop.create_task(self._collect_counters())
+
+    async def _collect_counters(self):
+        """有订阅者时定期采集运行计数，变化时发布"""
+        while True:
+            await asyncio.sleep(max(1.0, Config.EVENT_COUNTERS_INTERVAL))
+            if not self._subscribers or not self._counters_provider:
+                continue
+            try:
+                counters = self._counters_provider()
+            except Exception as e:
+                logger.error(f"❌ 采集运行计数失败: {e}")
+                continue
+            if counters != self._last_counters:
+                self._last_counters = counters
+                self.publish('counters', counters)
+
+    async def stream(self, last_event_id: str = None,
+                     is_disconnected: Callable = None) -> AsyncIterator[str]:
+        """
+        生成 SSE 数据流
+
+        Args:
+            last_event_id: 浏览器重连时带回的 Last-Event-ID
+            is_disconnected: 返回连接是否已断开的协程函数
+        """
+        self._ensure_started()
+        waiter = asyncio.Event()
+        self._subscribers.add(waiter)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+
+            seq = self._parse_event_id(last_event_id)
+            events, complete = self._events_after(seq) if seq is not None else ([], False)
+            if complete:
+                self.resumed += 1
+            else:
+                # 新连接或无法续传：先发送完整快照，之后从当前位置继续
+                seq = self._current_seq()
+                yield self._format('snapshot', self._snapshot(), self._event_id(seq))
+                events = []
+
+            while True:
+                if events:
+                    messages = self._coalesce(events)
+                    seq = events[-1][0]
+                    for index, (event_type, data) in enumerate(messages):
+                        # 只在一批的最后一条带ID，中途断开时重连会重发整批（各事件均可重复应用）
+                        event_id = self._event_id(seq) if index == len(messages) - 1 else None
+                        yield self._format(event_type, data, event_id)
+                        self.sent += 1
+
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if is_disconnected and await is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    events = []
+                    continue
+
+                waiter.clear()
+                if is_disconnected and await is_disconnected():
+                    return
+                # 等待合并窗口，把突发的多个事件合并为一次推送
+                await asyncio.sleep(max(0.0, Config.EVENT_COALESCE_WINDOW))
+                waiter.clear()
+                events, complete = self._events_after(seq)
+                if not complete:
+                    # 推送落后于缓冲区（订阅者过慢），重新发送快照
+                    seq = self._current_seq()
+                    yield self._format('snapshot', self._snapshot(), self._event_id(seq))
+                    events = []
+        finally:
+            self._subscribers.discard(waiter)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取事件推送统计"""
+        return {
+            "subscribers": len(self._subscribers),
+            "buffered": len(self._events),
+            "buffer_size": self.buffer_size,
+            "published": self.published,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "resumed": self.resumed,
+            "snapshots": self.snapshots
+        }
+
+
+# 全局事件总线实例
+event_bus = EventBus()
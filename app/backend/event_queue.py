@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+事件工作池 - 用有界队列和固定数量的工作协程处理 Telegram 新消息/编辑事件
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+from telethon import utils
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 溢出策略
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_SPILL = "spill"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_SPILL)
+
+# 利用率统计窗口（秒）
+UTILISATION_WINDOW = 60
+
+
+class _SpilledEvent:
+    """从溢出文件恢复的事件（只需提供 message 属性）"""
+    __slots__ = ('message',)
+
+    def __init__(self, message):
+        self.message = message
+
+
+class EventWorkerPool:
+    """
+    事件工作池（每个 TelegramClientManager 一个，运行在客户端事件循环中）
+
+    - 事件处理器只负责入队，由固定数量的工作协程取出处理，任务数不再随消息量增长
+    - 队列有界，写满时按溢出策略处理：
+        block       等待队列空位（背压传导到 Telethon 的更新分发）
+        drop_oldest 丢弃最早入队的事件
+        spill       把事件的聊天ID/消息ID写入磁盘文件，队列有空位后重新获取消息再入队
+    - 统计队列深度、工作协程利用率和入队到开始处理的延迟
+    """
+
+    def __init__(self, name: str, client, handler: Callable[[Any, bool], Awaitable[None]],
+                 workers: int = None, max_size: int = None, overflow: str = None):
+        self.name = name
+        self.client = client
+        self.handler = handler
+        self.workers = max(1, workers or Config.EVENT_WORKERS)
+        self.max_size = max(1, max_size or Config.EVENT_QUEUE_SIZE)
+        self.overflow = (overflow or Config.EVENT_OVERFLOW_POLICY).lower()
+        if self.overflow not in OVERFLOW_POLICIES:
+            logger.warning(f"⚠️ 未知的事件溢出策略 {self.overflow}，使用 {OVERFLOW_BLOCK}")
+            self.overflow = OVERFLOW_BLOCK
+
+        self.spill_path = os.path.join(Config.DATA_DIR, f"event_spill_{name}.jsonl")
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._drain_task: Optional[asyncio.Task] = None
+        self._spilled = 0
+        self._space_available: Optional[asyncio.Event] = None
+
+        # 统计信息
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled_total = 0
+        self.restored = 0
+        self.blocked = 0
+        self.busy = 0
+        self._latencies = deque(maxlen=1000)
+        self._max_latency = 0.0
+        self._window_start = time.monotonic()
+        self._window_busy = 0.0
+        self._utilisation = 0.0
+
+    def start(self):
+        """在当前事件循环中启动工作协程"""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._space_available = asyncio.Event()
+        self._workers = [
+            loop.create_task(self._worker(), name=f"EventWorker-{self.name}-{i}")
+            for i in range(self.workers)
+        ]
+
+        # 恢复上次运行遗留的溢出事件
+        if self.overflow == OVERFLOW_SPILL and os.path.exists(self.spill_path):
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                self._spilled = sum(1 for line in f if line.strip())
+            if self._spilled:
+                logger.info(f"📂 [{self.name}] 发现 {self._spilled} 个溢出事件，将在队列空闲时恢复")
+                self._ensure_drain()
+
+        logger.info(f"👷 [{self.name}] 事件工作池已启动: {self.workers} 个工作协程, 队列上限 {self.max_size}, 溢出策略 {self.overflow}")
+
+    async def submit(self, event, is_edited: bool = False):
+        """提交一个事件（由 Telethon 事件处理器调用）"""
+        item = (event, is_edited, time.monotonic())
+
+        if self.overflow == OVERFLOW_SPILL and (self._spilled or self._drain_task):
+            # 已有溢出事件时新事件也先落盘，保持先后顺序
+            self._spill(event, is_edited)
+            return
+
+        try:
+            self._queue.put_nowait(item)
+            self.enqueued += 1
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+            self._queue.put_nowait(item)
+            self.enqueued += 1
+        elif self.overflow == OVERFLOW_SPILL:
+            self._spill(event, is_edited)
+        else:
+            self.blocked += 1
+            await self._queue.put(item)
+            self.enqueued += 1
+
+    def _spill(self, event, is_edited: bool):
+        """把事件的最小信息写入溢出文件"""
+        try:
+            message = event.message
+            record = {
+                "chat_id": utils.get_peer_id(message.peer_id),
+                "message_id": message.id,
+                "is_edited": is_edited
+            }
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+            self._spilled += 1
+            self.spilled_total += 1
+            self._ensure_drain()
+        except Exception as e:
+            self.dropped += 1
+            logger.error(f"❌ [{self.name}] 写入溢出文件失败，事件已丢弃: {e}")
+
+    def _ensure_drain(self):
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self):
+        """队列有空位后把溢出事件重新获取并入队"""
+        try:
+            while self._spilled:
+                # 等到队列至少空出一半再恢复，避免刚恢复又溢出
+                while self._queue.qsize() > self.max_size // 2:
+                    self._space_available.clear()
+                    await self._space_available.wait()
+
+                with open(self.spill_path, 'r', encoding='utf-8') as f:
+                    records = [json.loads(line) for line in f if line.strip()]
+                os.remove(self.spill_path)
+                self._spilled = 0
+
+                for start in range(0, len(records), 100):
+                    await self._restore(records[start:start + 100])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ [{self.name}] 恢复溢出事件失败: {e}")
+        finally:
+            self._drain_task = None
+
+    async def _restore(self, records: list):
+        """按聊天合并重新获取消息并入队"""
+        by_chat: Dict[int, list] = {}
+        for record in records:
+            by_chat.setdefault(record["chat_id"], []).append(record)
+
+        for chat_id, chat_records in by_chat.items():
+            try:
+                messages = await self.client.get_messages(chat_id, ids=[r["message_id"] for r in chat_records])
+            except Exception as e:
+                self.dropped += len(chat_records)
+                logger.error(f"❌ [{self.name}] 获取溢出事件消息失败 (聊天 {chat_id}): {e}")
+                continue
+
+            for record, message in zip(chat_records, messages):
+                if message is None:
+                    self.dropped += 1
+                    continue
+                await self._queue.put((_SpilledEvent(message), record["is_edited"], time.monotonic()))
+                self.enqueued += 1
+                self.restored += 1
+
+    async def _worker(self):
+        """工作协程：串行处理队列中的事件"""
+        queue = self._queue
+        while True:
+            event, is_edited, enqueued_at = await queue.get()
+            started_at = time.monotonic()
+            latency = started_at - enqueued_at
+            self._latencies.append(latency)
+            self._max_latency = max(self._max_latency, latency)
+            if queue.qsize() <= self.max_size // 2:
+                self._space_available.set()
+
+            self.busy += 1
+            try:
+                await self.handler(event, is_edited)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ [{self.name}] 事件处理失败: {e}")
+            finally:
+                self.busy -= 1
+                self._record_busy(time.monotonic() - started_at)
+                queue.task_done()
+
+    def _record_busy(self, seconds: float):
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= UTILISATION_WINDOW:
+            self._utilisation = min(1.0, self._window_busy / (self.workers * elapsed))
+            self._window_start = now
+            self._window_busy = 0.0
+        self._window_busy += seconds
+
+    async def stop(self, timeout: float = 10):
+        """停止工作池：等待已入队的事件处理完毕（超时则取消）"""
+        if self._drain_task and not self._drain_task.done():
+            self._drain_task.cancel()
+        if self._queue is not None and self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ [{self.name}] 事件工作池停止超时，剩余 {self._queue.qsize()} 个事件未处理")
+            for task in self._workers:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工作池统计"""
+        latencies = sorted(self._latencies)
+        elapsed = time.monotonic() - self._window_start
+        # 当前窗口足够长时使用当前窗口，否则使用上一个完整窗口
+        utilisation = self._utilisation
+        if elapsed >= 5:
+            utilisation = min(1.0, self._window_busy / (self.workers * elapsed))
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_size,
+            "overflow_policy": self.overflow,
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "utilisation": round(utilisation, 3),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "spilled_pending": self._spilled,
+            "spilled_total": self.spilled_total,
+            "restored": self.restored,
+            "latency_avg_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "latency_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else 0.0,
+            "latency_max_ms": round(self._max_latency * 1000, 2)
+        }
@@ -1,123 +1,522 @@
 import re
-from typing import List, Optional
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set
 from loguru import logger
 from models import Keyword, ReplaceRule
 
-class KeywordFilter:
-    """关键词过滤器"""
+try:
+    import ahocorasick  # pyahocorasick（可选，C实现的Aho-Corasick自动机）
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
+
+class AhoCorasickAutomaton:
+    """
+    多模式字符串匹配自动机
+
+    一次扫描文本即可找出所有命中的模式。安装了 pyahocorasick 时使用其C实现，
+    否则回退到纯Python实现。
+    """
     
-    def should_forward(self, text: str, keywords: List[Keyword]) -> bool:
-        """
-        判断消息是否应该被转发
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        # 空字符串视为总是命中（与 "" in text 的语义一致）
+        self.has_empty = False
         
-        Args:
-            text: 消息文本
-            keywords: 关键词列表
-            
-        Returns:
-            bool: True表示应该转发，False表示不转发
-        """
-        if not text or not keywords:
+        for pattern in patterns:
+            if pattern:
+                self.patterns.append(pattern)
+            else:
+                self.has_empty = True
+        
+        self._automaton = None
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._output: List[tuple] = []
+        
+        if not self.patterns:
+            return
+        
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for index, pattern in enumerate(self.patterns):
+                self._automaton.add_word(pattern, index)
+            self._automaton.make_automaton()
+        else:
+            self._build()
+    
+    def __bool__(self):
+        return bool(self.patterns) or self.has_empty
+    
+    def __len__(self):
+        return len(self.patterns)
+    
+    def _build(self):
+        """构建纯Python版本的goto/fail/output表"""
+        goto = [{}]
+        output = [[]]
+        
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append(index)
+        
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                output[next_state].extend(output[fail[next_state]])
+        
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(out) for out in output]
+    
+    def iter_matches(self, text: str) -> Iterator[int]:
+        """按出现顺序产出命中模式的下标（同一模式可能多次产出）"""
+        if not self.patterns or not text:
+            return
+        
+        if self._automaton is not None:
+            for _end, index in self._automaton.iter(text):
+                yield index
+            return
+        
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield from output[state]
+    
+    def search(self, text: str) -> bool:
+        """文本中是否存在任一模式"""
+        if self.has_empty:
+            return True
+        for _ in self.iter_matches(text):
             return True
+        return False
+    
+    def find_all(self, text: str) -> Set[int]:
+        """返回文本中命中的所有模式下标"""
+        return set(self.iter_matches(text))
+
+
+class KeywordGroup:
+    """
+    一组关键词（包含或排除）的编译结果
+
+    - 普通关键词按是否区分大小写分别放入两个Aho-Corasick自动机
+    - 不含分组的正则关键词合并为一个交替模式，不区分大小写的用 (?i:...) 局部标记；
+      含分组或反向引用的合并后分组编号会改变，逐个匹配
+    """
+    
+    def __init__(self, keywords: List[Keyword]):
+        self.size = len(keywords)
+        self.case_sensitive = AhoCorasickAutomaton(
+            k.keyword for k in keywords if not k.is_regex and k.case_sensitive
+        )
+        self.case_insensitive = AhoCorasickAutomaton(
+            k.keyword.lower() for k in keywords if not k.is_regex and not k.case_sensitive
+        )
+        self.regexes = self._compile_regex([k for k in keywords if k.is_regex])
+    
+    @staticmethod
+    def _compile_regex(keywords: List[Keyword]) -> list:
+        """编译正则关键词：不含分组的合并为单个交替模式，其余（含分组、反向引用或无法合并的）逐个匹配"""
+        parts = []
+        mergeable = []
+        separate = []
+        for keyword in keywords:
+            flags = re.MULTILINE if keyword.case_sensitive else re.MULTILINE | re.IGNORECASE
+            try:
+                pattern = re.compile(keyword.keyword, flags)
+            except re.error as e:
+                logger.error(f"正则表达式错误: {keyword.keyword}, 错误: {e}")
+                continue
+            if pattern.groups:
+                separate.append(pattern)
+                continue
+            mergeable.append(pattern)
+            parts.append(f"(?:{keyword.keyword})" if keyword.case_sensitive else f"(?i:{keyword.keyword})")
         
-        text_lower = text.lower()
+        if len(mergeable) <= 1:
+            return mergeable + separate
         
-        # 分离包含和排除关键词
-        include_keywords = [k for k in keywords if not k.is_exclude]
-        exclude_keywords = [k for k in keywords if k.is_exclude]
+        try:
+            return [re.compile("|".join(parts), re.MULTILINE)] + separate
+        except re.error:
+            logger.debug(f"正则关键词无法合并，使用逐个匹配: {len(mergeable)} 个")
+            return mergeable + separate
+    
+    def __bool__(self):
+        return self.size > 0
+    
+    def matches(self, text: str, text_lower: str) -> bool:
+        """文本是否命中本组任一关键词"""
+        if self.case_sensitive and self.case_sensitive.search(text):
+            return True
+        if self.case_insensitive and self.case_insensitive.search(text_lower):
+            return True
+        return any(pattern.search(text) for pattern in self.regexes)
+
+
+class CompiledKeywordMatcher:
+    """按规则编译的关键词匹配器：排除组优先，其次包含组"""
+    
+    def __init__(self, keywords: List[Keyword]):
+        keywords = [k for k in (keywords or []) if k.keyword is not None]
+        self.include = KeywordGroup([k for k in keywords if not k.is_exclude])
+        self.exclude = KeywordGroup([k for k in keywords if k.is_exclude])
+    
+    def __bool__(self):
+        return bool(self.include) or bool(self.exclude)
+    
+    def should_forward(self, text: str) -> bool:
+        """判断消息是否应该被转发"""
+        if not text or not self:
+            return True
+        
+        text_lower = text.lower()
         
         # 如果有排除关键词且匹配，则不转发
-        if exclude_keywords and self._match_keywords(text_lower, exclude_keywords):
+        if self.exclude and self.exclude.matches(text, text_lower):
             logger.debug(f"消息被排除关键词过滤: {text[:50]}...")
             return False
         
         # 如果没有包含关键词，则转发
-        if not include_keywords:
+        if not self.include:
             return True
         
-        # 检查是否匹配包含关键词
-        if self._match_keywords(text_lower, include_keywords):
+        if self.include.matches(text, text_lower):
             logger.debug(f"消息匹配关键词，准备转发: {text[:50]}...")
             return True
         
         logger.debug(f"消息不匹配任何关键词，跳过转发: {text[:50]}...")
         return False
+
+
+class MatchPlan:
+    """
+    单个源聊天的多规则关键词匹配计划
+
+    把该聊天所有规则的关键词合并到同一组自动机中，每个模式映射到
+    “包含/排除”两个规则位图（以 int 作为位集）。一条消息只扫描一次，
+    即可得出哪些规则通过关键词过滤；正则按模式去重，且仅在仍可能
+    影响结果的规则存在时才执行。
+    """
     
-    def _match_keywords(self, text: str, keywords: List[Keyword]) -> bool:
-        """检查文本是否匹配关键词列表中的任一关键词"""
-        for keyword in keywords:
-            if self._match_single_keyword(text, keyword):
-                return True
-        return False
+    def __init__(self, rule_keywords: List[Optional[List[Keyword]]]):
+        """
+        Args:
+            rule_keywords: 按规则顺序排列的关键词列表；None 表示该规则不做关键词过滤
+        """
+        self.rule_count = len(rule_keywords)
+        self.all_mask = (1 << self.rule_count) - 1
+        # 不做关键词过滤的规则
+        self.unfiltered_mask = 0
+        # 没有包含关键词（仅排除）的规则：未被排除即通过
+        self.no_include_mask = 0
+        # 空关键词视为总是命中
+        self.base_include = 0
+        self.base_exclude = 0
+        
+        plain_cs: Dict[str, list] = {}
+        plain_ci: Dict[str, list] = {}
+        regex_masks: Dict[tuple, list] = {}
+        
+        for position, keywords in enumerate(rule_keywords):
+            bit = 1 << position
+            keywords = [k for k in (keywords or []) if k.keyword is not None]
+            if not keywords:
+                self.unfiltered_mask |= bit
+                continue
+            
+            if all(k.is_exclude for k in keywords):
+                self.no_include_mask |= bit
+            
+            for keyword in keywords:
+                slot = 1 if keyword.is_exclude else 0
+                if keyword.is_regex:
+                    masks = regex_masks.setdefault((keyword.keyword, bool(keyword.case_sensitive)), [0, 0])
+                elif not keyword.keyword:
+                    if keyword.is_exclude:
+                        self.base_exclude |= bit
+                    else:
+                        self.base_include |= bit
+                    continue
+                elif keyword.case_sensitive:
+                    masks = plain_cs.setdefault(keyword.keyword, [0, 0])
+                else:
+                    masks = plain_ci.setdefault(keyword.keyword.lower(), [0, 0])
+                masks[slot] |= bit
+        
+        self.case_sensitive = AhoCorasickAutomaton(plain_cs.keys())
+        self.case_sensitive_masks = [tuple(plain_cs[p]) for p in self.case_sensitive.patterns]
+        self.case_insensitive = AhoCorasickAutomaton(plain_ci.keys())
+        self.case_insensitive_masks = [tuple(plain_ci[p]) for p in self.case_insensitive.patterns]
+        
+        self.regexes = []
+        for (pattern, case_sensitive), (include_mask, exclude_mask) in regex_masks.items():
+            flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+            try:
+                self.regexes.append((re.compile(pattern, flags), include_mask, exclude_mask))
+            except re.error as e:
+                logger.error(f"正则表达式错误: {pattern}, 错误: {e}")
+        
+        self.pattern_count = len(self.case_sensitive) + len(self.case_insensitive) + len(self.regexes)
     
-    def _match_single_keyword(self, text: str, keyword: Keyword) -> bool:
-        """检查文本是否匹配单个关键词"""
-        try:
-            if keyword.is_regex:
-                # 正则表达式匹配
-                pattern = re.compile(keyword.keyword, re.IGNORECASE | re.MULTILINE)
-                return bool(pattern.search(text))
-            else:
-                # 普通字符串匹配
-                return keyword.keyword.lower() in text
-        except re.error as e:
-            logger.error(f"正则表达式错误: {keyword.keyword}, 错误: {e}")
-            return False
-        except Exception as e:
-            logger.error(f"关键词匹配错误: {e}")
-            return False
+    def match(self, text: str) -> int:
+        """返回通过关键词过滤的规则位图"""
+        if not text:
+            return self.all_mask
+        
+        filtered_mask = self.all_mask & ~self.unfiltered_mask
+        if not filtered_mask:
+            return self.all_mask
+        
+        include_hits = self.base_include
+        exclude_hits = self.base_exclude
+        
+        if self.case_sensitive:
+            for index in self.case_sensitive.find_all(text):
+                include_mask, exclude_mask = self.case_sensitive_masks[index]
+                include_hits |= include_mask
+                exclude_hits |= exclude_mask
+        
+        if self.case_insensitive:
+            for index in self.case_insensitive.find_all(text.lower()):
+                include_mask, exclude_mask = self.case_insensitive_masks[index]
+                include_hits |= include_mask
+                exclude_hits |= exclude_mask
+        
+        for regex, include_mask, exclude_mask in self.regexes:
+            # 仍未确定结果的规则才值得执行该正则
+            pending = (include_mask & ~include_hits & ~exclude_hits) | (exclude_mask & ~exclude_hits)
+            if pending and regex.search(text):
+                include_hits |= include_mask
+                exclude_hits |= exclude_mask
+        
+        passed = filtered_mask & ~exclude_hits & (include_hits | self.no_include_mask)
+        return self.unfiltered_mask | passed
+    
+    def select(self, rules: tuple, text: str) -> tuple:
+        """从规则元组中选出通过关键词过滤的规则（与构建时顺序一致）"""
+        mask = self.match(text)
+        if mask == self.all_mask:
+            return rules
+        
+        selected = []
+        position = 0
+        while mask:
+            if mask & 1:
+                selected.append(rules[position])
+            mask >>= 1
+            position += 1
+        return tuple(selected)
 
-class RegexReplacer:
-    """正则表达式替换器"""
+
+class KeywordFilter:
+    """关键词过滤器"""
     
-    def apply_replacements(self, text: str, replace_rules: List[ReplaceRule]) -> str:
+    # 已编译匹配器的缓存上限
+    MAX_CACHED_MATCHERS = 256
+    
+    def __init__(self):
+        self._matchers: "OrderedDict[tuple, CompiledKeywordMatcher]" = OrderedDict()
+    
+    @staticmethod
+    def compile(keywords: List[Keyword]) -> CompiledKeywordMatcher:
+        """将关键词列表编译为匹配器"""
+        return CompiledKeywordMatcher(keywords)
+    
+    def _get_matcher(self, keywords: List[Keyword]) -> CompiledKeywordMatcher:
+        """按关键词内容缓存编译结果，避免每条消息重复编译"""
+        signature = tuple(
+            (k.keyword, bool(k.is_regex), bool(k.is_exclude), bool(k.case_sensitive))
+            for k in keywords
+        )
+        matcher = self._matchers.get(signature)
+        if matcher is None:
+            matcher = self.compile(keywords)
+            self._matchers[signature] = matcher
+            if len(self._matchers) > self.MAX_CACHED_MATCHERS:
+                self._matchers.popitem(last=False)
+        else:
+            self._matchers.move_to_end(signature)
+        return matcher
+    
+    def should_forward(self, text: str, keywords: List[Keyword]) -> bool:
         """
-        应用替换规则到文本
+        判断消息是否应该被转发
         
         Args:
-            text: 原始文本
-            replace_rules: 替换规则列表
+            text: 消息文本
+            keywords: 关键词列表
             
         Returns:
-            str: 处理后的文本
+            bool: True表示应该转发，False表示不转发
         """
-        if not text or not replace_rules:
-            return text
+        if not text or not keywords:
+            return True
+        
+        return self._get_matcher(keywords).should_forward(text)
+
+class ReplacementStep:
+    """替换流水线中的单个步骤"""
+    
+    __slots__ = ('replace_rule_id', 'name', 'pattern', 'replacement', 'regex', 'hit_count', 'replace_count')
+    
+    def __init__(self, rule: ReplaceRule, regex=None):
+        self.replace_rule_id = rule.id
+        self.name = rule.name
+        self.pattern = rule.pattern
+        self.replacement = rule.replacement or ""
+        # regex 为 None 表示普通字符串替换
+        self.regex = regex
+        # 命中的消息数 / 累计替换次数
+        self.hit_count = 0
+        self.replace_count = 0
+
+
+class CompiledReplacementChain:
+    """
+    预编译、预排序的替换流水线
+
+    - 构建时过滤未启用的规则并按优先级排序（数字越小优先级越高）
+    - 正则规则预编译，非正则规则直接使用 str.replace
+    - 记录每个步骤的命中次数，便于发现从不生效的替换规则
+    """
+    
+    def __init__(self, replace_rules: List[ReplaceRule]):
+        self.steps: List[ReplacementStep] = []
         
-        # 按优先级排序（数字越小优先级越高）
         sorted_rules = sorted(
-            [rule for rule in replace_rules if rule.is_active],
-            key=lambda x: x.priority
+            [rule for rule in (replace_rules or []) if rule.is_active and rule.pattern],
+            key=lambda x: x.priority or 0
         )
         
-        processed_text = text
-        
         for rule in sorted_rules:
+            # is_regex 为空（旧数据）时按正则处理，保持原有行为
+            if rule.is_regex is False:
+                self.steps.append(ReplacementStep(rule))
+                continue
             try:
-                processed_text = self._apply_single_replacement(processed_text, rule)
+                regex = re.compile(rule.pattern, re.MULTILINE | re.DOTALL)
+            except re.error as e:
+                logger.error(f"正则表达式错误: {rule.pattern}, 错误: {e}")
+                continue
+            self.steps.append(ReplacementStep(rule, regex))
+    
+    def __bool__(self):
+        return bool(self.steps)
+    
+    def apply(self, text: str) -> str:
+        """依次应用所有替换步骤"""
+        if not text:
+            return text
+        
+        for step in self.steps:
+            try:
+                if step.regex is not None:
+                    text, count = step.regex.subn(step.replacement, text)
+                else:
+                    count = text.count(step.pattern)
+                    if count:
+                        text = text.replace(step.pattern, step.replacement)
             except Exception as e:
-                logger.error(f"替换规则应用失败: {rule.pattern}, 错误: {e}")
+                logger.error(f"替换规则应用失败: {step.pattern}, 错误: {e}")
                 continue
+            
+            if count:
+                step.hit_count += 1
+                step.replace_count += count
         
-        return processed_text
+        return text
     
-    def _apply_single_replacement(self, text: str, rule: ReplaceRule) -> str:
-        """应用单个替换规则"""
-        try:
-            pattern = re.compile(rule.pattern, re.MULTILINE | re.DOTALL)
-            replaced_text = pattern.sub(rule.replacement, text)
-            
-            if replaced_text != text:
-                logger.debug(f"应用替换规则: {rule.pattern[:50]}...")
+    def get_stats(self) -> List[dict]:
+        """获取各步骤的命中统计"""
+        return [
+            {
+                "id": step.replace_rule_id,
+                "name": step.name,
+                "pattern": step.pattern,
+                "is_regex": step.regex is not None,
+                "hit_count": step.hit_count,
+                "replace_count": step.replace_count
+            }
+            for step in self.steps
+        ]
+
+
+class RegexReplacer:
+    """正则表达式替换器"""
+    
+    # 进程级缓存：转发规则ID -> (updated_at, 替换流水线)，所有客户端共享命中统计
+    _chains: Dict[int, tuple] = {}
+    _chains_lock = threading.Lock()
+    
+    @classmethod
+    def get_chain(cls, rule) -> CompiledReplacementChain:
+        """
+        获取转发规则的替换流水线
+        
+        以规则的 updated_at 作为缓存版本，规则或其替换规则变更后自动重建。
+        """
+        version = getattr(rule, 'updated_at', None)
+        with cls._chains_lock:
+            cached = cls._chains.get(rule.id)
+            if cached and cached[0] == version:
+                return cached[1]
             
-            return replaced_text
+            chain = CompiledReplacementChain(rule.replace_rules)
+            cls._chains[rule.id] = (version, chain)
+            return chain
+    
+    @classmethod
+    def get_chain_stats(cls, rule_id: int) -> List[dict]:
+        """获取转发规则替换流水线的命中统计（尚未编译时返回空列表）"""
+        cached = cls._chains.get(rule_id)
+        return cached[1].get_stats() if cached else []
+    
+    @classmethod
+    def discard_chain(cls, rule_id: int):
+        """丢弃转发规则的替换流水线缓存"""
+        with cls._chains_lock:
+            cls._chains.pop(rule_id, None)
+    
+    def apply_replacements(self, text: str, replace_rules: List[ReplaceRule]) -> str:
+        """
+        应用替换规则到文本
+        
+        Args:
+            text: 原始文本
+            replace_rules: 替换规则列表
             
-        except re.error as e:
-            logger.error(f"正则表达式错误: {rule.pattern}, 错误: {e}")
-            return text
-        except Exception as e:
-            logger.error(f"替换操作错误: {e}")
+        Returns:
+            str: 处理后的文本
+        """
+        if not text or not replace_rules:
             return text
+        
+        return CompiledReplacementChain(replace_rules).apply(text)
 
 class MessageProcessor:
     """消息处理器，整合过滤和替换功能"""
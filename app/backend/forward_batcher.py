@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+原生转发合并器 - 把同一目标的多条消息合并为一次 ForwardMessages 请求
+"""
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, List, Tuple
+
+from telethon import utils
+from telethon.tl import functions
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    __slots__ = ('source_peer', 'items', 'timer')
+
+    def __init__(self, source_peer):
+        self.source_peer = source_peer
+        # (消息ID, Future)
+        self.items: List[Tuple[int, asyncio.Future]] = []
+        self.timer = None
+
+
+class ForwardBatcher:
+    """
+    原生转发合并器（每个 TelegramClientManager 一个，运行在客户端事件循环中）
+
+    - 按 (目标聊天, 源聊天, 是否隐藏来源) 分组缓冲待转发的消息ID
+    - 首条消息到达后等待一个窗口，窗口内同组的消息合并为一次请求（单次最多 100 条）
+    - 请求经发送调度器提交，统一受目标限速和 FloodWait 处理约束
+    - copy 模式使用 drop_author 转发：不产生下载/上传，目标处不显示来源
+    """
+
+    # Telegram 单次 ForwardMessages 最多携带 100 个消息ID
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, client, send: Callable[[Any, Callable[[], Awaitable[Any]]], Awaitable[Any]],
+                 window: float = None):
+        self.client = client
+        self.send = send
+        self.window = max(0.0, Config.FORWARD_BATCH_WINDOW if window is None else window)
+
+        self._pending: Dict[Tuple[int, int, bool], _PendingBatch] = {}
+        self._tasks = set()
+
+        # 统计信息
+        self.requests = 0
+        self.messages = 0
+        self.failed = 0
+        self.max_batch_size = 0
+
+    async def forward(self, target_chat_id: int, source_peer, message_ids: List[int],
+                      drop_author: bool = False) -> List[Any]:
+        """
+        原生转发一组消息并等待结果
+
+        Args:
+            target_chat_id: 目标聊天ID
+            source_peer: 源聊天（Peer 对象或聊天ID）
+            message_ids: 源消息ID列表
+            drop_author: True 为复制模式（不显示来源）
+
+        Returns:
+            List: 与 message_ids 一一对应的目标消息
+        """
+        loop = asyncio.get_running_loop()
+        key = (target_chat_id, utils.get_peer_id(source_peer), bool(drop_author))
+
+        futures = []
+        for message_id in message_ids:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = _PendingBatch(source_peer)
+                self._pending[key] = pending
+                pending.timer = loop.call_later(self.window, self._flush, key)
+
+            future = loop.create_future()
+            pending.items.append((message_id, future))
+            futures.append(future)
+
+            if len(pending.items) >= self.MAX_BATCH_SIZE:
+                self._flush(key)
+
+        return list(await asyncio.gather(*futures))
+
+    def _flush(self, key: Tuple[int, int, bool]):
+        pending = self._pending.pop(key, None)
+        if not pending or not pending.items:
+            return
+        if pending.timer:
+            pending.timer.cancel()
+
+        task = asyncio.get_running_loop().create_task(self._dispatch(key, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, key: Tuple[int, int, bool], pending: _PendingBatch):
+        """发送一次合并后的转发请求，并把结果分发给各个等待者"""
+        target_chat_id, _source_id, drop_author = key
+        items = pending.items
+        try:
+            to_peer = await self.client.get_input_entity(target_chat_id)
+            from_peer = await self.client.get_input_entity(pending.source_peer)
+
+            # 按消息ID升序转发，保持原始顺序（相册也依赖连续顺序）
+            message_ids = sorted({message_id for message_id, _future in items})
+            request = functions.messages.ForwardMessagesRequest(
+                from_peer=from_peer,
+                id=message_ids,
+                to_peer=to_peer,
+                drop_author=drop_author or None
+            )
+
+            result = await self.send(target_chat_id, lambda: self.client(request))
+            sent = self.client._get_response_message(request, result, to_peer)
+            sent_by_id = dict(zip(message_ids, sent))
+
+            self.requests += 1
+            self.messages += len(message_ids)
+            self.max_batch_size = max(self.max_batch_size, len(message_ids))
+            logger.debug(f"📦 合并转发: {len(message_ids)} 条消息 -> {target_chat_id} ({'复制' if drop_author else '转发'})")
+
+            for message_id, future in items:
+                if future.done():
+                    continue
+                forwarded = sent_by_id.get(message_id)
+                if forwarded is None:
+                    self.failed += 1
+                    future.set_exception(RuntimeError(f"消息 {message_id} 未能转发（可能已被删除）"))
+                else:
+                    future.set_result(forwarded)
+
+        except asyncio.CancelledError:
+            for _message_id, future in items:
+                if not future.done():
+                    future.cancel()
+            raise
+        except Exception as e:
+            self.failed += len(items)
+            for _message_id, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def stop(self):
+        """立即发送所有缓冲中的请求，并等待完成"""
+        for key in list(self._pending.keys()):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        return {
+            "pending_batches": len(self._pending),
+            "requests": self.requests,
+            "messages": self.messages,
+            "failed": self.failed,
+            "max_batch_size": self.max_batch_size,
+            # 合并为单次请求后节省的 API 调用数
+            "api_calls_saved": self.messages - self.requests,
+            "window": self.window
+        }
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+日志导出 - 分块读取数据库并流式编码为 JSON / NDJSON / CSV（可选 gzip）
+"""
+import csv
+import io
+import json
+import logging
+import zlib
+from typing import Dict, Any, AsyncIterator
+
+from services import MessageLogService
+
+logger = logging.getLogger(__name__)
+
+# 导出字段（顺序即 CSV 列顺序）
+EXPORT_FIELDS = [
+    'id', 'rule_id', 'rule_name',
+    'source_chat_id', 'source_chat_name', 'target_chat_id', 'target_chat_name',
+    'source_message_id', 'target_message_id',
+    'original_text', 'processed_text', 'media_type',
+    'status', 'error_message', 'processing_time', 'created_at'
+]
+
+# 格式 -> (文件扩展名, MIME 类型)
+EXPORT_FORMATS = {
+    'json': ('json', 'application/json'),
+    'ndjson': ('ndjson', 'application/x-ndjson'),
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+}
+
+# 每次从数据库读取的行数
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _to_record(row: Dict[str, Any]) -> Dict[str, Any]:
+    record = {field: row.get(field) for field in EXPORT_FIELDS}
+    if record['created_at'] is not None:
+        record['created_at'] = record['created_at'].isoformat()
+    return record
+
+
+class LogExporter:
+    """
+    流式日志导出器
+
+    - 通过 MessageLogService.iter_logs 按块读取，每块编码后立即输出，内存占用与导出总量无关
+    - json 格式输出标准 JSON 数组（与导入接口兼容），ndjson 每行一条，csv 带表头（含 BOM，便于 Excel 打开）
+    - gzip=True 时用流式压缩器逐块压缩
+    """
+
+    def __init__(self, fmt: str = 'json', gzip: bool = False, filters: Dict[str, Any] = None):
+        fmt = (fmt or 'json').lower()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}，可选: {', '.join(EXPORT_FORMATS)}")
+        self.format = fmt
+        self.gzip = gzip
+        self.filters = filters or {}
+        self.exported = 0
+
+    @property
+    def media_type(self) -> str:
+        return 'application/gzip' if self.gzip else EXPORT_FORMATS[self.format][1]
+
+    def filename(self, stem: str) -> str:
+        name = f"{stem}.{EXPORT_FORMATS[self.format][0]}"
+        return f"{name}.gz" if self.gzip else name
+
+    async def _encode(self) -> AsyncIterator[bytes]:
+        """按块输出未压缩的编码数据"""
+        if self.format == 'json':
+            yield b'[\n'
+        elif self.format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(EXPORT_FIELDS)
+            yield '\ufeff'.encode('utf-8') + buffer.getvalue().encode('utf-8')
+
+        first = True
+        async for rows in MessageLogService.iter_logs(chunk_size=EXPORT_CHUNK_SIZE, **self.filters):
+            records = [_to_record(row) for row in rows]
+            if self.format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for record in records:
+                    writer.writerow(['' if record[field] is None else record[field] for field in EXPORT_FIELDS])
+                chunk = buffer.getvalue()
+            elif self.format == 'ndjson':
+                chunk = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+            else:
+                chunk = ',\n'.join(json.dumps(record, ensure_ascii=False) for record in records)
+                if not first:
+                    chunk = ',\n' + chunk
+            first = False
+            self.exported += len(records)
+            yield chunk.encode('utf-8')
+
+        if self.format == 'json':
+            yield b'\n]\n'
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """导出数据流（用作 StreamingResponse 的内容）"""
+        try:
+            if not self.gzip:
+                async for chunk in self._encode():
+                    yield chunk
+            else:
+                # wbits=31: 输出带 gzip 头的数据
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+                async for chunk in self._encode():
+                    compressed = compressor.compress(chunk)
+                    if compressed:
+                        yield compressed
+                yield compressor.flush()
+            logger.info(f"📤 日志导出完成: {self.exported} 条 ({self.format}{', gzip' if self.gzip else ''})")
+        except Exception as e:
+            # 响应头已发送，只能记录错误并中断数据流
+            logger.error(f"❌ 日志导出中断（已导出 {self.exported} 条）: {e}")
+            raise
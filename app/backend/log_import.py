@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+日志导入 - 流式解析 JSON 数组 / NDJSON（可选 gzip），分块去重并批量写入
+"""
+import asyncio
+import codecs
+import itertools
+import json
+import logging
+import os
+import shutil
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, BinaryIO
+
+from config import Config
+from models import get_local_now
+from services import MessageLogService
+
+logger = logging.getLogger(__name__)
+
+# 每次从文件读取的字节数
+READ_SIZE = 256 * 1024
+# 每块去重/写入的记录数
+IMPORT_CHUNK_SIZE = 1000
+# 保留最近多少个导入任务的进度
+MAX_TRACKED_JOBS = 20
+
+_job_ids = itertools.count(1)
+
+
+class ImportFormatError(ValueError):
+    """导入文件格式错误（无法继续解析）"""
+
+
+class _JsonArrayParser:
+    """增量解析顶层 JSON 数组，每次喂入一段文本，返回其中完整的元素"""
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.started = False
+        self.finished = False
+        # 下一个元素之前是否需要逗号
+        self.expect_comma = False
+
+    def feed(self, text: str) -> List[Any]:
+        self.buffer += text
+        items = []
+        buffer, pos, length = self.buffer, 0, len(self.buffer)
+
+        while pos < length and not self.finished:
+            char = buffer[pos]
+            if char.isspace():
+                pos += 1
+                continue
+            if not self.started:
+                if char != '[':
+                    raise ImportFormatError("JSON 文件必须是数组格式")
+                self.started = True
+                pos += 1
+                continue
+            if char == ']':
+                self.finished = True
+                pos += 1
+                break
+            if self.expect_comma:
+                if char != ',':
+                    raise ImportFormatError(f"JSON 格式错误: 第 {len(items)} 个元素后缺少逗号")
+                self.expect_comma = False
+                pos += 1
+                continue
+            try:
+                item, end = self.decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # 元素不完整，等待更多数据
+                break
+            items.append(item)
+            self.expect_comma = True
+            pos = end
+
+        self.buffer = buffer[pos:]
+        return items
+
+    def close(self):
+        if not self.finished:
+            raise ImportFormatError("JSON 格式错误: 文件不完整")
+
+
+class _NdjsonParser:
+    """逐行解析 NDJSON，无法解析的行计入 errors"""
+
+    def __init__(self):
+        self.buffer = ''
+        self.errors = 0
+
+    def _parse(self, line: str, items: List[Any]):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            items.append(json.loads(line))
+        except json.JSONDecodeError:
+            self.errors += 1
+
+    def feed(self, text: str) -> List[Any]:
+        self.buffer += text
+        lines = self.buffer.split('\n')
+        self.buffer = lines.pop()
+        items = []
+        for line in lines:
+            self._parse(line, items)
+        return items
+
+    def close(self) -> List[Any]:
+        items = []
+        self._parse(self.buffer, items)
+        self.buffer = ''
+        return items
+
+
+def _parse_datetime(value) -> datetime:
+    """导出文件中的时间是用户时区的本地时间；带时区的时间转换为用户时区后去掉时区信息"""
+    if not value:
+        return get_local_now()
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        from timezone_utils import database_time_to_user_time
+        parsed = database_time_to_user_time(parsed).replace(tzinfo=None)
+    return parsed
+
+
+def _to_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """把导入记录转换为 message_logs 列值，缺少必填字段时抛出异常"""
+    source_chat_id = record.get('source_chat_id')
+    target_chat_id = record.get('target_chat_id')
+    source_message_id = record.get('source_message_id')
+    if source_chat_id in (None, '') or target_chat_id in (None, '') or source_message_id is None:
+        raise ValueError("缺少 source_chat_id / target_chat_id / source_message_id")
+
+    rule_id = record.get('rule_id')
+    return {
+        'rule_id': int(rule_id) if rule_id not in (None, '') else None,
+        'rule_name': record.get('rule_name'),
+        'source_chat_id': str(source_chat_id),
+        'source_chat_name': record.get('source_chat_name'),
+        'target_chat_id': str(target_chat_id),
+        'target_chat_name': record.get('target_chat_name'),
+        'source_message_id': int(source_message_id),
+        'target_message_id': int(record['target_message_id']) if record.get('target_message_id') not in (None, '') else None,
+        'original_text': record.get('original_text'),
+        'processed_text': record.get('processed_text'),
+        'media_type': record.get('media_type'),
+        'status': record.get('status') or 'success',
+        'error_message': record.get('error_message'),
+        'processing_time': int(record['processing_time']) if record.get('processing_time') not in (None, '') else None,
+        'created_at': _parse_datetime(record.get('created_at')),
+    }
+
+
+class ImportJob:
+    """一次导入任务的进度"""
+
+    def __init__(self, filename: str, total_bytes: int):
+        self.id = next(_job_ids)
+        self.filename = filename
+        self.format = None
+        self.status = 'running'
+        self.total_bytes = total_bytes
+        self.bytes_read = 0
+        self.processed = 0
+        self.imported = 0
+        self.skipped = 0
+        self.errors = 0
+        self.error_message = None
+        # 文件本身无法解析（而不是写入数据库失败）
+        self.invalid_file = False
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def message(self) -> str:
+        if self.status == 'failed':
+            return self.error_message or "未知错误"
+        summary = f"成功 {self.imported} 条，跳过 {self.skipped} 条"
+        if self.errors:
+            summary += f"，无效 {self.errors} 条"
+        return f"导入完成：{summary}" if self.status == 'completed' else f"导入中：{summary}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "format": self.format,
+            "status": self.status,
+            "message": self.message,
+            "total_bytes": self.total_bytes,
+            "bytes_read": self.bytes_read,
+            "progress": round(self.bytes_read / self.total_bytes * 100, 1) if self.total_bytes else 0.0,
+            "processed": self.processed,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 1),
+            "rows_per_second": round(self.processed / elapsed) if elapsed > 0 else 0,
+        }
+
+
+class LogImporter:
+    """
+    流式日志导入器
+
+    - 按块读取文件（自动识别 gzip），增量解析 JSON 数组或 NDJSON，内存占用与文件大小无关
+    - 每 IMPORT_CHUNK_SIZE 条记录调用一次 MessageLogService.import_logs_chunk：
+      一次查询取出已存在的键，剩余记录一次 executemany 写入
+    - 每块写入后即对后续块可见，因此跨块的重复记录同样会被跳过
+    - 进度保存在 jobs 中，可在导入过程中查询
+    """
+
+    def __init__(self):
+        self.jobs: "OrderedDict[int, ImportJob]" = OrderedDict()
+        self._tasks = set()
+
+    def create_job(self, filename: str, total_bytes: int) -> ImportJob:
+        job = ImportJob(filename, total_bytes)
+        self.jobs[job.id] = job
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            self.jobs.popitem(last=False)
+        return job
+
+    def get_job(self, job_id: int) -> Optional[ImportJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    async def run(self, job: ImportJob, fileobj: BinaryIO) -> ImportJob:
+        """执行导入（fileobj 为已定位到开头的二进制文件对象）"""
+        try:
+            await self._import(job, fileobj)
+            job.status = 'completed'
+            logger.info(f"📥 日志导入完成 [{job.filename}]: {job.message}")
+        except Exception as e:
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.invalid_file = isinstance(e, (ImportFormatError, UnicodeDecodeError, zlib.error))
+            logger.error(f"❌ 日志导入失败 [{job.filename}]（已处理 {job.processed} 条）: {e}")
+        finally:
+            job.finished_at = time.time()
+            if job.imported:
+                MessageLogService.invalidate_count_cache()
+        return job
+
+    def run_in_background(self, job: ImportJob, path: str):
+        """在后台执行导入，完成后删除临时文件"""
+        async def runner():
+            try:
+                with open(path, 'rb') as fileobj:
+                    await self.run(job, fileobj)
+            finally:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+        task = asyncio.get_running_loop().create_task(runner())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def spool_to_disk(fileobj: BinaryIO, filename: str) -> str:
+        """把上传文件复制到数据目录的临时文件（请求结束后上传文件会被关闭）"""
+        os.makedirs(Config.DATA_DIR, exist_ok=True)
+        path = os.path.join(Config.DATA_DIR, f"import_{int(time.time() * 1000)}_{os.path.basename(filename or 'logs')}")
+        fileobj.seek(0)
+        with open(path, 'wb') as target:
+            shutil.copyfileobj(fileobj, target, READ_SIZE)
+        return path
+
+    async def _import(self, job: ImportJob, fileobj: BinaryIO):
+        text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        decompressor = None
+        parser = None
+        batch: List[Dict[str, Any]] = []
+
+        while True:
+            # 文件可能在磁盘上，避免阻塞事件循环
+            data = await asyncio.to_thread(fileobj.read, READ_SIZE)
+            final = not data
+            job.bytes_read += len(data)
+
+            if job.bytes_read == len(data) and data[:2] == b'\x1f\x8b':
+                decompressor = zlib.decompressobj(47)
+            if decompressor is not None:
+                data = decompressor.flush() if final else decompressor.decompress(data)
+            text = text_decoder.decode(data, final=final)
+
+            if parser is None:
+                stripped = text.lstrip()
+                if not stripped:
+                    if final:
+                        raise ImportFormatError("导入文件为空")
+                    continue
+                job.format = 'json' if stripped[0] == '[' else 'ndjson'
+                parser = _JsonArrayParser() if job.format == 'json' else _NdjsonParser()
+
+            records = parser.feed(text)
+            if final:
+                remaining = parser.close()
+                if remaining:
+                    records.extend(remaining)
+
+            for record in records:
+                job.processed += 1
+                try:
+                    if not isinstance(record, dict):
+                        raise ValueError("记录必须是对象")
+                    batch.append(_to_row(record))
+                except (ValueError, TypeError, KeyError) as e:
+                    job.errors += 1
+                    if job.errors <= 10:
+                        logger.warning(f"导入第 {job.processed} 条日志无效: {e}")
+                if len(batch) >= IMPORT_CHUNK_SIZE:
+                    await self._flush(job, batch)
+                    batch = []
+
+            if final:
+                break
+
+        if isinstance(parser, _NdjsonParser):
+            job.errors += parser.errors
+        await self._flush(job, batch)
+
+    @staticmethod
+    async def _flush(job: ImportJob, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        imported, skipped = await MessageLogService.import_logs_chunk(batch)
+        job.imported += imported
+        job.skipped += skipped
+
+
+# 全局导入器实例
+log_importer = LogImporter()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+消息日志批量写入器 - 在客户端事件循环中异步批量写入转发日志
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 停止信号
+_STOP = object()
+
+
+class MessageLogWriter:
+    """
+    消息日志批量写入器
+
+    - 转发流程只把日志行放入内存队列，不再每条消息开会话、提交事务
+    - 后台任务在达到批量大小或刷新间隔时，用单条 executemany INSERT 写入
+    - 队列有界：写满时 write() 会等待，形成背压而不是无限占用内存
+    - stop() 会把队列中剩余的日志全部写完后再返回
+    """
+
+    def __init__(self, name: str, batch_size: int = None, flush_interval: float = None,
+                 max_queue_size: int = None):
+        self.name = name
+        self.batch_size = max(1, batch_size or Config.LOG_WRITER_BATCH_SIZE)
+        self.flush_interval = max(0.05, flush_interval or Config.LOG_WRITER_FLUSH_INTERVAL)
+        self.max_queue_size = max(self.batch_size, max_queue_size or Config.LOG_WRITER_QUEUE_SIZE)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+        # 统计信息
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.backpressure_waits = 0
+        self.last_flush_ms = 0.0
+        self.last_batch_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = False
+        self._task = self._loop.create_task(self._run(), name=f"MessageLogWriter-{self.name}")
+        logger.info(f"📝 日志写入器已启动: {self.name} (批量 {self.batch_size}, 间隔 {self.flush_interval}s, 队列上限 {self.max_queue_size})")
+
+    async def write(self, row: Dict[str, Any]):
+        """提交一行日志（队列已满时等待）"""
+        if not self.running or self._stopping or asyncio.get_running_loop() is not self._loop:
+            # 写入器不可用（未启动、正在停止或跨事件循环调用）时直接落库
+            await self._flush([row])
+            return
+
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(row)
+        self.enqueued += 1
+
+    async def stop(self, timeout: float = 10):
+        """停止写入器并刷新所有剩余日志"""
+        if not self.running:
+            return
+        self._stopping = True
+        try:
+            await self._queue.put(_STOP)
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ 日志写入器 {self.name} 停止超时，剩余 {self._queue.qsize()} 条日志未写入")
+            self._task.cancel()
+        except Exception as e:
+            logger.error(f"停止日志写入器失败: {e}")
+        logger.info(f"✅ 日志写入器已停止: {self.name} (累计写入 {self.written} 条)")
+
+    async def _run(self):
+        """后台写入循环"""
+        queue = self._queue
+        stop_requested = False
+
+        while not stop_requested:
+            item = await queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = self._loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                # 先取走已在队列中的日志，再在剩余时间内等待新日志
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - self._loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                if item is _STOP:
+                    stop_requested = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # 停止前写完队列中剩余的日志
+        remaining_rows = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not _STOP:
+                remaining_rows.append(item)
+        for start in range(0, len(remaining_rows), self.batch_size):
+            await self._flush(remaining_rows[start:start + self.batch_size])
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        """写入一批日志（失败时重试一次）"""
+        from services import MessageLogService
+
+        start_time = time.perf_counter()
+        for attempt in range(2):
+            try:
+                await MessageLogService.log_messages_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+                self.last_batch_size = len(batch)
+                self.last_flush_ms = round((time.perf_counter() - start_time) * 1000, 2)
+                return
+            except Exception as e:
+                if attempt == 0:
+                    logger.warning(f"⚠️ 批量写入日志失败，稍后重试: {e}")
+                    await asyncio.sleep(0.5)
+                else:
+                    self.dropped += len(batch)
+                    logger.error(f"❌ 批量写入日志失败，丢弃 {len(batch)} 条: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入器统计信息"""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "backpressure_waits": self.backpressure_waits,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms
+        }
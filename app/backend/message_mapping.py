@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+消息映射存储 - 记录源消息与目标消息的对应关系，用于把编辑同步到目标消息
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, List
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import Config
+from database import db_manager
+from models import MessageMapping, get_local_now
+
+logger = logging.getLogger(__name__)
+
+
+class MessageMappingStore:
+    """
+    进程级消息映射存储
+
+    - 键为 (规则ID, 源聊天ID, 源消息ID)，值为 (目标聊天ID, 目标消息ID)
+    - 写入时同时更新内存 LRU 和 message_mappings 表（唯一索引，重复写入覆盖）
+    - 查询先查 LRU，未命中时走一次唯一索引查询并回填 LRU
+    """
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max(1, max_size or Config.MESSAGE_MAP_CACHE_SIZE)
+        self._cache: "OrderedDict[Tuple[int, int, int], Tuple[int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _remember(self, key: Tuple[int, int, int], value: Tuple[int, int]):
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    async def record_many(self, rule_id: int, source_chat_id: int, pairs: List[Tuple[int, int]],
+                          target_chat_id: int):
+        """
+        记录一组映射
+
+        Args:
+            pairs: [(源消息ID, 目标消息ID), ...]
+        """
+        if not pairs:
+            return
+
+        rows = []
+        for source_message_id, target_message_id in pairs:
+            self._remember((rule_id, source_chat_id, source_message_id), (target_chat_id, target_message_id))
+            rows.append({
+                "rule_id": rule_id,
+                "source_chat_id": source_chat_id,
+                "source_message_id": source_message_id,
+                "target_chat_id": target_chat_id,
+                "target_message_id": target_message_id,
+                "created_at": get_local_now()
+            })
+
+        try:
+            stmt = sqlite_insert(MessageMapping)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['rule_id', 'source_chat_id', 'source_message_id'],
+                set_={
+                    "target_chat_id": stmt.excluded.target_chat_id,
+                    "target_message_id": stmt.excluded.target_message_id,
+                    "created_at": stmt.excluded.created_at
+                }
+            )
+            async with db_manager.async_session() as db:
+                await db.execute(stmt, rows)
+                await db.commit()
+            self.writes += len(rows)
+        except Exception as e:
+            logger.error(f"❌ 写入消息映射失败 (规则 {rule_id}): {e}")
+
+    async def record(self, rule_id: int, source_chat_id: int, source_message_id: int,
+                     target_chat_id: int, target_message_id: int):
+        """记录单条映射"""
+        await self.record_many(rule_id, source_chat_id, [(source_message_id, target_message_id)], target_chat_id)
+
+    async def lookup(self, rule_id: int, source_chat_id: int, source_message_id: int) -> Optional[Tuple[int, int]]:
+        """查询源消息对应的 (目标聊天ID, 目标消息ID)"""
+        key = (rule_id, source_chat_id, source_message_id)
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        try:
+            async with db_manager.async_session() as db:
+                result = await db.execute(
+                    select(MessageMapping.target_chat_id, MessageMapping.target_message_id).where(
+                        MessageMapping.rule_id == rule_id,
+                        MessageMapping.source_chat_id == source_chat_id,
+                        MessageMapping.source_message_id == source_message_id
+                    )
+                )
+                row = result.first()
+        except Exception as e:
+            logger.error(f"❌ 查询消息映射失败: {e}")
+            return None
+
+        if row is None:
+            return None
+        value = (row[0], row[1])
+        self._remember(key, value)
+        return value
+
+    async def discard_rule(self, rule_id: int):
+        """删除规则的所有映射（规则被删除时调用）"""
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == rule_id]:
+                del self._cache[key]
+        try:
+            async with db_manager.async_session() as db:
+                await db.execute(delete(MessageMapping).where(MessageMapping.rule_id == rule_id))
+                await db.commit()
+        except Exception as e:
+            logger.error(f"❌ 删除规则 {rule_id} 的消息映射失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取映射缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._cache),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "writes": self.writes
+        }
+
+
+# 全局消息映射实例
+message_mapping = MessageMappingStore()
@@ -4,7 +4,7 @@
 from datetime import datetime, timezone
 import os
 from typing import List, Optional
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -34,9 +34,16 @@ def get_local_now():
             # 如果pytz不可用，使用系统本地时间
             return datetime.now()
 
+# 规则投递方式：resend 下载后重新发送（支持改写），copy 原生复制（不显示来源），forward 原生转发
+DELIVERY_MODES = ('resend', 'copy', 'forward')
+
 class ForwardRule(Base):
     """转发规则模型"""
     __tablename__ = 'forward_rules'
+    __table_args__ = (
+        # 按源聊天查找启用的规则
+        Index('ix_forward_rules_source_active', 'source_chat_id', 'is_active'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False, comment='规则名称')
@@ -70,6 +77,7 @@ class ForwardRule(Base):
     forward_delay = Column(Integer, default=0, comment='转发延迟(秒)')
     max_message_length = Column(Integer, default=4096, comment='最大消息长度')
     enable_link_preview = Column(Boolean, default=True, comment='是否启用链接预览')
+    delivery_mode = Column(String(20), default='resend', comment='投递方式: resend(重新发送)/copy(无来源复制)/forward(原生转发)')
     
     # 时间过滤设置
     time_filter_type = Column(String(20), default='after_start', comment='时间过滤类型: after_start(启动后), time_range(时间段), from_time(指定时间开始), today_only(仅当天), all_messages(所有消息)')
@@ -91,6 +99,9 @@ class ForwardRule(Base):
 class Keyword(Base):
     """关键词模型"""
     __tablename__ = 'keywords'
+    __table_args__ = (
+        Index('ix_keywords_rule_id', 'rule_id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     rule_id = Column(Integer, ForeignKey('forward_rules.id'), nullable=False)
@@ -109,6 +120,10 @@ class Keyword(Base):
 class ReplaceRule(Base):
     """替换规则模型"""
     __tablename__ = 'replace_rules'
+    __table_args__ = (
+        # 加载规则的替换链（按优先级排序）
+        Index('ix_replace_rules_rule_priority', 'rule_id', 'priority'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     rule_id = Column(Integer, ForeignKey('forward_rules.id'), nullable=False)
@@ -130,6 +145,19 @@ class ReplaceRule(Base):
 class MessageLog(Base):
     """消息日志模型"""
     __tablename__ = 'message_logs'
+    __table_args__ = (
+        # 同一规则对同一源消息只允许一条成功记录（重复转发的最终防线）
+        Index('uq_message_logs_forwarded', 'rule_id', 'source_chat_id', 'source_message_id',
+              unique=True, sqlite_where=text("status = 'success'")),
+        # 日志列表按时间倒序分页
+        Index('ix_message_logs_created_at', 'created_at'),
+        # 按状态筛选 + 时间排序，同时覆盖按状态计数
+        Index('ix_message_logs_status_created_at', 'status', 'created_at'),
+        # 单个规则的最近日志、按规则计数/清理
+        Index('ix_message_logs_rule_created_at', 'rule_id', 'created_at'),
+        # 按源消息查重（不限状态），包含 rule_id/status 可直接由索引回答
+        Index('ix_message_logs_source_message', 'source_chat_id', 'source_message_id', 'rule_id', 'status'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     rule_id = Column(Integer, ForeignKey('forward_rules.id'), nullable=True)
@@ -164,6 +192,64 @@ class MessageLog(Base):
     def __repr__(self):
         return f"<MessageLog(id={self.id}, status='{self.status}')>"
 
+class MessageMapping(Base):
+    """源消息 -> 目标消息映射（用于编辑同步）"""
+    __tablename__ = 'message_mappings'
+    __table_args__ = (
+        Index('uq_message_mappings_source', 'rule_id', 'source_chat_id', 'source_message_id', unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule_id = Column(Integer, nullable=False, comment='规则ID')
+    source_chat_id = Column(BigInteger, nullable=False, comment='源聊天ID')
+    source_message_id = Column(Integer, nullable=False, comment='源消息ID')
+    target_chat_id = Column(BigInteger, nullable=False, comment='目标聊天ID')
+    target_message_id = Column(Integer, nullable=False, comment='目标消息ID')
+    created_at = Column(DateTime, default=get_local_now, comment='创建时间')
+    
+    def __repr__(self):
+        return f"<MessageMapping(rule={self.rule_id}, {self.source_chat_id}/{self.source_message_id} -> {self.target_chat_id}/{self.target_message_id})>"
+
+class MessageStat(Base):
+    """转发统计汇总（按规则、时间桶、状态预聚合的消息日志）"""
+    __tablename__ = 'message_stats'
+    __table_args__ = (
+        Index('uq_message_stats_bucket', 'bucket', 'bucket_start', 'rule_id', 'status', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule_id = Column(Integer, nullable=False, default=0, comment='规则ID（0 表示无规则）')
+    bucket = Column(String(10), nullable=False, comment='时间桶粒度: hour/day')
+    bucket_start = Column(DateTime, nullable=False, comment='时间桶起点（用户时区）')
+    status = Column(String(20), nullable=False, comment='转发状态')
+    count = Column(Integer, nullable=False, default=0, comment='消息数')
+    total_processing_time = Column(Integer, nullable=False, default=0, comment='处理时间合计(毫秒)')
+    timed_count = Column(Integer, nullable=False, default=0, comment='记录了处理时间的消息数')
+    max_processing_time = Column(Integer, nullable=False, default=0, comment='最长处理时间(毫秒)')
+
+    def __repr__(self):
+        return f"<MessageStat(rule={self.rule_id}, {self.bucket} {self.bucket_start}, {self.status}={self.count})>"
+
+class ChatEntity(Base):
+    """聊天实体缓存（标题、用户名、类型、access hash；access hash 只对获取它的账号有效，因此按客户端保存）"""
+    __tablename__ = 'chat_entities'
+    __table_args__ = (
+        Index('uq_chat_entities_client_chat', 'client_id', 'chat_id', unique=True),
+        Index('ix_chat_entities_chat_id', 'chat_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    client_id = Column(String(50), nullable=False, comment='获取该实体的客户端ID')
+    chat_id = Column(BigInteger, nullable=False, comment='聊天ID（带标记的 peer ID）')
+    title = Column(String(200), comment='聊天标题')
+    username = Column(String(100), comment='用户名')
+    chat_type = Column(String(20), comment='类型: user/group/channel')
+    access_hash = Column(BigInteger, comment='access hash')
+    updated_at = Column(DateTime, default=get_local_now, comment='更新时间')
+
+    def __repr__(self):
+        return f"<ChatEntity({self.chat_id}, title='{self.title}', client='{self.client_id}')>"
+
 class UserSession(Base):
     """用户会话模型"""
     __tablename__ = 'user_sessions'
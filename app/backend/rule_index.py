@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+转发规则内存索引 - 按源聊天ID缓存已编译的规则，消息热路径不再访问数据库
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Any, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from database import get_db
+from filters import KeywordFilter, RegexReplacer, MatchPlan
+from models import ForwardRule, get_local_now
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledRule:
+    """
+    已编译的转发规则
+
+    包装一个已脱离会话的 ForwardRule（关键词和替换规则已预加载），
+    预先完成聊天ID解析、关键词编译、替换规则排序等每条消息都要重复的工作。
+    未定义的属性透明地代理到原始规则对象，兼容现有的处理逻辑。
+    """
+
+    def __init__(self, rule: ForwardRule):
+        self.rule = rule
+        self.id = rule.id
+        self.source_chat_id = int(rule.source_chat_id)
+        self.keywords = list(rule.keywords or [])
+        # 关键词预编译为匹配器（Aho-Corasick + 合并正则），每条消息单次扫描
+        self.keyword_matcher = KeywordFilter.compile(self.keywords)
+        # 只保留启用的替换规则，并按优先级预排序（数字越小优先级越高）
+        self.replace_rules = sorted(
+            [rr for rr in (rule.replace_rules or []) if rr.is_active],
+            key=lambda rr: rr.priority or 0
+        )
+        # 替换流水线按 updated_at 缓存，规则未变更时复用（保留命中统计）
+        self.replacement_chain = RegexReplacer.get_chain(rule)
+
+    def __getattr__(self, name):
+        return getattr(self.rule, name)
+
+    def __repr__(self):
+        return f"<CompiledRule(id={self.id}, name='{self.rule.name}', source={self.source_chat_id})>"
+
+
+class RuleIndex:
+    """
+    进程级转发规则索引
+
+    - 以源聊天ID为键，值为该聊天所有启用规则的只读元组
+    - 每个源聊天附带一个合并后的关键词匹配计划，一次扫描决定哪些规则触发
+    - 写入采用写时复制：构造新字典后整体替换，读者无需加锁
+    - 启动时全量构建，规则/关键词/替换规则变更后按规则ID增量刷新
+    - 变更后通知监听者（客户端工作进程模式下由主进程转发给各工作进程，各自刷新本进程的索引）
+    """
+
+    def __init__(self):
+        self._by_chat: Dict[int, tuple] = {}
+        # 源聊天ID -> (规则元组, 匹配计划)，二者一起替换，避免读到不一致的组合
+        self._routes: Dict[int, tuple] = {}
+        self._by_id: Dict[int, CompiledRule] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.build_time_ms = 0.0
+        self.built_at = None
+        self.last_refresh_at = None
+        self.is_built = False
+        self._listeners: List[Callable[[str, Optional[int]], None]] = []
+
+    def add_listener(self, callback: Callable[[str, Optional[int]], None]):
+        """添加变更监听：callback(action, rule_id)，action 为 rebuild / refresh / remove"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, Optional[int]], None]):
+        """移除变更监听"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, action: str, rule_id: Optional[int] = None):
+        for callback in self._listeners:
+            try:
+                callback(action, rule_id)
+            except Exception as e:
+                logger.error(f"❌ 规则索引变更通知失败: {e}")
+
+    @staticmethod
+    def _load_stmt():
+        return select(ForwardRule).options(
+            selectinload(ForwardRule.keywords),
+            selectinload(ForwardRule.replace_rules)
+        )
+
+    @staticmethod
+    def _compile(rule: ForwardRule) -> Optional[CompiledRule]:
+        try:
+            return CompiledRule(rule)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ 规则 {rule.id}({rule.name}) 源聊天ID无效，跳过索引: {rule.source_chat_id} ({e})")
+            return None
+
+    def _publish(self, by_id: Dict[int, CompiledRule]):
+        """根据规则ID映射重建聊天索引并原子替换（调用方需持有锁）"""
+        by_chat: Dict[int, list] = {}
+        for compiled in sorted(by_id.values(), key=lambda r: r.id):
+            by_chat.setdefault(compiled.source_chat_id, []).append(compiled)
+
+        new_by_chat = {chat_id: tuple(rules) for chat_id, rules in by_chat.items()}
+
+        # 仅为规则集合发生变化的聊天重建匹配计划
+        routes = {}
+        for chat_id, rules in new_by_chat.items():
+            old_route = self._routes.get(chat_id)
+            if old_route is not None and len(old_route[0]) == len(rules) and all(a is b for a, b in zip(old_route[0], rules)):
+                routes[chat_id] = old_route
+            else:
+                routes[chat_id] = (rules, self._build_plan(rules))
+
+        self._by_chat = new_by_chat
+        self._routes = routes
+        self._by_id = by_id
+        self.generation += 1
+
+    @staticmethod
+    def _build_plan(rules: tuple) -> MatchPlan:
+        return MatchPlan([
+            rule.keywords if rule.enable_keyword_filter and rule.keywords else None
+            for rule in rules
+        ])
+
+    async def rebuild(self) -> bool:
+        """从数据库全量构建索引"""
+        start_time = time.perf_counter()
+        try:
+            async for db in get_db():
+                result = await db.execute(
+                    self._load_stmt().where(ForwardRule.is_active == True)
+                )
+                rules = result.scalars().all()
+                break
+            else:
+                return False
+
+            by_id = {}
+            for rule in rules:
+                compiled = self._compile(rule)
+                if compiled:
+                    by_id[compiled.id] = compiled
+
+            with self._lock:
+                self._publish(by_id)
+                self.build_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
+                self.built_at = get_local_now()
+                self.last_refresh_at = self.built_at
+                self.is_built = True
+
+            logger.info(f"✅ 规则索引已构建: {len(by_id)} 条规则, {len(self._by_chat)} 个源聊天, "
+                        f"耗时 {self.build_time_ms}ms, 版本 {self.generation}")
+            self._notify('rebuild')
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ 构建规则索引失败: {e}")
+            return False
+
+    async def ensure_built(self):
+        """索引尚未构建时执行一次全量构建"""
+        if not self.is_built:
+            await self.rebuild()
+
+    async def refresh_rule(self, rule_id: int) -> bool:
+        """增量刷新单条规则（规则被禁用或删除时从索引中移除）"""
+        if not self.is_built:
+            return await self.rebuild()
+
+        try:
+            rule = None
+            async for db in get_db():
+                result = await db.execute(
+                    self._load_stmt().where(ForwardRule.id == rule_id)
+                )
+                rule = result.scalar_one_or_none()
+                break
+
+            compiled = self._compile(rule) if rule is not None and rule.is_active else None
+
+            with self._lock:
+                by_id = dict(self._by_id)
+                if compiled:
+                    by_id[rule_id] = compiled
+                elif rule_id in by_id:
+                    del by_id[rule_id]
+                    if rule is None:
+                        RegexReplacer.discard_chain(rule_id)
+                else:
+                    return True
+                self._publish(by_id)
+                self.last_refresh_at = get_local_now()
+
+            logger.info(f"🔄 规则索引已刷新: 规则 {rule_id} {'已更新' if compiled else '已移除'}, 版本 {self.generation}")
+            self._notify('refresh', rule_id)
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ 刷新规则索引失败 (规则 {rule_id}): {e}")
+            return False
+
+    def remove_rule(self, rule_id: int):
+        """从索引中移除规则"""
+        with self._lock:
+            if rule_id not in self._by_id:
+                return
+            by_id = dict(self._by_id)
+            del by_id[rule_id]
+            self._publish(by_id)
+            self.last_refresh_at = get_local_now()
+        RegexReplacer.discard_chain(rule_id)
+        logger.info(f"🗑️ 规则 {rule_id} 已从索引移除, 版本 {self.generation}")
+        self._notify('remove', rule_id)
+
+    def get_rules(self, chat_id: int) -> tuple:
+        """获取源聊天的所有启用规则（热路径：单次字典查找）"""
+        return self._by_chat.get(chat_id, ())
+
+    def match_rules(self, chat_id: int, text: str) -> tuple:
+        """获取源聊天中通过关键词过滤的规则（整个聊天只扫描一次文本）"""
+        route = self._routes.get(chat_id)
+        if not route:
+            return ()
+        rules, plan = route
+        return plan.select(rules, text)
+
+    def get_rule(self, rule_id: int) -> Optional[CompiledRule]:
+        """按规则ID获取已编译规则"""
+        return self._by_id.get(rule_id)
+
+    def get_source_chat_ids(self) -> Set[int]:
+        """获取所有被监听的源聊天ID"""
+        return set(self._by_chat.keys())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        return {
+            "generation": self.generation,
+            "build_time_ms": self.build_time_ms,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "last_refresh_at": self.last_refresh_at.isoformat() if self.last_refresh_at else None,
+            "rule_count": len(self._by_id),
+            "chat_count": len(self._by_chat),
+            "match_patterns": sum(plan.pattern_count for _rules, plan in self._routes.values())
+        }
+
+
+# 全局规则索引实例
+rule_index = RuleIndex()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+发送调度器 - 按目标聊天的令牌桶限速，并感知 Telegram FloodWait
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Awaitable, Optional
+
+from telethon.errors import FloodWaitError
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶：rate 为每秒补充的令牌数，capacity 为允许的突发量"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        # FloodWait 暂停截止时间（monotonic）
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def reserve(self) -> float:
+        """
+        尝试取走一个令牌
+
+        Returns:
+            float: 0 表示已取得令牌；否则为还需等待的秒数（未取走令牌）
+        """
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> float:
+        """等待直到取得一个令牌，返回等待的总时长（秒）"""
+        waited = 0.0
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """暂停该令牌桶（FloodWait），期间不发放令牌"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated_at = self.paused_until
+
+    @property
+    def paused_remaining(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+
+class _SendJob:
+    __slots__ = ('factory', 'future', 'submitted_at', 'attempts')
+
+    def __init__(self, factory: Callable[[], Awaitable[Any]], future: asyncio.Future):
+        self.factory = factory
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.attempts = 0
+
+
+class _TargetQueue:
+    """单个目标聊天的发送队列及统计"""
+
+    def __init__(self, target, rate: float, burst: float):
+        self.target = target
+        self.bucket = TokenBucket(rate, burst)
+        self.jobs: deque = deque()
+        self.worker: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+        self.last_flood_wait = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        completed = self.sent + self.failed
+        return {
+            "queue_depth": len(self.jobs),
+            "sent": self.sent,
+            "failed": self.failed,
+            "flood_waits": self.flood_waits,
+            "last_flood_wait": self.last_flood_wait,
+            "paused_seconds": round(self.bucket.paused_remaining, 1),
+            "avg_wait_ms": round(self.total_wait / completed * 1000, 1) if completed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
+
+
+class SendScheduler:
+    """
+    发送调度器（每个 TelegramClientManager 一个，运行在客户端事件循环中）
+
+    - 每个目标聊天一个令牌桶和一个串行队列，共享目标的规则按顺序排队发送
+    - 另有账号级全局令牌桶，限制所有目标的总发送速率
+    - 收到 FloodWaitError 时仅暂停对应目标的令牌桶并重试该请求，其他目标不受影响
+    - 目标队列空闲后其工作任务自动退出
+    """
+
+    def __init__(self, name: str, per_chat_rate: float = None, per_chat_burst: float = None,
+                 global_rate: float = None, global_burst: float = None,
+                 max_flood_retries: int = None, max_flood_wait: int = None):
+        self.name = name
+        self.per_chat_rate = per_chat_rate or Config.SEND_RATE_PER_CHAT
+        self.per_chat_burst = per_chat_burst or Config.SEND_BURST_PER_CHAT
+        self.global_bucket = TokenBucket(global_rate or Config.SEND_RATE_GLOBAL,
+                                         global_burst or Config.SEND_BURST_GLOBAL)
+        self.max_flood_retries = Config.SEND_MAX_FLOOD_RETRIES if max_flood_retries is None else max_flood_retries
+        self.max_flood_wait = Config.SEND_MAX_FLOOD_WAIT if max_flood_wait is None else max_flood_wait
+
+        self._targets: Dict[Any, _TargetQueue] = {}
+        self._closed = False
+
+    async def submit(self, target, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        提交一次发送并等待结果
+
+        Args:
+            target: 目标聊天（用作限速分组的键）
+            factory: 无参协程工厂，每次（重试）调用都生成新的发送协程
+        """
+        if self._closed:
+            raise RuntimeError("发送调度器已停止")
+
+        queue = self._targets.get(target)
+        if queue is None:
+            queue = _TargetQueue(target, self.per_chat_rate, self.per_chat_burst)
+            self._targets[target] = queue
+
+        future = asyncio.get_running_loop().create_future()
+        queue.jobs.append(_SendJob(factory, future))
+
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._worker(queue))
+
+        return await future
+
+    async def _worker(self, queue: _TargetQueue):
+        """串行处理单个目标的发送队列"""
+        while queue.jobs:
+            job = queue.jobs[0]
+            if job.future.done():
+                queue.jobs.popleft()
+                continue
+
+            # 先取目标令牌，再取全局令牌，避免占着全局令牌等待单个目标
+            await queue.bucket.acquire()
+            await self.global_bucket.acquire()
+
+            job.attempts += 1
+            try:
+                result = await job.factory()
+            except FloodWaitError as e:
+                seconds = getattr(e, 'seconds', 0) or 1
+                queue.flood_waits += 1
+                queue.last_flood_wait = seconds
+                queue.bucket.pause(seconds)
+
+                if job.attempts > self.max_flood_retries or seconds > self.max_flood_wait:
+                    logger.error(f"❌ [{self.name}] 目标 {queue.target} FloodWait {seconds}s，放弃发送 (第 {job.attempts} 次)")
+                    self._finish(queue, job, error=e)
+                else:
+                    logger.warning(f"⏳ [{self.name}] 目标 {queue.target} 触发 FloodWait，暂停 {seconds}s 后重试")
+                continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._finish(queue, job, error=e)
+                continue
+
+            self._finish(queue, job, result=result)
+
+    @staticmethod
+    def _finish(queue: _TargetQueue, job: _SendJob, result=None, error: Exception = None):
+        if queue.jobs and queue.jobs[0] is job:
+            queue.jobs.popleft()
+
+        wait = time.monotonic() - job.submitted_at
+        queue.total_wait += wait
+        queue.max_wait = max(queue.max_wait, wait)
+
+        if error is not None:
+            queue.failed += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+        else:
+            queue.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    async def stop(self):
+        """停止调度器，取消所有未完成的发送"""
+        self._closed = True
+        workers = []
+        for queue in self._targets.values():
+            while queue.jobs:
+                job = queue.jobs.popleft()
+                if not job.future.done():
+                    job.future.cancel()
+            if queue.worker and not queue.worker.done():
+                queue.worker.cancel()
+                workers.append(queue.worker)
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度器统计（按目标聊天）"""
+        targets = {str(target): queue.get_stats() for target, queue in self._targets.items()}
+        return {
+            "queue_depth": sum(item["queue_depth"] for item in targets.values()),
+            "global_paused_seconds": round(self.global_bucket.paused_remaining, 1),
+            "per_chat_rate": self.per_chat_rate,
+            "global_rate": self.global_bucket.rate,
+            "targets": targets
+        }
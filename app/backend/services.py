@@ -4,18 +4,24 @@
 import asyncio
 from datetime import datetime, timedelta
 from models import get_local_now
-from typing import List, Optional, Dict, Any, Union
-from sqlalchemy import select, delete, update, and_, or_, desc, func, text
+from timezone_utils import user_date_range_to_database
+from typing import List, Optional, Dict, Any, Union, Tuple
+from sqlalchemy import select, insert, delete, update, and_, or_, desc, func, text, tuple_
 from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 import json
+import base64
 from functools import lru_cache
 import time
 
-from database import get_db
+from config import Config
+from database import get_db, db_manager
 from models import ForwardRule, Keyword, ReplaceRule, MessageLog, UserSession, BotSettings
 from filters import KeywordFilter, RegexReplacer, MessageProcessor
+from stats_rollup import stats_rollup
+from event_bus import event_bus
 
 # 性能优化：缓存装饰器
 def cache_result(ttl: int = 300):
@@ -500,6 +506,14 @@ class MessageLogService:
             )
             
             db.add(log)
+            try:
+                await db.flush()
+            except IntegrityError:
+                # 唯一部分索引：同一规则同一消息只保留一条成功记录
+                await db.rollback()
+                logger.debug(f"消息 {source_message_id} 已有成功转发记录 (规则 {rule_id})，忽略重复日志")
+                return log
+            await stats_rollup.add(db, [(log.rule_id, log.status, log.processing_time, log.created_at)])
             await db.commit()
             await db.refresh(log)
             
@@ -507,18 +521,269 @@ class MessageLogService:
     
     @staticmethod
     async def log_messages_batch(logs_data: List[Dict[str, Any]]) -> int:
-        """批量记录消息日志 - 性能优化"""
+        """批量记录消息日志 - 单条 executemany INSERT"""
         if not logs_data:
             return 0
-            
-        async for db in get_db():
-            # 批量插入优化
-            logs = [MessageLog(**log_data) for log_data in logs_data]
-            db.add_all(logs)
+        
+        # executemany 要求每行字段一致，缺失的字段补 None
+        columns = set().union(*logs_data)
+        if any(len(row) != len(columns) for row in logs_data):
+            logs_data = [{column: row.get(column) for column in columns} for row in logs_data]
+        
+        table = MessageLog.__table__
+        columns = [table.c[name] for name in MessageLogService.EVENT_COLUMNS]
+        async with db_manager.async_session() as db:
+            # 违反唯一索引（重复的成功记录）的行直接忽略；RETURNING 只返回实际写入的行，用于累加统计和实时推送
+            result = await db.execute(insert(table).prefix_with("OR IGNORE").returning(*columns), logs_data)
+            inserted = result.mappings().all()
+            await stats_rollup.add(db, ((row['rule_id'], row['status'], row['processing_time'], row['created_at'])
+                                        for row in inserted))
             await db.commit()
+        
+        if inserted:
+            MessageLogService.publish_logs(inserted)
+        logger.debug(f"批量记录 {len(inserted)}/{len(logs_data)} 条日志")
+        return len(inserted)
+    
+    # 实时推送的日志字段
+    EVENT_COLUMNS = (
+        'id', 'rule_id', 'rule_name', 'source_chat_id', 'source_chat_name', 'target_chat_id', 'target_chat_name',
+        'source_message_id', 'target_message_id', 'original_text', 'media_type', 'status', 'error_message',
+        'processing_time', 'created_at'
+    )
+    
+    @staticmethod
+    def publish_logs(rows: List[Dict[str, Any]]):
+        """把新写入的日志推送给前端（字段与 /api/logs 的列表项一致）"""
+        counts: Dict[str, int] = {}
+        items = []
+        for row in rows:
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+            created_at = row['created_at']
+            items.append({
+                "id": row['id'],
+                "rule_id": row['rule_id'],
+                "rule_name": row['rule_name'] or (f"规则 #{row['rule_id']}" if row['rule_id'] else None),
+                "message_id": row['source_message_id'],
+                "forwarded_message_id": row['target_message_id'],
+                "source_chat_id": row['source_chat_id'],
+                "source_chat_name": row['source_chat_name'],
+                "target_chat_id": row['target_chat_id'],
+                "target_chat_name": row['target_chat_name'],
+                "message_text": row['original_text'],
+                "message_type": row['media_type'] or 'text',
+                "status": row['status'],
+                "error_message": row['error_message'],
+                "processing_time": row['processing_time'],
+                "created_at": created_at.replace(tzinfo=None).isoformat() if created_at else None
+            })
+        event_bus.publish('logs', {"items": items, "counts": counts})
+    
+    # 日志计数缓存: {筛选参数: (总数, 是否为近似值, 缓存时间)}
+    _count_cache: Dict[tuple, tuple] = {}
+    
+    @staticmethod
+    def build_log_filters(status: str = None, date: str = None, start_date: str = None,
+                          end_date: str = None, rule_id: int = None) -> list:
+        """把日志筛选参数转换为查询条件（列表、计数、导出、清空共用，保证口径一致）"""
+        conditions = []
+        
+        if status and status != 'all':
+            conditions.append(MessageLog.status == status)
+        
+        if rule_id:
+            conditions.append(MessageLog.rule_id == rule_id)
+        
+        # 日期筛选：转换为 created_at 的半开区间，可以使用 created_at 上的索引
+        if date:
+            start_date = end_date = date
+        if start_date or end_date:
+            try:
+                range_start, range_end = user_date_range_to_database(start_date, end_date)
+                if range_start:
+                    conditions.append(MessageLog.created_at >= range_start)
+                if range_end:
+                    conditions.append(MessageLog.created_at < range_end)
+            except ValueError:
+                logger.warning(f"无效的日期格式: {date or start_date}~{end_date}")
+        
+        return conditions
+    
+    @staticmethod
+    def encode_log_cursor(log: MessageLog) -> str:
+        """把一条日志的 (created_at, id) 编码为分页游标"""
+        raw = f"{log.created_at.isoformat()}|{log.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode_log_cursor(cursor: str) -> Tuple[datetime, int]:
+        """解析分页游标，格式错误时抛出 ValueError"""
+        try:
+            created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(created_at), int(log_id)
+        except Exception:
+            raise ValueError(f"无效的分页游标: {cursor}")
+    
+    @classmethod
+    async def count_logs(cls, **filters) -> Tuple[int, bool]:
+        """
+        按筛选条件计数（SELECT COUNT(*)，由索引回答）
+        
+        结果缓存 LOG_COUNT_CACHE_TTL 秒；设置了 LOG_COUNT_LIMIT 时最多数到该值，
+        超过后返回近似值。
+        
+        Returns:
+            (总数, 是否为近似值)
+        """
+        key = tuple(sorted((k, v) for k, v in filters.items() if v))
+        now = time.monotonic()
+        cached = cls._count_cache.get(key)
+        if cached and now - cached[2] < Config.LOG_COUNT_CACHE_TTL:
+            return cached[0], cached[1]
+        
+        conditions = cls.build_log_filters(**filters)
+        count_limit = Config.LOG_COUNT_LIMIT
+        if count_limit > 0:
+            # 只数到上限 + 1 条，大表上不会扫描全部匹配行
+            capped = select(MessageLog.id).where(*conditions).limit(count_limit + 1).subquery()
+            stmt = select(func.count()).select_from(capped)
+        else:
+            stmt = select(func.count()).select_from(MessageLog).where(*conditions)
+        
+        async with db_manager.async_session() as db:
+            total = (await db.execute(stmt)).scalar() or 0
+        
+        approximate = count_limit > 0 and total > count_limit
+        if approximate:
+            total = count_limit
+        
+        # 清理过期缓存
+        for expired in [k for k, v in cls._count_cache.items() if now - v[2] >= Config.LOG_COUNT_CACHE_TTL]:
+            del cls._count_cache[expired]
+        cls._count_cache[key] = (total, approximate, now)
+        return total, approximate
+    
+    @classmethod
+    def invalidate_count_cache(cls):
+        """日志被删除/导入后清空计数缓存"""
+        cls._count_cache.clear()
+    
+    @classmethod
+    async def get_logs_page(cls, limit: int = 20, page: int = 1, cursor: str = None,
+                            **filters) -> Tuple[List[MessageLog], Optional[str]]:
+        """
+        获取一页日志（按 created_at, id 倒序）
+        
+        传入 cursor 时使用键集分页：从游标位置沿索引继续读取，耗时与页码无关；
+        未传入时按 page 使用 OFFSET（仅用于直接跳页）。
+        
+        Returns:
+            (日志列表, 下一页游标；没有下一页时为 None)
+        """
+        conditions = cls.build_log_filters(**filters)
+        
+        stmt = select(MessageLog).options(joinedload(MessageLog.rule))
+        if cursor:
+            cursor_created_at, cursor_id = cls.decode_log_cursor(cursor)
+            # 行值比较，SQLite 可直接定位到索引中的游标位置
+            conditions.append(tuple_(MessageLog.created_at, MessageLog.id) < tuple_(cursor_created_at, cursor_id))
+        stmt = stmt.where(*conditions).order_by(desc(MessageLog.created_at), desc(MessageLog.id))
+        if not cursor and page > 1:
+            stmt = stmt.offset((page - 1) * limit)
+        # 多取一条用于判断是否还有下一页
+        stmt = stmt.limit(limit + 1)
+        
+        async with db_manager.async_session() as db:
+            result = await db.execute(stmt)
+            logs = list(result.scalars().all())
+        
+        next_cursor = None
+        if len(logs) > limit:
+            logs = logs[:limit]
+            next_cursor = cls.encode_log_cursor(logs[-1])
+        return logs, next_cursor
+    
+    @classmethod
+    async def iter_logs(cls, chunk_size: int = 1000, **filters):
+        """
+        按 (created_at, id) 升序分块读取日志（用于导出）
+        
+        每块使用独立的短会话和键集条件读取，不持有长时间打开的游标/事务
+        （所有会话共用同一个 SQLite 连接），内存占用只与块大小有关。
+        
+        Yields:
+            List[dict]: 一块日志的列值字典
+        """
+        conditions = cls.build_log_filters(**filters)
+        table = MessageLog.__table__
+        last_key = None
+        
+        while True:
+            stmt = select(table).where(*conditions)
+            if last_key:
+                stmt = stmt.where(tuple_(table.c.created_at, table.c.id) > tuple_(*last_key))
+            stmt = stmt.order_by(table.c.created_at, table.c.id).limit(chunk_size)
             
-            logger.debug(f"批量记录 {len(logs)} 条日志")
-            return len(logs)
+            async with db_manager.async_session() as db:
+                rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+            
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_key = (rows[-1]['created_at'], rows[-1]['id'])
+    
+    @staticmethod
+    async def import_logs_chunk(rows: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        导入一块日志：一次查询取出已存在的 (规则, 源聊天, 源消息) 键，剩余行一次 executemany 写入
+        
+        Args:
+            rows: 已规范化的列值字典（字段一致）
+        
+        Returns:
+            (导入条数, 跳过条数)
+        """
+        if not rows:
+            return 0, 0
+        
+        # 块内重复只保留第一条
+        unique_rows = {}
+        for row in rows:
+            unique_rows.setdefault((row['rule_id'], row['source_chat_id'], row['source_message_id']), row)
+        
+        # 以本块的 (源聊天, 源消息) 作为驱动表逐个查索引；行值 IN (VALUES ...) 在 SQLite 中会扫描整个索引
+        pairs = list({(key[1], key[2]) for key in unique_rows})
+        existing_sql = (
+            f"WITH chunk_keys(chat_id, message_id) AS (VALUES {', '.join(['(?, ?)'] * len(pairs))}) "
+            "SELECT ml.rule_id, ml.source_chat_id, ml.source_message_id "
+            "FROM chunk_keys CROSS JOIN message_logs ml "
+            "ON ml.source_chat_id = chunk_keys.chat_id AND ml.source_message_id = chunk_keys.message_id"
+        )
+        
+        async with db_manager.async_session() as db:
+            # 直接执行驱动层 SQL，省去每块数千个绑定参数的语句编译
+            connection = await db.connection()
+            result = await connection.exec_driver_sql(existing_sql, tuple(v for pair in pairs for v in pair))
+            existing = {tuple(row) for row in result.fetchall()}
+            
+            new_rows = [row for key, row in unique_rows.items() if key not in existing]
+            imported = 0
+            if new_rows:
+                # 与并发写入的成功记录冲突（唯一索引）的行直接忽略，RETURNING 只返回实际写入的行
+                table = MessageLog.__table__
+                result = await db.execute(
+                    insert(table).prefix_with("OR IGNORE")
+                    .returning(table.c.rule_id, table.c.status, table.c.processing_time, table.c.created_at),
+                    new_rows
+                )
+                inserted = result.fetchall()
+                await stats_rollup.add(db, inserted)
+                await db.commit()
+                imported = len(inserted)
+        
+        return imported, len(rows) - imported
     
     @staticmethod
     async def get_logs_by_rule(rule_id: int, limit: int = 100) -> List[MessageLog]:
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+转发统计汇总 - 按规则、小时/天、状态预聚合消息日志，仪表盘统计不再扫描日志表
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Tuple
+
+from sqlalchemy import select, delete, update, func, bindparam, literal, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import Config
+from database import db_manager
+from models import MessageLog, MessageStat, ForwardRule, get_local_now
+
+logger = logging.getLogger(__name__)
+
+# 时间桶粒度 -> 把 created_at 截断到桶起点的 strftime 格式（与 SQLAlchemy 的 DATETIME 存储格式一致）
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%d %H:00:00.000000',
+    'day': '%Y-%m-%d 00:00:00.000000',
+}
+
+# 汇总键: (粒度, 桶起点, 规则ID, 状态) -> [消息数, 处理时间合计, 计时消息数, 最长处理时间]
+StatKey = Tuple[str, datetime, int, str]
+
+
+def _bucket_start(created_at: datetime, bucket: str) -> datetime:
+    """截断到桶起点；数据库保存无时区的用户时区时间，带时区的时间直接去掉时区信息"""
+    if bucket == 'hour':
+        return created_at.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    return created_at.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def _aggregate(rows: Iterable[Any]) -> Dict[StatKey, List[int]]:
+    """把日志行 (rule_id, status, processing_time, created_at) 聚合到小时桶和天桶"""
+    totals: Dict[StatKey, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+    for rule_id, status, processing_time, created_at in rows:
+        created_at = created_at or get_local_now()
+        for bucket in BUCKET_FORMATS:
+            values = totals[(bucket, _bucket_start(created_at, bucket), rule_id or 0, status or 'success')]
+            values[0] += 1
+            if processing_time is not None:
+                values[1] += processing_time
+                values[2] += 1
+                values[3] = max(values[3], processing_time)
+    return totals
+
+
+class StatsRollup:
+    """
+    转发统计汇总
+
+    - 日志写入（实时批量写入、单条写入、导入）时，在同一事务中把实际写入的行累加到 message_stats，
+      每个 (小时/天, 规则, 状态) 一行，统计只与规则数和时间桶数有关
+    - 手动删除/清空日志时按被删除的行扣减；按保留期清理旧日志不影响统计（统计保留历史）
+    - 小时桶只保留 STATS_HOURLY_RETENTION_DAYS 天，天桶永久保留
+    """
+
+    def __init__(self):
+        self._pruned_before = None
+
+    async def add(self, db, rows: Iterable[Any]):
+        """累加新写入的日志行（由调用方提交事务）"""
+        totals = _aggregate(rows)
+        if not totals:
+            return
+
+        stmt = sqlite_insert(MessageStat)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['bucket', 'bucket_start', 'rule_id', 'status'],
+            set_={
+                "count": MessageStat.count + stmt.excluded.count,
+                "total_processing_time": MessageStat.total_processing_time + stmt.excluded.total_processing_time,
+                "timed_count": MessageStat.timed_count + stmt.excluded.timed_count,
+                "max_processing_time": func.max(MessageStat.max_processing_time, stmt.excluded.max_processing_time),
+            }
+        )
+        await db.execute(stmt, [
+            {
+                "bucket": bucket, "bucket_start": bucket_start, "rule_id": rule_id, "status": status,
+                "count": values[0], "total_processing_time": values[1],
+                "timed_count": values[2], "max_processing_time": values[3],
+            }
+            for (bucket, bucket_start, rule_id, status), values in totals.items()
+        ])
+        await self._prune_hourly(db)
+
+    async def subtract(self, db, conditions: list):
+        """扣减即将被删除的日志（在删除语句之前、同一事务中调用）"""
+        # 先在数据库中按小时聚合，清空大量日志时也只需读取 O(规则 × 小时 × 状态) 行
+        hour_start = func.strftime(BUCKET_FORMATS['hour'], MessageLog.created_at)
+        rule_id = func.coalesce(MessageLog.rule_id, 0)
+        status = func.coalesce(MessageLog.status, 'success')
+        result = await db.execute(
+            select(hour_start, rule_id, status, func.count(),
+                   func.coalesce(func.sum(MessageLog.processing_time), 0), func.count(MessageLog.processing_time))
+            .where(MessageLog.created_at.isnot(None), *conditions)
+            .group_by(hour_start, rule_id, status)
+        )
+
+        totals: Dict[StatKey, List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+        for bucket_start, rule, state, count, total_time, timed in result:
+            bucket_start = datetime.fromisoformat(bucket_start)
+            for bucket in BUCKET_FORMATS:
+                values = totals[(bucket, _bucket_start(bucket_start, bucket), rule, state)]
+                values[0] += count
+                values[1] += total_time
+                values[2] += timed
+        if not totals:
+            return
+
+        table = MessageStat.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.bucket == bindparam('b_bucket'), table.c.bucket_start == bindparam('b_start'),
+                   table.c.rule_id == bindparam('b_rule_id'), table.c.status == bindparam('b_status'))
+            .values(count=table.c.count - bindparam('b_count'),
+                    total_processing_time=table.c.total_processing_time - bindparam('b_total'),
+                    timed_count=table.c.timed_count - bindparam('b_timed')),
+            [
+                {
+                    "b_bucket": bucket, "b_start": bucket_start, "b_rule_id": rule_id, "b_status": status,
+                    "b_count": values[0], "b_total": values[1], "b_timed": values[2],
+                }
+                for (bucket, bucket_start, rule_id, status), values in totals.items()
+            ]
+        )
+        await db.execute(delete(MessageStat).where(MessageStat.count <= 0))
+
+    async def rebuild(self) -> int:
+        """由 message_logs 重新生成全部统计（首次启用时回填），返回生成的汇总行数"""
+        async with db_manager.async_session() as db:
+            await db.execute(delete(MessageStat))
+            for bucket, fmt in BUCKET_FORMATS.items():
+                bucket_start = func.strftime(fmt, MessageLog.created_at)
+                rule_id = func.coalesce(MessageLog.rule_id, 0)
+                status = func.coalesce(MessageLog.status, 'success')
+                aggregate = (
+                    select(
+                        literal(bucket), bucket_start, rule_id, status,
+                        func.count(),
+                        func.coalesce(func.sum(MessageLog.processing_time), 0),
+                        func.count(MessageLog.processing_time),
+                        func.coalesce(func.max(MessageLog.processing_time), 0),
+                    )
+                    .where(MessageLog.created_at.isnot(None))
+                    .group_by(bucket_start, rule_id, status)
+                )
+                await db.execute(
+                    MessageStat.__table__.insert().from_select(
+                        ['bucket', 'bucket_start', 'rule_id', 'status', 'count',
+                         'total_processing_time', 'timed_count', 'max_processing_time'],
+                        aggregate
+                    )
+                )
+            await self._prune_hourly(db, force=True)
+            await db.commit()
+            total = (await db.execute(select(func.count()).select_from(MessageStat))).scalar() or 0
+
+        logger.info(f"📊 转发统计已重建: {total} 个汇总行")
+        return total
+
+    async def _prune_hourly(self, db, force: bool = False):
+        """删除超出保留期的小时桶（每天最多执行一次）"""
+        cutoff = _bucket_start(get_local_now(), 'day') - timedelta(days=max(1, Config.STATS_HOURLY_RETENTION_DAYS))
+        if not force and self._pruned_before == cutoff:
+            return
+        await db.execute(delete(MessageStat).where(MessageStat.bucket == 'hour', MessageStat.bucket_start < cutoff))
+        self._pruned_before = cutoff
+
+    @staticmethod
+    async def _totals(db, group_by: tuple, *conditions) -> list:
+        """按 group_by 汇总统计行: (*分组列, 消息数, 成功数, 失败数, 处理时间合计, 计时消息数, 最长处理时间)"""
+        result = await db.execute(
+            select(
+                *group_by,
+                func.sum(MessageStat.count),
+                func.sum(case((MessageStat.status == 'success', MessageStat.count), else_=0)),
+                func.sum(case((MessageStat.status == 'failed', MessageStat.count), else_=0)),
+                func.sum(MessageStat.total_processing_time),
+                func.sum(MessageStat.timed_count),
+                func.max(MessageStat.max_processing_time),
+            ).where(*conditions).group_by(*group_by)
+        )
+        return result.all()
+
+    @staticmethod
+    def _figures(row) -> Dict[str, Any]:
+        """把 _totals 的汇总列转换为接口字段"""
+        total, success, failed, total_time, timed, max_time = row[-6:]
+        return {
+            "total": total or 0,
+            "success": success or 0,
+            "failed": failed or 0,
+            "success_rate": round(success / total * 100, 1) if total else 0,
+            "avg_processing_time": round(total_time / timed) if timed else 0,
+            "max_processing_time": max_time or 0,
+        }
+
+    async def get_summary(self, days: int = 7) -> Dict[str, Any]:
+        """
+        仪表盘统计：今日汇总、今日分小时、最近 days 天分天、各规则汇总
+
+        只在数据库中聚合最近 days 天的天桶和今天的小时桶，耗时与日志总量无关。
+        """
+        today = _bucket_start(get_local_now(), 'day')
+        first_day = today - timedelta(days=days - 1)
+        in_days = (MessageStat.bucket == 'day', MessageStat.bucket_start >= first_day)
+
+        async with db_manager.async_session() as db:
+            daily_rows = await self._totals(db, (MessageStat.bucket_start,), *in_days)
+            hourly_rows = await self._totals(db, (MessageStat.bucket_start,),
+                                             MessageStat.bucket == 'hour', MessageStat.bucket_start >= today)
+            rule_week_rows = await self._totals(db, (MessageStat.rule_id,), *in_days)
+            rule_today_rows = await self._totals(db, (MessageStat.rule_id,),
+                                                 MessageStat.bucket == 'day', MessageStat.bucket_start == today)
+            rule_daily_rows = (await db.execute(
+                select(MessageStat.rule_id, MessageStat.bucket_start, func.sum(MessageStat.count))
+                .where(*in_days).group_by(MessageStat.rule_id, MessageStat.bucket_start)
+            )).all()
+            rules = (await db.execute(
+                select(ForwardRule.id, ForwardRule.name, ForwardRule.is_active).order_by(ForwardRule.id)
+            )).all()
+
+        empty = self._figures((0,) * 6)
+        daily = {row[0]: self._figures(row) for row in daily_rows}
+        hourly = {row[0]: self._figures(row) for row in hourly_rows}
+        rule_week = {row[0]: self._figures(row) for row in rule_week_rows}
+        rule_today = {row[0]: self._figures(row) for row in rule_today_rows}
+        dates = [first_day + timedelta(days=i) for i in range(days)]
+        date_index = {date: i for i, date in enumerate(dates)}
+        rule_daily = defaultdict(lambda: [0] * days)
+        for rule_id, bucket_start, count in rule_daily_rows:
+            if bucket_start in date_index:
+                rule_daily[rule_id][date_index[bucket_start]] = count
+
+        per_rule = []
+        for rule_id, name, is_active in rules:
+            week_values = rule_week.get(rule_id, empty)
+            today_values = rule_today.get(rule_id, empty)
+            per_rule.append({
+                "rule_id": rule_id,
+                "rule_name": name,
+                "is_active": bool(is_active),
+                "today_messages": today_values["total"],
+                "today_success": today_values["success"],
+                "today_failed": today_values["failed"],
+                "week_messages": week_values["total"],
+                "week_success": week_values["success"],
+                "success_rate": week_values["success_rate"],
+                "avg_processing_time": week_values["avg_processing_time"],
+                "max_processing_time": week_values["max_processing_time"],
+                "daily": rule_daily[rule_id],
+            })
+
+        today_values = daily.get(today, empty)
+        return {
+            "total_rules": len(rules),
+            "active_rules": sum(1 for rule in rules if rule.is_active),
+            "today_messages": today_values["total"],
+            "success_messages": today_values["success"],
+            "failed_messages": today_values["failed"],
+            "success_rate": today_values["success_rate"],
+            "avg_processing_time": today_values["avg_processing_time"],
+            "max_processing_time": today_values["max_processing_time"],
+            "hourly": [
+                {"hour": f"{hour:02d}:00", **hourly.get(today + timedelta(hours=hour), empty)}
+                for hour in range(24)
+            ],
+            "daily": [
+                {"date": date.strftime('%Y-%m-%d'), **daily.get(date, empty)}
+                for date in dates
+            ],
+            "rules": per_rule,
+        }
+
+
+# 全局统计汇总实例
+stats_rollup = StatsRollup()
@@ -10,18 +10,55 @@ from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
-from telethon import TelegramClient, events
-from telethon.errors import FloodWaitError, ChatAdminRequiredError, UserPrivacyRestrictedError
-from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
+from telethon import TelegramClient, events, utils
+from telethon.errors import (
+    FloodWaitError, ChatAdminRequiredError, UserPrivacyRestrictedError, ChatForwardsRestrictedError,
+    MessageNotModifiedError
+)
+from telethon.tl import types
+from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, MessageMediaWebPage
 
 from config import Config
 from database import get_db
 from models import ForwardRule, MessageLog, get_local_now
 from filters import KeywordFilter, RegexReplacer
+from rule_index import rule_index
+from log_writer import MessageLogWriter
+from send_scheduler import SendScheduler
+from album_aggregator import AlbumAggregator
+from forward_batcher import ForwardBatcher
+from delivery_queue import DeliveryQueue
+from event_queue import EventWorkerPool
+from message_mapping import message_mapping
+from dedup_guard import dedup_guard
+from chat_entity_cache import chat_entity_cache
+from event_bus import event_bus
+from dialog_cache import DialogCache
 from proxy_utils import get_proxy_manager
 
 logger = logging.getLogger(__name__)
 
+# 客户端运行方式：thread 为每个客户端一个线程和事件循环；shared 为所有客户端作为任务运行在主事件循环中
+CLIENT_LOOP_MODES = ('thread', 'shared')
+# 共享事件循环模式下客户端运行所在的主事件循环（首次在事件循环中启动客户端时记录）
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+# 等待客户端启动完成的超时（秒）
+STARTUP_TIMEOUT = 30
+# 启动时间线各阶段的显示名称（按执行顺序）
+STARTUP_PHASES = {
+    "session_load": "会话加载",
+    "connect": "连接",
+    "login": "登录验证",
+    "get_me": "获取账号信息",
+    "handlers": "注册事件处理器",
+    "monitored_chats": "加载监听聊天",
+}
+
+def _resolve_waiter(future: asyncio.Future):
+    """唤醒一个启动等待者（在等待者的事件循环中执行）"""
+    if not future.done():
+        future.set_result(None)
+
 def get_configured_timezone():
     """获取配置的时区对象"""
     try:
@@ -79,7 +116,7 @@ class TelegramClientManager:
     Telegram客户端管理器
     
     核心修复:
-    1. 每个客户端运行在独立线程中
+    1. 每个客户端运行在独立线程中（CLIENT_LOOP_MODE=shared 时作为任务运行在主事件循环中）
     2. 使用装饰器事件处理避免add_event_handler
     3. 直接使用run_until_disconnected，不包装在任务中
     4. 异步任务隔离，避免阻塞事件监听
@@ -91,9 +128,17 @@ class TelegramClientManager:
         self.client: Optional[TelegramClient] = None
         self.thread: Optional[threading.Thread] = None
         self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # 运行方式（见 CLIENT_LOOP_MODES）；共享模式下客户端主任务
+        self.loop_mode = Config.CLIENT_LOOP_MODE if Config.CLIENT_LOOP_MODE in CLIENT_LOOP_MODES else 'thread'
+        self.task = None
         self.running = False
         self.connected = False
         self.user_info = None
+        # 启动完成信号（成功或失败都会触发）、异步等待者和启动时间线
+        self._startup_done = threading.Event()
+        self._startup_lock = threading.Lock()
+        self._startup_waiters: List[tuple] = []
+        self.startup_timeline: Dict[str, Any] = {}
         
         # 客户端配置
         # 机器人客户端配置
@@ -110,6 +155,27 @@ class TelegramClientManager:
         self.regex_replacer = RegexReplacer()
         self.monitored_chats = set()
         
+        # 事件工作池（有界队列 + 固定数量的工作协程）
+        self.event_pool: Optional[EventWorkerPool] = None
+        # 消息日志批量写入器（在客户端事件循环中运行）
+        self.log_writer: Optional[MessageLogWriter] = None
+        # 发送调度器（按目标聊天限速，处理FloodWait）
+        self.send_scheduler: Optional[SendScheduler] = None
+        # 相册聚合器（同一 grouped_id 的消息合并为一次发送）
+        self.album_aggregator: Optional[AlbumAggregator] = None
+        # 原生转发合并器（copy/forward 模式下同一目标的消息合并为一次请求）
+        self.forward_batcher: Optional[ForwardBatcher] = None
+        # 延迟投递队列（forward_delay 到期后再重新获取消息投递）
+        self.delivery_queue: Optional[DeliveryQueue] = None
+        # 会话列表缓存（连接后加载一次，之后由更新事件增量维护）
+        self.dialog_cache = DialogCache(client_id, client_type)
+        # 跨线程调用（call）：客户端事件循环中的并发上限和统计
+        self._call_semaphore: Optional[asyncio.Semaphore] = None
+        self.calls = 0
+        self.call_timeouts = 0
+        self.call_errors = 0
+        self.calls_active = 0
+        
         # 状态回调
         self.status_callbacks: List[Callable] = []
         
@@ -131,13 +197,78 @@ class TelegramClientManager:
                 callback(self.client_id, status, data or {})
             except Exception as e:
                 self.logger.error(f"状态回调执行失败: {e}")
+        
+        # 推送给前端（附带完整状态，前端无需再轮询）
+        try:
+            event_bus.publish('client_status', {
+                "client_id": self.client_id,
+                "event": status,
+                "data": data or {},
+                "status": self.get_status()
+            })
+        except Exception as e:
+            self.logger.error(f"推送状态变化失败: {e}")
     
     def start(self) -> bool:
-        """启动客户端（在独立线程中）"""
+        """启动客户端（独立线程模式下阻塞等待启动完成；共享事件循环模式下提交任务后立即返回）"""
         if self.running:
             self.logger.warning("客户端已在运行中")
             return True
         
+        self._startup_done.clear()
+        if self.loop_mode == 'shared':
+            return self._start_shared()
+        
+        if not self._start_thread():
+            return False
+        self._startup_done.wait(timeout=STARTUP_TIMEOUT)
+        return self._startup_result()
+    
+    async def start_async(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        """启动客户端并等待启动完成（不阻塞调用方的事件循环），返回是否已连接"""
+        if self.running:
+            self.logger.warning("客户端已在运行中")
+            return True
+        
+        self._startup_done.clear()
+        if self.loop_mode == 'shared':
+            started = self._start_shared()
+        else:
+            started = self._start_thread()
+        if not started:
+            return False
+        await self.wait_started(timeout)
+        return self._startup_result()
+    
+    async def wait_started(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        """等待本次启动完成（任意事件循环中调用），返回是否已连接"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with self._startup_lock:
+            if self._startup_done.is_set():
+                return self.running
+            self._startup_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            with self._startup_lock:
+                if waiter in self._startup_waiters:
+                    self._startup_waiters.remove(waiter)
+        return self.running
+    
+    def _startup_result(self) -> bool:
+        if self.running:
+            self.logger.info(f"✅ 客户端 {self.client_id} 启动成功")
+            return True
+        if self._startup_done.is_set():
+            self.logger.error(f"❌ 客户端 {self.client_id} 启动失败")
+        else:
+            self.logger.error(f"❌ 客户端 {self.client_id} 启动超时")
+        return False
+    
+    def _start_thread(self) -> bool:
+        """在独立线程中启动客户端"""
         try:
             self.thread = threading.Thread(
                 target=self._run_client_thread,
@@ -145,24 +276,74 @@ class TelegramClientManager:
                 daemon=True
             )
             self.thread.start()
-            
-            # 等待启动完成
-            max_wait = 30  # 30秒超时
-            start_time = time.time()
-            while not self.running and (time.time() - start_time) < max_wait:
-                time.sleep(0.1)
-            
-            if self.running:
-                self.logger.info(f"✅ 客户端 {self.client_id} 启动成功")
-                return True
+            return True
+        except Exception as e:
+            self.logger.error(f"启动客户端失败: {e}")
+            return False
+    
+    def _finish_startup(self, error: str = None):
+        """记录启动结果并唤醒所有等待者（在客户端事件循环中调用）"""
+        timeline = self.startup_timeline
+        timeline["result"] = "failed" if error else "connected"
+        timeline["error"] = error
+        timeline["total_ms"] = round(sum(timeline["phases"].values()), 1)
+        phases = ", ".join(f"{STARTUP_PHASES[name]} {ms}ms" for name, ms in timeline["phases"].items())
+        if error:
+            self.logger.warning(f"⏱️ 客户端 {self.client_id} 启动失败 ({phases or '未完成任何阶段'}): {error}")
+        else:
+            self.logger.info(f"⏱️ 客户端 {self.client_id} 启动耗时 {timeline['total_ms']}ms: {phases}")
+        
+        with self._startup_lock:
+            self._startup_done.set()
+            waiters, self._startup_waiters = self._startup_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, future)
+            except RuntimeError:
+                # 等待者的事件循环已关闭
+                pass
+    
+    def _record_phase(self, name: str, phase_start: float) -> float:
+        """记录一个启动阶段的耗时，返回下一阶段的开始时间"""
+        now = time.perf_counter()
+        self.startup_timeline["phases"][name] = round((now - phase_start) * 1000, 1)
+        return now
+    
+    def _start_shared(self) -> bool:
+        """在主事件循环中以任务方式启动客户端（连接结果通过状态回调通知）"""
+        global _shared_loop
+        if self.task is not None and not self.task.done():
+            self.logger.warning("客户端任务已在运行中")
+            return True
+        
+        try:
+            _shared_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        if _shared_loop is None or _shared_loop.is_closed():
+            self.logger.warning("⚠️ 主事件循环不可用，改用独立线程模式启动")
+            self.loop_mode = 'thread'
+            return self.start()
+        
+        self.loop = _shared_loop
+        try:
+            if self._in_own_loop():
+                self.task = self.loop.create_task(self._run_client_shared())
             else:
-                self.logger.error(f"❌ 客户端 {self.client_id} 启动超时")
-                return False
-                
+                self.task = asyncio.run_coroutine_threadsafe(self._run_client_shared(), self.loop)
+            self.logger.info(f"🚀 客户端 {self.client_id} 已在主事件循环中启动")
+            return True
         except Exception as e:
             self.logger.error(f"启动客户端失败: {e}")
             return False
     
+    def _in_own_loop(self) -> bool:
+        """当前是否运行在客户端所在的事件循环中"""
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+    
     def stop(self):
         """停止客户端"""
         if not self.running:
@@ -170,10 +351,23 @@ class TelegramClientManager:
         
         self.running = False
         
+        if self.loop_mode == 'shared':
+            if self._in_own_loop():
+                # 在主事件循环中调用时不能同步等待，断开连接后客户端任务自行结束
+                if self.client:
+                    self.loop.create_task(self._disconnect())
+            else:
+                try:
+                    asyncio.run_coroutine_threadsafe(self._stop_shared(), self.loop).result(timeout=10)
+                except Exception as e:
+                    self.logger.warning(f"等待客户端任务结束失败: {e!r}")
+            self.logger.info(f"✅ 客户端 {self.client_id} 已停止")
+            return
+        
         if self.loop and self.client:
             # 在客户端的事件循环中执行断开连接
             asyncio.run_coroutine_threadsafe(
-                self.client.disconnect(), 
+                self._disconnect(), 
                 self.loop
             )
         
@@ -182,6 +376,37 @@ class TelegramClientManager:
         
         self.logger.info(f"✅ 客户端 {self.client_id} 已停止")
     
+    async def _disconnect(self):
+        """（客户端事件循环中）先发送缓冲中的相册，再断开连接"""
+        if self.album_aggregator:
+            try:
+                await self.album_aggregator.flush_all()
+            except Exception as e:
+                self.logger.error(f"停止前发送缓冲相册失败: {e}")
+        await self.client.disconnect()
+    
+    async def _stop_shared(self):
+        """（主事件循环中）断开连接并等待客户端任务结束"""
+        if self.client:
+            await self._disconnect()
+        task = self.task
+        if task is None or task.done():
+            return
+        if not isinstance(task, asyncio.Future):
+            # 从其他线程启动时为 concurrent.futures.Future
+            task = asyncio.wrap_future(task)
+        await asyncio.wait({task}, timeout=10)
+    
+    async def _run_client_shared(self):
+        """在主事件循环中运行客户端（共享事件循环模式）"""
+        try:
+            await self._run_client()
+        except Exception as e:
+            self.logger.error(f"客户端任务运行失败: {e}")
+        finally:
+            self.running = False
+            self.connected = False
+    
     def _run_client_thread(self):
         """在独立线程中运行客户端"""
         try:
@@ -203,23 +428,32 @@ class TelegramClientManager:
     
     async def _run_client(self):
         """运行客户端主逻辑"""
+        self._call_semaphore = asyncio.Semaphore(max(1, Config.CLIENT_CALL_CONCURRENCY))
+        self.startup_timeline = {"started_at": get_local_now().isoformat(), "phases": {}}
+        phase_start = time.perf_counter()
         try:
-            # 创建客户端
+            # 创建客户端（加载会话文件）
             await self._create_client()
             
             if not self.client:
                 raise Exception("客户端创建失败")
+            phase_start = self._record_phase("session_load", phase_start)
+            
+            await self.client.connect()
+            phase_start = self._record_phase("connect", phase_start)
             
-            # 启动客户端
+            # 启动客户端（检查授权，机器人使用 token 登录）
             if self.client_type == "bot":
                 bot_token = self.bot_token or Config.BOT_TOKEN
                 await self.client.start(bot_token=bot_token)
             else:
                 phone = self.phone or Config.PHONE_NUMBER
                 await self.client.start(phone=phone)
+            phase_start = self._record_phase("login", phase_start)
             
             # 获取用户信息
             self.user_info = await self.client.get_me()
+            phase_start = self._record_phase("get_me", phase_start)
             self.connected = True
             self.running = True
             
@@ -233,11 +467,29 @@ class TelegramClientManager:
                 }
             })
             
+            # 启动日志批量写入器（需在事件处理器之前就绪）
+            self.log_writer = MessageLogWriter(self.client_id)
+            self.log_writer.start()
+            self.send_scheduler = SendScheduler(self.client_id)
+            self.album_aggregator = AlbumAggregator(self._process_album)
+            self.forward_batcher = ForwardBatcher(self.client, self._send)
+            self.delivery_queue = DeliveryQueue(self.client_id, self.client, self._on_delivery_due)
+            self.delivery_queue.start()
+            self.event_pool = EventWorkerPool(self.client_id, self.client, self._process_message)
+            self.event_pool.start()
+            
             # 注册事件处理器（使用装饰器方式）
             self._register_event_handlers()
+            phase_start = self._record_phase("handlers", phase_start)
             
             # 更新监听聊天列表
             await self._update_monitored_chats()
+            self._record_phase("monitored_chats", phase_start)
+            self._finish_startup()
+            
+            # 后台加载会话列表（事件处理器已注册，加载期间的更新不会丢失）
+            self.dialog_cache.set_client_info(self._get_client_display_name())
+            self.loop.create_task(self._load_dialogs())
             
             # 关键修复：直接使用run_until_disconnected，不包装在任务中
             self.logger.info(f"🎯 开始监听消息...")
@@ -246,10 +498,31 @@ class TelegramClientManager:
         except Exception as e:
             self.logger.error(f"客户端运行失败: {e}")
             self._notify_status_change("error", {"error": str(e)})
+            if not self._startup_done.is_set():
+                self._finish_startup(str(e) or type(e).__name__)
             raise
         finally:
             self.running = False
             self.connected = False
+            if not self._startup_done.is_set():
+                self._finish_startup("启动被中断")
+            if self.event_pool:
+                await self.event_pool.stop()
+            if self.album_aggregator:
+                # 停止时已在断开前发送；此处连接已断开，剩余的相册无法再发送
+                discarded = await self.album_aggregator.discard_all()
+                if discarded:
+                    self.logger.warning(f"⚠️ 客户端已断开，丢弃 {discarded} 个未发送的相册")
+            if self.delivery_queue:
+                await self.delivery_queue.stop()
+            if self.forward_batcher:
+                await self.forward_batcher.stop()
+            if self.send_scheduler:
+                await self.send_scheduler.stop()
+            # 刷新尚未写入的日志
+            if self.log_writer:
+                await self.log_writer.stop()
+            self.dialog_cache.clear()
             self._notify_status_change("disconnected", {})
     
     async def _create_client(self):
@@ -315,8 +588,15 @@ class TelegramClientManager:
         async def handle_new_message(event):
             """处理新消息事件"""
             try:
-                # 异步任务隔离：在独立任务中处理，避免阻塞事件监听
-                asyncio.create_task(self._process_message(event))
+                self.dialog_cache.on_message(event)
+            except Exception as e:
+                self.logger.debug(f"更新会话缓存失败: {e}")
+            try:
+                # 放入有界事件队列，由工作协程处理，避免为每条消息创建任务
+                if self.event_pool:
+                    await self.event_pool.submit(event)
+                else:
+                    asyncio.create_task(self._process_message(event))
             except Exception as e:
                 self.logger.error(f"消息处理任务创建失败: {e}")
         
@@ -324,10 +604,37 @@ class TelegramClientManager:
         async def handle_message_edited(event):
             """处理消息编辑事件"""
             try:
-                asyncio.create_task(self._process_message(event, is_edited=True))
+                if self.event_pool:
+                    await self.event_pool.submit(event, is_edited=True)
+                else:
+                    asyncio.create_task(self._process_message(event, is_edited=True))
             except Exception as e:
                 self.logger.error(f"消息编辑处理任务创建失败: {e}")
         
+        @self.client.on(events.ChatAction())
+        async def handle_chat_action(event):
+            """入群、退群、改名时更新会话缓存"""
+            try:
+                self.dialog_cache.on_chat_action(event, getattr(self.user_info, 'id', None))
+            except Exception as e:
+                self.logger.debug(f"更新会话缓存失败: {e}")
+        
+        @self.client.on(events.MessageRead(inbox=True))
+        async def handle_message_read(event):
+            """已读时更新会话缓存中的未读数"""
+            try:
+                self.dialog_cache.on_read(event)
+            except Exception as e:
+                self.logger.debug(f"更新会话缓存失败: {e}")
+        
+        @self.client.on(events.Raw(types.UpdateChannel))
+        async def handle_channel_update(update):
+            """加入或退出频道时更新会话缓存"""
+            try:
+                self.dialog_cache.on_channel_update(self.client, update)
+            except Exception as e:
+                self.logger.debug(f"更新会话缓存失败: {e}")
+        
         self.logger.info("✅ 事件处理器已注册（装饰器方式）")
     
     async def _process_message(self, event, is_edited: bool = False):
@@ -358,31 +665,36 @@ class TelegramClientManager:
             
             self.logger.info(f"📨 收到消息: 原始ID={raw_chat_id}, 转换ID={chat_id}, 消息ID={message.id}")
             
-            # 检查是否需要监听此聊天
-            if chat_id not in self.monitored_chats:
-                # 性能优化：降低日志级别，减少IO
-                self.logger.debug(f"聊天ID {chat_id} 不在监听列表中")
+            # 相册消息先按 grouped_id 聚合，整组统一过滤和发送
+            if getattr(message, 'grouped_id', None) and not is_edited and self.album_aggregator:
+                if rule_index.get_rules(chat_id):
+                    self.album_aggregator.add(chat_id, message)
                 return
             
-            self.logger.debug(f"处理监听消息: 聊天ID={chat_id}, 消息ID={message.id}")
-            
-            # 获取适用的转发规则
-            rules = await self._get_applicable_rules(chat_id)
+            # 从内存规则索引获取适用的转发规则（无数据库查询），
+            # 同一聊天的所有规则共用一次关键词扫描，只有通过过滤的规则才会继续处理
+            rules = self._get_applicable_rules(chat_id, message.text or "")
             
             if not rules:
-                self.logger.debug(f"聊天ID {chat_id} 没有适用的转发规则")
+                # 性能优化：降低日志级别，减少IO
+                self.logger.debug(f"聊天ID {chat_id} 没有适用的转发规则或未通过关键词过滤")
                 return
             
+            self.logger.debug(f"处理监听消息: 聊天ID={chat_id}, 消息ID={message.id}, 规则数={len(rules)}")
+            
+            # 编辑事件：已转发过的消息直接编辑目标消息，不再重新发送
+            handler = self._process_edit_safe if is_edited else self._process_rule_safe
+            
             # 并发处理多个规则（如果有多个）
             if len(rules) > 1:
                 tasks = []
                 for rule in rules:
-                    task = asyncio.create_task(self._process_rule_safe(rule, message, event))
+                    task = asyncio.create_task(handler(rule, message, event, keywords_checked=True))
                     tasks.append(task)
                 await asyncio.gather(*tasks, return_exceptions=True)
             else:
                 # 单个规则直接处理
-                await self._process_rule_safe(rules[0], message, event)
+                await handler(rules[0], message, event, keywords_checked=True)
                 
             # 性能监控
             processing_time = (time.time() - start_time) * 1000
@@ -392,33 +704,15 @@ class TelegramClientManager:
         except Exception as e:
             self.logger.error(f"消息处理失败: {e}")
     
-    async def _get_applicable_rules(self, chat_id: int) -> List[ForwardRule]:
-        """获取适用的转发规则"""
-        try:
-            async for db in get_db():
-                from sqlalchemy import select
-                from sqlalchemy.orm import selectinload
-                
-                stmt = select(ForwardRule).options(
-                    selectinload(ForwardRule.keywords),
-                    selectinload(ForwardRule.replace_rules)
-                ).where(
-                    ForwardRule.source_chat_id == chat_id,
-                    ForwardRule.is_active == True
-                )
-                
-                result = await db.execute(stmt)
-                rules = result.scalars().all()
-                return list(rules)
-                
-        except Exception as e:
-            self.logger.error(f"获取转发规则失败: {e}")
-            return []
+    def _get_applicable_rules(self, chat_id: int, text: str) -> tuple:
+        """获取适用且通过关键词过滤的转发规则（来自内存规则索引）"""
+        return rule_index.match_rules(chat_id, text)
     
-    async def _process_rule_safe(self, rule: ForwardRule, message, event):
+    async def _process_rule_safe(self, rule: ForwardRule, message, event, keywords_checked: bool = False,
+                                 delay_elapsed: bool = False):
         """安全的规则处理包装器"""
         try:
-            await self._process_rule(rule, message, event)
+            await self._process_rule(rule, message, event, keywords_checked, delay_elapsed)
         except Exception as e:
             self.logger.error(f"处理规则 {rule.id}({rule.name}) 失败: {e}")
             # 记录错误日志
@@ -427,8 +721,18 @@ class TelegramClientManager:
             except Exception as log_error:
                 self.logger.error(f"记录错误日志失败: {log_error}")
     
-    async def _process_rule(self, rule: ForwardRule, message, event):
-        """处理单个转发规则"""
+    async def _process_rule(self, rule: ForwardRule, message, event, keywords_checked: bool = False,
+                            delay_elapsed: bool = False):
+        """
+        处理单个转发规则
+        
+        keywords_checked 表示已由聊天匹配计划完成关键词过滤；
+        delay_elapsed 表示由延迟投递队列到期触发，不再重复延迟
+        """
+        source_chat_id = utils.get_peer_id(message.peer_id)
+        # 延迟投递到期时去重键已在登记时占用；未发送就结束时需释放
+        claimed = delay_elapsed
+        settled = False
         try:
             # 消息类型检查
             if not self._check_message_type(rule, message):
@@ -439,32 +743,242 @@ class TelegramClientManager:
                 return
             
             # 关键词过滤
-            if rule.enable_keyword_filter and rule.keywords:
-                if not self.keyword_filter.should_forward(message.text or "", rule.keywords):
+            if rule.enable_keyword_filter and rule.keywords and not keywords_checked:
+                keyword_matcher = getattr(rule, 'keyword_matcher', None)
+                if keyword_matcher is not None:
+                    if not keyword_matcher.should_forward(message.text or ""):
+                        return
+                elif not self.keyword_filter.should_forward(message.text or "", rule.keywords):
                     return
             
-            # 文本替换
-            text_to_forward = message.text or ""
-            if rule.enable_regex_replace and rule.replace_rules:
-                text_to_forward = self.regex_replacer.apply_replacements(text_to_forward, rule.replace_rules)
-            
-            # 长度限制
-            if rule.max_message_length and len(text_to_forward) > rule.max_message_length:
-                text_to_forward = text_to_forward[:rule.max_message_length] + "..."
+            # 重复转发防护（延迟投递在登记时已占用）
+            if not delay_elapsed and not await dedup_guard.claim(rule.id, source_chat_id, message.id):
+                self.logger.debug(f"⏭️ 消息 {message.id} 已由规则 '{rule.name}' 转发过，跳过")
+                return
+            claimed = True
             
-            # 转发延迟
-            if rule.forward_delay > 0:
+            # 转发延迟：登记到延迟投递队列，不再为每条消息挂起一个任务
+            if rule.forward_delay > 0 and not delay_elapsed:
+                if self.delivery_queue and self.delivery_queue.available():
+                    self.delivery_queue.schedule(rule.id, source_chat_id, [message.id], rule.forward_delay)
+                    settled = True
+                    return
                 await asyncio.sleep(rule.forward_delay)
             
+            # 处理耗时从延迟结束后开始计算（文本处理 + 发送）
+            started = time.perf_counter()
+            
+            # 文本替换与长度限制
+            text_to_forward = self._transform_text(rule, message.text or "")
+            
             # 执行转发
-            await self._forward_message(rule, message, text_to_forward)
+            sent = await self._forward_message(rule, message, text_to_forward)
+            dedup_guard.confirm(rule.id, source_chat_id, message.id)
+            settled = True
+            target_message_id = await self._record_mapping(rule, [message], sent)
             
             # 记录日志
-            await self._log_message(rule.id, message, "success", None, rule.name, rule.target_chat_id)
+            await self._log_message(rule.id, message, "success", None, rule.name, rule.target_chat_id,
+                                    target_message_id=target_message_id,
+                                    processing_time=int((time.perf_counter() - started) * 1000))
             
         except Exception as e:
             self.logger.error(f"规则处理失败: {e}")
             await self._log_message(rule.id, message, "failed", str(e), rule.name)
+        finally:
+            if claimed and not settled:
+                dedup_guard.release(rule.id, source_chat_id, message.id)
+    
+    def _transform_text(self, rule: ForwardRule, text: str) -> str:
+        """应用文本替换和长度限制"""
+        # 文本替换
+        if rule.enable_regex_replace and rule.replace_rules:
+            replacement_chain = getattr(rule, 'replacement_chain', None)
+            if replacement_chain is not None:
+                text = replacement_chain.apply(text)
+            else:
+                text = self.regex_replacer.apply_replacements(text, rule.replace_rules)
+        
+        # 长度限制
+        if rule.max_message_length and len(text) > rule.max_message_length:
+            text = text[:rule.max_message_length] + "..."
+        
+        return text
+    
+    async def _process_album(self, chat_id: int, messages: list):
+        """处理聚合后的相册：整组只做一次规则匹配，每条规则一次发送、一条日志"""
+        # 相册的说明文字通常只在其中一条消息上
+        caption = next((m.text for m in messages if m.text), "")
+        
+        rules = self._get_applicable_rules(chat_id, caption)
+        if not rules:
+            self.logger.debug(f"相册 {messages[0].grouped_id} 没有适用的转发规则或未通过关键词过滤")
+            return
+        
+        self.logger.info(f"🖼️ 处理相册: 聊天ID={chat_id}, grouped_id={messages[0].grouped_id}, 消息数={len(messages)}, 规则数={len(rules)}")
+        
+        await asyncio.gather(
+            *(self._process_album_rule(rule, messages, caption) for rule in rules),
+            return_exceptions=True
+        )
+    
+    async def _process_album_rule(self, rule: ForwardRule, messages: list, caption: str, delay_elapsed: bool = False):
+        """按单个规则转发整个相册"""
+        lead_message = messages[0]
+        source_chat_id = utils.get_peer_id(lead_message.peer_id)
+        # 延迟投递到期时去重键已在登记时占用；未发送就结束时需释放
+        claimed = delay_elapsed
+        settled = False
+        try:
+            # 消息类型检查（逐条过滤，保留规则允许的媒体）
+            items = [m for m in messages if self._check_message_type(rule, m)]
+            if not items:
+                return
+            
+            # 时间过滤检查（同一相册时间一致，检查首条即可）
+            if not self._check_time_filter(rule, lead_message):
+                return
+            
+            # 重复转发防护（以相册首条消息为键，与日志记录一致）
+            if not delay_elapsed and not await dedup_guard.claim(rule.id, source_chat_id, lead_message.id):
+                self.logger.debug(f"⏭️ 相册 {lead_message.grouped_id} 已由规则 '{rule.name}' 转发过，跳过")
+                return
+            claimed = True
+            
+            # 转发延迟：整组登记为一次延迟投递
+            if rule.forward_delay > 0 and not delay_elapsed:
+                if self.delivery_queue and self.delivery_queue.available():
+                    self.delivery_queue.schedule(rule.id, source_chat_id,
+                                                 [m.id for m in messages], rule.forward_delay, kind="album")
+                    settled = True
+                    return
+                await asyncio.sleep(rule.forward_delay)
+            
+            started = time.perf_counter()
+            text_to_forward = self._transform_text(rule, caption)
+            
+            target_chat_id = int(rule.target_chat_id)
+            
+            # 整组无需改写时直接原生转发/复制，一次请求带上所有消息ID
+            mode = self._get_native_delivery_mode(rule, items, caption, text_to_forward)
+            if mode and len(items) == len(messages):
+                try:
+                    sent = await self._deliver_natively(target_chat_id, items, mode)
+                    dedup_guard.confirm(rule.id, source_chat_id, lead_message.id)
+                    settled = True
+                    self.logger.debug(f"✅ 相册已原生{'复制' if mode == 'copy' else '转发'}: {rule.source_chat_id} -> {target_chat_id} ({len(items)} 条)")
+                    target_message_id = await self._record_mapping(rule, items, sent)
+                    await self._log_message(rule.id, lead_message, "success", None, rule.name, rule.target_chat_id,
+                                            media_type=f"album({len(items)})", target_message_id=target_message_id,
+                                            processing_time=int((time.perf_counter() - started) * 1000))
+                    return
+                except ChatForwardsRestrictedError:
+                    self.logger.warning(f"⚠️ 源聊天 {rule.source_chat_id} 禁止转发，规则 '{rule.name}' 改为重新发送")
+            
+            link_preview = getattr(rule, 'enable_link_preview', True)
+            files = [m.media for m in items if m.media]
+            
+            if files and getattr(rule, 'enable_media', True):
+                send = lambda: self.client.send_message(
+                    target_chat_id,
+                    text_to_forward,
+                    file=files,
+                    link_preview=link_preview
+                )
+                sources = [m for m in items if m.media]
+            elif text_to_forward:
+                send = lambda: self.client.send_message(
+                    target_chat_id,
+                    text_to_forward,
+                    link_preview=link_preview
+                )
+                sources = [next((m for m in items if m.text), lead_message)]
+            else:
+                return
+            
+            sent = await self._send(target_chat_id, send)
+            dedup_guard.confirm(rule.id, source_chat_id, lead_message.id)
+            settled = True
+            self.logger.debug(f"✅ 相册已转发: {rule.source_chat_id} -> {target_chat_id} ({len(files)} 个媒体)")
+            target_message_id = await self._record_mapping(rule, sources, sent)
+            
+            await self._log_message(rule.id, lead_message, "success", None, rule.name, rule.target_chat_id,
+                                    media_type=f"album({len(items)})", target_message_id=target_message_id,
+                                    processing_time=int((time.perf_counter() - started) * 1000))
+            
+        except Exception as e:
+            self.logger.error(f"相册规则处理失败: {e}")
+            await self._log_message(rule.id, lead_message, "failed", str(e), rule.name,
+                                    media_type=f"album({len(messages)})")
+        finally:
+            if claimed and not settled:
+                dedup_guard.release(rule.id, source_chat_id, lead_message.id)
+    
+    async def _record_mapping(self, rule: ForwardRule, source_messages: list, sent) -> Optional[int]:
+        """记录源消息到目标消息的映射，返回第一条目标消息ID"""
+        sent_messages = sent if isinstance(sent, list) else [sent]
+        pairs = [
+            (source.id, target.id)
+            for source, target in zip(source_messages, sent_messages)
+            if getattr(target, 'id', None)
+        ]
+        if not pairs:
+            return None
+        await message_mapping.record_many(
+            rule.id, utils.get_peer_id(source_messages[0].peer_id), pairs, int(rule.target_chat_id)
+        )
+        return pairs[0][1]
+    
+    async def _process_edit_safe(self, rule: ForwardRule, message, event, keywords_checked: bool = False):
+        """处理编辑事件：有映射时编辑目标消息，否则按新消息处理"""
+        try:
+            mapping = await message_mapping.lookup(rule.id, utils.get_peer_id(message.peer_id), message.id)
+            if mapping is None:
+                await self._process_rule_safe(rule, message, event, keywords_checked)
+                return
+            await self._propagate_edit(rule, message, *mapping)
+        except Exception as e:
+            self.logger.error(f"同步编辑失败 (规则 {rule.id}, 消息 {message.id}): {e}")
+    
+    async def _propagate_edit(self, rule: ForwardRule, message, target_chat_id: int, target_message_id: int):
+        """把源消息的编辑同步到已转发的目标消息（单次 edit_message）"""
+        if (getattr(rule, 'delivery_mode', None) or 'resend') == 'forward':
+            # 原生转发的消息带有来源标记，Telegram 不允许编辑
+            self.logger.debug(f"⏭️ 规则 '{rule.name}' 为原生转发，跳过编辑同步: 消息 {message.id}")
+            return
+        if not self._check_message_type(rule, message):
+            return
+        
+        text_to_forward = self._transform_text(rule, message.text or "")
+        link_preview = getattr(rule, 'enable_link_preview', True)
+        try:
+            await self._send(target_chat_id, lambda: self.client.edit_message(
+                target_chat_id,
+                target_message_id,
+                text_to_forward,
+                link_preview=link_preview
+            ))
+            self.logger.info(f"✏️ 编辑已同步: {rule.source_chat_id}/{message.id} -> {target_chat_id}/{target_message_id}")
+        except MessageNotModifiedError:
+            self.logger.debug(f"目标消息内容未变化，无需编辑: {target_chat_id}/{target_message_id}")
+    
+    async def _on_delivery_due(self, record, messages: list):
+        """延迟投递到期：按最新的规则配置投递重新获取到的消息"""
+        rule = rule_index.get_rule(record.rule_id)
+        if rule is None:
+            record.release_claim()
+            self.logger.info(f"⏭️ 规则 {record.rule_id} 已删除或停用，跳过延迟投递 {record.id}")
+            return
+        
+        if messages[0].id != record.message_ids[0]:
+            # 相册首条消息已被删除，之后以剩余的首条为键处理，释放登记时的键
+            record.release_claim()
+        
+        if record.kind == "album":
+            caption = next((m.text for m in messages if m.text), "")
+            await self._process_album_rule(rule, messages, caption, delay_elapsed=True)
+        else:
+            await self._process_rule_safe(rule, messages[0], None, delay_elapsed=True)
     
     def _check_message_type(self, rule: ForwardRule, message) -> bool:
         """检查消息类型是否符合规则"""
@@ -612,101 +1126,149 @@ class TelegramClientManager:
         return True
     
     async def _forward_message(self, rule: ForwardRule, original_message, text_to_forward: str):
-        """转发消息"""
+        """转发消息（经发送调度器按目标聊天限速）"""
         try:
             target_chat_id = int(rule.target_chat_id)
             
+            # 无需改写内容时按规则的投递方式原生转发/复制，不再下载重传
+            mode = self._get_native_delivery_mode(rule, [original_message], original_message.text or "", text_to_forward or "")
+            if mode:
+                try:
+                    result = await self._deliver_natively(target_chat_id, [original_message], mode)
+                    self.logger.debug(f"✅ 消息已原生{'复制' if mode == 'copy' else '转发'}: {rule.source_chat_id} -> {target_chat_id}")
+                    return result[0]
+                except ChatForwardsRestrictedError:
+                    self.logger.warning(f"⚠️ 源聊天 {rule.source_chat_id} 禁止转发，规则 '{rule.name}' 改为重新发送")
+            
+            link_preview = getattr(rule, 'enable_link_preview', True)
+            
             # 发送消息
             if original_message.media and getattr(rule, 'enable_media', True):
                 # 转发媒体消息
-                await self.client.send_message(
+                send = lambda: self.client.send_message(
                     target_chat_id,
                     text_to_forward,
                     file=original_message.media,
-                    link_preview=getattr(rule, 'enable_link_preview', True)
+                    link_preview=link_preview
                 )
             else:
                 # 转发文本消息
-                await self.client.send_message(
+                send = lambda: self.client.send_message(
                     target_chat_id,
                     text_to_forward,
-                    link_preview=getattr(rule, 'enable_link_preview', True)
+                    link_preview=link_preview
                 )
             
+            result = await self._send(target_chat_id, send)
+            
             self.logger.debug(f"✅ 消息已转发: {rule.source_chat_id} -> {target_chat_id}")
+            return result
             
         except Exception as e:
             self.logger.error(f"转发消息失败: {e}")
             raise
     
-    async def _log_message(self, rule_id: int, message, status: str, error_message: str = None, rule_name: str = None, target_chat_id: str = None):
-        """记录消息日志"""
+    def _get_native_delivery_mode(self, rule: ForwardRule, messages: list, original_text: str, text_to_forward: str) -> Optional[str]:
+        """
+        判断能否原生投递
+        
+        Returns:
+            'copy' / 'forward'：内容无需任何改写，可直接转发；None：需要重新发送
+        """
+        mode = getattr(rule, 'delivery_mode', None) or 'resend'
+        if mode not in ('copy', 'forward'):
+            return None
+        if not self.forward_batcher or asyncio.get_running_loop() is not self.loop:
+            return None
+        # 文本被替换或截断
+        if text_to_forward != original_text:
+            return None
+        for message in messages:
+            if not message.media:
+                continue
+            # 规则关闭了媒体转发，重新发送时会丢弃媒体
+            if not getattr(rule, 'enable_media', True):
+                return None
+            # 规则关闭了链接预览，原生转发无法去掉预览
+            if isinstance(message.media, MessageMediaWebPage) and not getattr(rule, 'enable_link_preview', True):
+                return None
+        return mode
+    
+    async def _deliver_natively(self, target_chat_id: int, messages: list, mode: str) -> list:
+        """经合并器原生转发（forward）或无来源复制（copy）一组同源消息"""
+        return await self.forward_batcher.forward(
+            target_chat_id,
+            messages[0].peer_id,
+            [message.id for message in messages],
+            drop_author=(mode == 'copy')
+        )
+    
+    async def _send(self, target_chat_id: int, send: Callable):
+        """通过发送调度器执行一次发送；调度器不可用时直接发送"""
+        if self.send_scheduler and asyncio.get_running_loop() is self.loop:
+            return await self.send_scheduler.submit(target_chat_id, send)
+        return await send()
+    
+    async def _log_message(self, rule_id: int, message, status: str, error_message: str = None, rule_name: str = None, target_chat_id: str = None, media_type: str = None, target_message_id: int = None, processing_time: int = None):
+        """记录消息日志（放入批量写入队列，由后台任务统一落库）"""
         try:
-            async for db in get_db():
-                # 获取聊天ID
-                from telethon.tl.types import PeerChannel, PeerChat, PeerUser
-                
-                if isinstance(message.peer_id, PeerChannel):
-                    source_chat_id = str(-1000000000000 - message.peer_id.channel_id)
-                elif isinstance(message.peer_id, PeerChat):
-                    source_chat_id = str(-message.peer_id.chat_id)
-                else:
-                    source_chat_id = str(message.peer_id.user_id)
-                
-                # 获取规则信息（包括聊天名称）
-                source_chat_name = None
-                target_chat_name = None
-                if not rule_name and rule_id:
-                    try:
-                        from sqlalchemy import select
-                        rule_result = await db.execute(
-                            select(ForwardRule.name, ForwardRule.source_chat_name, ForwardRule.target_chat_name, ForwardRule.target_chat_id)
-                            .where(ForwardRule.id == rule_id)
-                        )
-                        rule_record = rule_result.first()
-                        if rule_record:
-                            rule_name = rule_record[0]
-                            source_chat_name = rule_record[1]
-                            target_chat_name = rule_record[2]
-                            if not target_chat_id:
-                                target_chat_id = rule_record[3]
-                    except Exception as e:
-                        self.logger.warning(f"获取规则信息失败: {e}")
-                
-                log_entry = MessageLog(
-                    rule_id=rule_id,
-                    rule_name=rule_name,
-                    source_chat_id=source_chat_id,
-                    source_chat_name=source_chat_name,
-                    source_message_id=message.id,
-                    target_chat_id=target_chat_id or "",
-                    target_chat_name=target_chat_name,
-                    original_text=message.text[:500] if message.text else "",
-                    status=status,
-                    error_message=error_message
-                )
-                db.add(log_entry)
-                await db.commit()
-                break
+            # 获取聊天ID
+            from telethon.tl.types import PeerChannel, PeerChat, PeerUser
+            
+            if isinstance(message.peer_id, PeerChannel):
+                source_chat_id = str(-1000000000000 - message.peer_id.channel_id)
+            elif isinstance(message.peer_id, PeerChat):
+                source_chat_id = str(-message.peer_id.chat_id)
+            else:
+                source_chat_id = str(message.peer_id.user_id)
+            
+            # 规则信息（包括聊天名称）直接取自内存规则索引，无需额外查询
+            source_chat_name = None
+            target_chat_name = None
+            compiled_rule = rule_index.get_rule(rule_id) if rule_id else None
+            if compiled_rule:
+                rule_name = rule_name or compiled_rule.name
+                source_chat_name = compiled_rule.source_chat_name
+                target_chat_name = compiled_rule.target_chat_name
+                target_chat_id = target_chat_id or compiled_rule.target_chat_id
+            # 规则中只有占位名称时使用聊天实体缓存中的标题（只读内存）
+            source_chat_name = chat_entity_cache.display_name(source_chat_id, source_chat_name)
+            if target_chat_id:
+                target_chat_name = chat_entity_cache.display_name(target_chat_id, target_chat_name)
+            
+            row = {
+                "rule_id": rule_id,
+                "rule_name": rule_name,
+                "source_chat_id": source_chat_id,
+                "source_chat_name": source_chat_name,
+                "source_message_id": message.id,
+                "target_chat_id": target_chat_id or "",
+                "target_chat_name": target_chat_name,
+                "target_message_id": target_message_id,
+                "original_text": message.text[:500] if message.text else "",
+                "media_type": media_type,
+                "status": status,
+                "error_message": error_message,
+                "processing_time": processing_time,
+                # 入队时记录时间，避免批量写入延迟影响日志时间
+                "created_at": get_local_now()
+            }
+            
+            if self.log_writer:
+                await self.log_writer.write(row)
+            else:
+                from services import MessageLogService
+                await MessageLogService.log_messages_batch([row])
                 
         except Exception as e:
             self.logger.error(f"记录消息日志失败: {e}")
     
     async def _update_monitored_chats(self):
-        """更新监听的聊天列表"""
+        """更新监听的聊天列表（由规则索引派生）"""
         try:
-            async for db in get_db():
-                from sqlalchemy import select, distinct
-                
-                # 获取所有活跃规则的源聊天ID
-                stmt = select(distinct(ForwardRule.source_chat_id)).where(
-                    ForwardRule.is_active == True
-                )
-                result = await db.execute(stmt)
-                chat_ids = result.scalars().all()
-                
-                self.monitored_chats = set(int(chat_id) for chat_id in chat_ids)
-                self.logger.info(f"🎯 更新监听聊天列表: {list(self.monitored_chats)}")
+            await rule_index.ensure_built()
+            self.monitored_chats = rule_index.get_source_chat_ids()
+            self.logger.info(f"🎯 更新监听聊天列表: {list(self.monitored_chats)}")
                 
         except Exception as e:
             self.logger.error(f"更新监听聊天列表失败: {e}")
@@ -871,42 +1433,139 @@ class TelegramClientManager:
             "connected": self.connected,
             "login_state": getattr(self, 'login_state', 'idle'),
             "user_info": user_info_safe,
-            "monitored_chats": list(self.monitored_chats),
-            "thread_alive": self.thread.is_alive() if self.thread else False
+            "monitored_chats": list(rule_index.get_source_chat_ids()),
+            "loop_mode": self.loop_mode,
+            "thread_alive": self._is_alive(),
+            "startup": self.startup_timeline,
+            "rule_index": rule_index.get_stats(),
+            **self.get_counters(),
+            "message_mapping": message_mapping.get_stats(),
+            "dedup_guard": dedup_guard.get_stats(),
+            "chat_entity_cache": chat_entity_cache.get_stats()
+        }
+    
+    def _is_alive(self) -> bool:
+        """客户端线程（共享模式下为客户端任务）是否仍在运行"""
+        if self.loop_mode == 'shared':
+            return self.task is not None and not self.task.done()
+        return self.thread.is_alive() if self.thread else False
+    
+    def get_counters(self) -> Dict[str, Any]:
+        """获取客户端各组件的运行计数"""
+        return {
+            "event_pool": self.event_pool.get_stats() if self.event_pool else None,
+            "log_writer": self.log_writer.get_stats() if self.log_writer else None,
+            "send_scheduler": self.send_scheduler.get_stats() if self.send_scheduler else None,
+            "album_aggregator": self.album_aggregator.get_stats() if self.album_aggregator else None,
+            "forward_batcher": self.forward_batcher.get_stats() if self.forward_batcher else None,
+            "delivery_queue": self.delivery_queue.get_stats() if self.delivery_queue else None,
+            "dialog_cache": self.dialog_cache.get_stats(),
+            "calls": {
+                "total": self.calls,
+                "active": self.calls_active,
+                "timeouts": self.call_timeouts,
+                "errors": self.call_errors
+            }
         }
     
     def get_chats_sync(self) -> List[Dict[str, Any]]:
-        """同步获取聊天列表（线程安全）"""
-        if not self.loop or not self.running or not self.connected:
+        """获取聊天列表（读取会话缓存，线程安全）"""
+        if not self.running or not self.connected:
             return []
+        chats, _total = self.dialog_cache.query()
+        return chats
+    
+    async def query_chats(self, search: str = None, chat_type: str = None) -> tuple:
+        """
+        筛选会话缓存（与客户端工作进程中的客户端接口一致）
+
+        Returns:
+            (会话条目, 缓存信息)
+        """
+        cache = self.dialog_cache
+        chats = []
+        if self.running and self.connected:
+            chats, _total = cache.query(search=search, chat_type=chat_type)
+        return chats, {
+            "chat_count": len(cache),
+            "display_name": cache.client_display_name,
+            "loaded": cache.loaded,
+            "last_refreshed": cache.last_refreshed
+        }
+    
+    async def resolve_chat_entities(self, chat_ids: List[int]) -> List[int]:
+        """解析并保存一批聊天实体（聊天实体缓存调用），返回解析成功的聊天ID"""
+        return list(await chat_entity_cache.resolve_with(self, chat_ids))
+    
+    async def call(self, coro, timeout: float = None):
+        """
+        在客户端事件循环中执行协程并等待结果（供 Web 等其他事件循环中的异步代码调用）
+
+        - 通过 asyncio.wrap_future 等待，不阻塞调用方所在的线程
+        - 超时（默认 CLIENT_CALL_TIMEOUT 秒）或调用方被取消时，客户端循环中的任务随之取消
+        - 每个客户端同时执行的调用不超过 CLIENT_CALL_CONCURRENCY 个，其余排队（排队时间计入超时）
+        - 已在客户端事件循环中时直接执行
+
+        Raises:
+            RuntimeError: 客户端未运行
+            asyncio.TimeoutError: 超时
+        """
+        timeout = Config.CLIENT_CALL_TIMEOUT if timeout is None else timeout
+        loop = self.loop
+        if not loop or not self.running or loop.is_closed():
+            coro.close()
+            raise RuntimeError(f"客户端 {self.client_id} 未运行")
         
+        if asyncio.get_running_loop() is loop:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        
+        limited = self._run_limited(coro)
         try:
-            # 使用 run_coroutine_threadsafe 在客户端的事件循环中执行
-            future = asyncio.run_coroutine_threadsafe(
-                self._get_chats_async(),
-                self.loop
-            )
-            # 等待结果，超时时间10秒
-            return future.result(timeout=10)
-        except Exception as e:
-            self.logger.warning(f"获取聊天列表失败: {e}")
-            return []
+            future = asyncio.run_coroutine_threadsafe(limited, loop)
+        except RuntimeError:
+            # 事件循环已关闭
+            limited.close()
+            coro.close()
+            raise RuntimeError(f"客户端 {self.client_id} 未运行")
+        
+        self.calls += 1
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.call_timeouts += 1
+            raise
+        except Exception:
+            self.call_errors += 1
+            raise
+    
+    async def _run_limited(self, coro):
+        """在客户端事件循环中按并发上限执行"""
+        try:
+            async with self._call_semaphore:
+                self.calls_active += 1
+                try:
+                    return await coro
+                finally:
+                    self.calls_active -= 1
+        finally:
+            # 排队期间被取消时协程尚未开始执行，需要关闭
+            coro.close()
+    
+    async def refresh_chats(self, timeout: float = 120) -> int:
+        """重新完整加载会话列表（外部调用），返回会话数"""
+        if not self.connected:
+            return 0
+        return await self.call(self.dialog_cache.load(self.client), timeout=timeout)
     
-    def get_chat_title_sync(self, chat_id: str) -> str:
-        """同步获取特定聊天的标题（线程安全）"""
-        if not self.loop or not self.running or not self.connected:
+    async def get_chat_title(self, chat_id: str, timeout: float = 5) -> str:
+        """获取特定聊天的标题（外部调用），失败时返回占位名称"""
+        if not self.running or not self.connected:
             return f"聊天 {chat_id}"
         
         try:
-            # 使用 run_coroutine_threadsafe 在客户端的事件循环中执行
-            future = asyncio.run_coroutine_threadsafe(
-                self._get_chat_title_async(chat_id),
-                self.loop
-            )
-            # 等待结果，超时时间5秒
-            return future.result(timeout=5)
+            return await self.call(self._get_chat_title_async(chat_id), timeout=timeout)
         except Exception as e:
-            self.logger.warning(f"获取聊天 {chat_id} 标题失败: {e}")
+            self.logger.warning(f"获取聊天 {chat_id} 标题失败: {e!r}")
             return f"聊天 {chat_id}"
     
     async def _get_chat_title_async(self, chat_id: str) -> str:
@@ -943,86 +1602,35 @@ class TelegramClientManager:
             self.logger.warning(f"⚠️ 无法获取聊天 {chat_id} 标题: {e}")
             return f"聊天 {chat_id}"
     
-    async def _get_chats_async(self) -> List[Dict[str, Any]]:
-        """在客户端事件循环中异步获取聊天列表"""
+    async def _load_dialogs(self):
+        """加载会话列表缓存（连接后在后台执行）"""
         try:
-            if not self.client or not self.client.is_connected():
-                return []
-            
-            # 不限制聊天数量，获取所有聊天
-            dialogs = await self.client.get_dialogs()
-            chats = []
-            
-            # 获取客户端用户信息用于显示
-            client_display_name = "未知客户端"
-            if self.user_info:
-                if self.client_type == "bot":
-                    client_display_name = f"机器人: {getattr(self.user_info, 'first_name', self.client_id)}"
-                else:
-                    first_name = getattr(self.user_info, 'first_name', '')
-                    last_name = getattr(self.user_info, 'last_name', '')
-                    username = getattr(self.user_info, 'username', '')
-                    if username:
-                        client_display_name = f"用户: {first_name} {last_name} (@{username})".strip()
-                    else:
-                        client_display_name = f"用户: {first_name} {last_name}".strip()
-                    if not client_display_name.replace("用户: ", "").strip():
-                        client_display_name = f"用户: {self.client_id}"
-            
-            for dialog in dialogs:
-                try:
-                    # 获取更详细的聊天信息
-                    entity = dialog.entity
-                    chat_type = "user"
-                    if dialog.is_group:
-                        chat_type = "group"
-                    elif dialog.is_channel:
-                        chat_type = "channel"
-                    
-                    # 获取聊天标题
-                    title = dialog.title or dialog.name
-                    if not title and hasattr(entity, 'first_name'):
-                        # 对于私聊用户，组合姓名
-                        first_name = getattr(entity, 'first_name', '')
-                        last_name = getattr(entity, 'last_name', '')
-                        title = f"{first_name} {last_name}".strip()
-                    if not title:
-                        title = "未知聊天"
-                    
-                    chat_data = {
-                        "id": str(dialog.id),
-                        "title": title,
-                        "type": chat_type,
-                        "username": getattr(entity, 'username', None),
-                        "description": getattr(entity, 'about', None),
-                        "members_count": getattr(entity, 'participants_count', 0) if hasattr(entity, 'participants_count') else 0,
-                        "client_id": self.client_id,
-                        "client_type": self.client_type,
-                        "client_display_name": client_display_name,
-                        "is_verified": getattr(entity, 'verified', False),
-                        "is_scam": getattr(entity, 'scam', False),
-                        "is_fake": getattr(entity, 'fake', False),
-                        "unread_count": dialog.unread_count,
-                        "last_message_date": dialog.date.isoformat() if dialog.date else None
-                    }
-                    chats.append(chat_data)
-                except Exception as e:
-                    self.logger.warning(f"处理聊天数据失败: {e}")
-                    continue
-            
-            self.logger.info(f"✅ 客户端 {self.client_id} 获取到 {len(chats)} 个聊天")
-            return chats
+            await self.dialog_cache.load(self.client)
         except Exception as e:
-            self.logger.error(f"获取聊天列表失败: {e}")
-            return []
+            self.logger.warning(f"⚠️ 加载会话列表失败，可稍后手动刷新: {e}")
+    
+    def _get_client_display_name(self) -> str:
+        """会话列表中显示的客户端名称"""
+        client_display_name = "未知客户端"
+        if self.user_info:
+            if self.client_type == "bot":
+                client_display_name = f"机器人: {getattr(self.user_info, 'first_name', self.client_id)}"
+            else:
+                first_name = getattr(self.user_info, 'first_name', '') or ''
+                last_name = getattr(self.user_info, 'last_name', '') or ''
+                username = getattr(self.user_info, 'username', '')
+                if username:
+                    client_display_name = f"用户: {first_name} {last_name} (@{username})".strip()
+                else:
+                    client_display_name = f"用户: {first_name} {last_name}".strip()
+                if not client_display_name.replace("用户: ", "").strip():
+                    client_display_name = f"用户: {self.client_id}"
+        return client_display_name
     
     async def refresh_monitored_chats(self):
         """刷新监听聊天列表（外部调用）"""
         if self.loop and self.running:
-            asyncio.run_coroutine_threadsafe(
-                self._update_monitored_chats(),
-                self.loop
-            )
+            await self.call(self._update_monitored_chats())
 
 
 class MultiClientManager:
@@ -1030,19 +1638,60 @@ class MultiClientManager:
     多客户端管理器
     
     管理多个Telegram客户端实例，避免客户端竞争
+    
+    CLIENT_WORKER_PROCESSES > 0 时客户端按账号分配到多个工作进程中运行（见 client_workers），
+    clients 中保存的是接口相同的代理对象
     """
     
     def __init__(self):
         self.clients: Dict[str, TelegramClientManager] = {}
+        # 客户端工作进程池（由 start_workers 创建）
+        self.worker_pool = None
         self.logger = logging.getLogger("MultiClientManager")
     
+    async def start_workers(self) -> bool:
+        """按 CLIENT_WORKER_PROCESSES 启动客户端工作进程（在主事件循环中、添加客户端之前调用）"""
+        if self.worker_pool is not None:
+            return True
+        if Config.CLIENT_WORKER_PROCESSES <= 0:
+            return False
+        
+        from client_workers import ClientWorkerPool
+        pool = ClientWorkerPool(Config.CLIENT_WORKER_PROCESSES)
+        try:
+            await pool.start()
+        except Exception as e:
+            self.logger.error(f"❌ 启动客户端工作进程失败，客户端将在主进程中运行: {e!r}")
+            await asyncio.to_thread(pool.shutdown)
+            return False
+        self.worker_pool = pool
+        return True
+    
+    def _new_client(self, client_id: str, client_type: str, config_data: dict = None):
+        """创建客户端（启用工作进程时在工作进程中创建，返回代理）"""
+        if self.worker_pool is not None:
+            return self.worker_pool.create_client(client_id, client_type, config_data)
+        
+        client = TelegramClientManager(client_id, client_type)
+        
+        # 存储客户端特定配置
+        if config_data:
+            if client_type == 'bot':
+                client.bot_token = config_data.get('bot_token')
+                client.admin_user_id = config_data.get('admin_user_id')
+            elif client_type == 'user':
+                client.api_id = config_data.get('api_id')
+                client.api_hash = config_data.get('api_hash')
+                client.phone = config_data.get('phone')
+        return client
+    
     def add_client(self, client_id: str, client_type: str = "user") -> TelegramClientManager:
         """添加客户端"""
         if client_id in self.clients:
             self.logger.warning(f"客户端 {client_id} 已存在")
             return self.clients[client_id]
         
-        client = TelegramClientManager(client_id, client_type)
+        client = self._new_client(client_id, client_type)
         self.clients[client_id] = client
         
         self.logger.info(f"✅ 添加客户端: {client_id} ({client_type})")
@@ -1054,18 +1703,7 @@ class MultiClientManager:
             self.logger.warning(f"客户端 {client_id} 已存在")
             return self.clients[client_id]
         
-        client = TelegramClientManager(client_id, client_type)
-        
-        # 存储客户端特定配置
-        if config_data:
-            if client_type == 'bot':
-                client.bot_token = config_data.get('bot_token')
-                client.admin_user_id = config_data.get('admin_user_id')
-            elif client_type == 'user':
-                client.api_id = config_data.get('api_id')
-                client.api_hash = config_data.get('api_hash')
-                client.phone = config_data.get('phone')
-        
+        client = self._new_client(client_id, client_type, config_data)
         self.clients[client_id] = client
         
         self.logger.info(f"✅ 添加带配置的客户端: {client_id} ({client_type})")
@@ -1079,6 +1717,8 @@ class MultiClientManager:
         client = self.clients[client_id]
         client.stop()
         del self.clients[client_id]
+        if self.worker_pool is not None:
+            self.worker_pool.remove_client(client_id)
         
         self.logger.info(f"✅ 移除客户端: {client_id}")
         return True
@@ -1095,6 +1735,14 @@ class MultiClientManager:
         
         return client.start()
     
+    async def start_client_async(self, client_id: str) -> bool:
+        """启动客户端并等待启动完成（不阻塞事件循环）"""
+        client = self.clients.get(client_id)
+        if not client:
+            return False
+        
+        return await client.start_async()
+    
     def stop_client(self, client_id: str) -> bool:
         """停止客户端"""
         client = self.clients.get(client_id)
@@ -1111,15 +1759,51 @@ class MultiClientManager:
             for client_id, client in self.clients.items()
         }
     
+    def get_all_counters(self) -> Dict[str, Any]:
+        """获取所有客户端的运行计数（实时推送使用）"""
+        counters = {
+            "clients": {client_id: client.get_counters() for client_id, client in self.clients.items()},
+            "message_mapping": message_mapping.get_stats(),
+            "dedup_guard": dedup_guard.get_stats()
+        }
+        if self.worker_pool is not None:
+            counters["workers"] = self.worker_pool.get_stats()
+        return counters
+    
+    def get_pending_deliveries(self) -> List[Dict[str, Any]]:
+        """列出所有客户端的待投递（延迟转发）记录"""
+        deliveries = []
+        for client_id, client in self.clients.items():
+            if client.delivery_queue:
+                for item in client.delivery_queue.list_pending():
+                    item["client_id"] = client_id
+                    deliveries.append(item)
+        deliveries.sort(key=lambda item: item["due_at"])
+        return deliveries
+    
+    def cancel_delivery(self, delivery_id: int) -> bool:
+        """取消一次待投递"""
+        for client in self.clients.values():
+            if client.delivery_queue and client.delivery_queue.cancel(delivery_id):
+                return True
+        return False
+    
     def stop_all(self):
         """停止所有客户端"""
-        for client in self.clients.values():
-            client.stop()
+        if self.worker_pool is not None:
+            # 各工作进程退出前停止其中的客户端并写完日志
+            self.worker_pool.shutdown()
+            self.worker_pool = None
+        else:
+            for client in self.clients.values():
+                client.stop()
         self.clients.clear()
         self.logger.info("✅ 所有客户端已停止")
     
     def process_history_messages(self, rule) -> Dict[str, Any]:
         """处理历史消息 - 在客户端的事件循环中执行"""
+        if self.worker_pool is not None:
+            return self.worker_pool.process_history_messages(rule)
         try:
             from services import HistoryMessageService
             import asyncio
@@ -1290,6 +1974,23 @@ class MultiClientManager:
                 forwarded = 0
                 errors = 0
                 
+                # 原生转发/复制模式下并发提交一批消息，由合并器合并为单次请求
+                native_batch = []
+                native_mode = (getattr(rule, 'delivery_mode', None) or 'resend') in ('copy', 'forward')
+                
+                async def flush_native_batch():
+                    nonlocal forwarded
+                    results = await asyncio.gather(
+                        *(self._forward_message_to_target(m, rule, client_wrapper) for m in native_batch)
+                    )
+                    for m, success in zip(native_batch, results):
+                        if success:
+                            forwarded += 1
+                            self.logger.debug(f"✅ 转发历史消息: {m.id}")
+                        else:
+                            self.logger.warning(f"⚠️ 转发历史消息失败: {m.id}")
+                    native_batch.clear()
+                
                 for message in messages:
                     try:
                         processed += 1
@@ -1301,6 +2002,12 @@ class MultiClientManager:
                             # 处理消息（应用正则替换等）
                             processed_message = await self._process_message_content(message, rule)
                             
+                            if native_mode:
+                                native_batch.append(processed_message)
+                                if len(native_batch) >= ForwardBatcher.MAX_BATCH_SIZE:
+                                    await flush_native_batch()
+                                continue
+                            
                             # 转发消息
                             success = await self._forward_message_to_target(processed_message, rule, client_wrapper)
                             if success:
@@ -1315,6 +2022,9 @@ class MultiClientManager:
                         errors += 1
                         self.logger.error(f"❌ 处理消息失败: {e}")
                 
+                if native_batch:
+                    await flush_native_batch()
+                
                 # 输出详细的处理统计
                 skipped = processed - forwarded - errors
                 self.logger.info(f"📊 历史消息处理统计:")
@@ -1552,50 +2262,11 @@ class MultiClientManager:
             return message
     
     async def _is_message_already_forwarded(self, message, rule):
-        """检查消息是否已经被转发过"""
+        """检查消息是否已经被转发过（与实时转发共用去重防护，最多一次索引查询）"""
         try:
-            from database import get_db
-            from models import MessageLog
-            from sqlalchemy import select, and_, or_
-            
-            async for db in get_db():
-                # 查询消息日志表，检查是否已存在相同的源消息ID和规则名称的记录
-                # 优先使用规则名称进行查询，这样更稳定，不受规则ID变化影响
-                stmt = select(MessageLog).where(
-                    and_(
-                        MessageLog.source_message_id == str(message.id),
-                        MessageLog.source_chat_id == str(rule.source_chat_id),
-                        MessageLog.rule_name == rule.name,  # 主要使用规则名称
-                        MessageLog.status == 'success'  # 只检查成功转发的消息
-                    )
-                )
-                result = await db.execute(stmt)
-                existing_log = result.scalar_one_or_none()
-                
-                # 如果基于规则名称没找到，再尝试基于rule_id查询（兼容旧数据）
-                if not existing_log:
-                    stmt_fallback = select(MessageLog).where(
-                        and_(
-                            MessageLog.source_message_id == str(message.id),
-                            MessageLog.source_chat_id == str(rule.source_chat_id),
-                            MessageLog.rule_id == rule.id,  # 兼容旧数据
-                            MessageLog.rule_name.is_(None),  # 只查询没有rule_name的旧记录
-                            MessageLog.status == 'success'
-                        )
-                    )
-                    result_fallback = await db.execute(stmt_fallback)
-                    existing_log = result_fallback.scalar_one_or_none()
-                
-                # 添加详细的调试日志
-                is_already_forwarded = existing_log is not None
-                self.logger.info(f"🔍 消息转发状态检查: 消息ID={message.id}, 规则名称='{rule.name}', 源聊天={rule.source_chat_id}")
-                self.logger.info(f"🔍 主查询条件: source_message_id='{message.id}', source_chat_id='{rule.source_chat_id}', rule_name='{rule.name}', status='success'")
-                self.logger.info(f"🔍 查询结果: {'已转发' if is_already_forwarded else '未转发'} (日志ID: {existing_log.id if existing_log else 'None'})")
-                
-                if is_already_forwarded:
-                    self.logger.info(f"🔍 找到的日志记录: ID={existing_log.id}, 创建时间={existing_log.created_at}, 状态={existing_log.status}")
-                
-                return is_already_forwarded
+            is_already_forwarded = await dedup_guard.is_forwarded(rule.id, utils.get_peer_id(message.peer_id), message.id)
+            self.logger.debug(f"🔍 消息转发状态检查: 消息ID={message.id}, 规则='{rule.name}', 结果={'已转发' if is_already_forwarded else '未转发'}")
+            return is_already_forwarded
                 
         except Exception as e:
             self.logger.error(f"❌ 检查消息转发状态失败: {e}")
@@ -1608,11 +2279,24 @@ class MultiClientManager:
                 self.logger.debug("跳过非文本消息的转发")
                 return False
             
+            # 已在转发检查中查询过转发记录，这里只防止与实时转发并发重复
+            source_chat_id = utils.get_peer_id(message.peer_id)
+            if not await dedup_guard.claim(rule.id, source_chat_id, message.id, verified=True):
+                self.logger.debug(f"⏭️ 消息 {message.id} 正在或已经被转发，跳过")
+                return False
+            
             # 使用客户端包装器的转发方法
-            await client_wrapper._forward_message(rule, message, message.text)
+            try:
+                sent = await client_wrapper._forward_message(rule, message, message.text)
+            except Exception:
+                dedup_guard.release(rule.id, source_chat_id, message.id)
+                raise
+            dedup_guard.confirm(rule.id, source_chat_id, message.id)
+            target_message_id = await client_wrapper._record_mapping(rule, [message], sent)
             
             # 使用客户端包装器的日志记录方法
-            await client_wrapper._log_message(rule.id, message, 'success', None, rule.name, rule.target_chat_id)
+            await client_wrapper._log_message(rule.id, message, 'success', None, rule.name, rule.target_chat_id,
+                                              target_message_id=target_message_id)
             return True
             
         except Exception as e:
@@ -1627,35 +2311,21 @@ class MultiClientManager:
 
 
     def update_chat_names_sync(self, rules):
-        """同步方式更新聊天名称 - 简化版本"""
-        self.logger.info("🔄 开始获取聊天名称（同步方式）...")
-        
-        if not self.clients:
-            self.logger.warning("⚠️ 没有可用的客户端")
-            return []
-        
-        # 获取第一个可用的客户端
-        client_manager = next(iter(self.clients.values()))
-        if not client_manager or not client_manager.client:
-            self.logger.warning("⚠️ 客户端不可用")
-            return []
-            
-        if not client_manager.connected:
-            self.logger.warning("⚠️ 客户端未连接")
-            return []
+        """同步方式更新聊天名称（读取聊天实体缓存，不产生网络请求；缓存中没有的使用占位名称）"""
+        self.logger.info("🔄 开始获取聊天名称（聊天实体缓存）...")
         
         updated_rules = []
         
         for rule in rules:
             updated_fields = {}
             
-            # 由于聊天名称获取需要在正确的事件循环中执行，
-            # 我们在这里只返回占位符信息，真正的获取将在其他地方进行
-            if rule.source_chat_id and (not rule.source_chat_name or rule.source_chat_name.startswith('聊天 ')):
-                updated_fields['source_chat_name'] = f"聊天 {rule.source_chat_id}"
-            
-            if rule.target_chat_id and (not rule.target_chat_name or rule.target_chat_name.startswith('聊天 ')):
-                updated_fields['target_chat_name'] = f"聊天 {rule.target_chat_id}"
+            for side in ('source', 'target'):
+                chat_id = getattr(rule, f'{side}_chat_id')
+                name = getattr(rule, f'{side}_chat_name')
+                if chat_id and (not name or name.startswith('聊天 ')):
+                    title = chat_entity_cache.get_title(chat_id) or f"聊天 {chat_id}"
+                    if title != name:
+                        updated_fields[f'{side}_chat_name'] = title
             
             if updated_fields:
                 updated_rules.append({
@@ -69,6 +69,28 @@ def database_time_to_user_time(db_dt):
         # 有时区信息，转换到用户时区
         return db_dt.astimezone(user_tz)
 
+def user_date_range_to_database(start_date=None, end_date=None):
+    """
+    把用户时区的日期范围（YYYY-MM-DD，含首尾两天）转换为数据库时间的半开区间 [start, end)
+    
+    数据库保存的是用户时区的本地时间（无时区信息），因此返回的边界同样是无时区的
+    用户时区午夜时间，可直接与时间列做范围比较并使用索引。
+    
+    Returns:
+        (start, end): 未指定的一侧为 None
+    
+    Raises:
+        ValueError: 日期格式无效
+    """
+    from datetime import timedelta
+    
+    start = end = None
+    if start_date:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+    if end_date:
+        end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    return start, end
+
 # 向后兼容的别名
 get_configured_timezone = get_user_timezone
 get_current_time = get_user_now
@@ -91,10 +91,11 @@ async def auto_database_migration(enhanced_bot=None):
         logger.error(f"❌ 自动数据库迁移失败: {e}")
 
 async def auto_update_chat_names(db, enhanced_bot=None):
-    """自动更新聊天名称 - 直接从Telegram获取真实名称"""
+    """自动更新聊天名称 - 先查聊天实体缓存，缺失或过期的通过已连接客户端批量并发解析"""
     try:
         from models import ForwardRule
         from sqlalchemy import select, update
+        from chat_entity_cache import chat_entity_cache, is_placeholder
         
         logger.info("🔄 开始检查聊天名称...")
         
@@ -109,7 +110,7 @@ async def auto_update_chat_names(db, enhanced_bot=None):
                 (ForwardRule.target_chat_name.like('聊天 %'))    # 识别占位符格式
             )
         )
-        rules = rules_to_update.fetchall()
+        rules = [row[0] for row in rules_to_update.fetchall()]  # SQLAlchemy返回的是tuple
         
         if not rules:
             logger.info("✅ 所有规则的聊天名称都已设置")
@@ -117,72 +118,36 @@ async def auto_update_chat_names(db, enhanced_bot=None):
         
         logger.info(f"🔄 发现 {len(rules)} 个规则需要更新聊天名称")
         
-        # 尝试从Telegram客户端直接获取真实聊天名称
+        # 需要名称的聊天ID（去重后一次性解析）
+        chat_ids = set()
+        for rule in rules:
+            if rule.source_chat_id and is_placeholder(rule.source_chat_name):
+                chat_ids.add(rule.source_chat_id)
+            if rule.target_chat_id and is_placeholder(rule.target_chat_name):
+                chat_ids.add(rule.target_chat_id)
+        
+        # 已连接的客户端用于解析缓存中缺失或过期的聊天；没有客户端时只读缓存
+        clients = []
+        if enhanced_bot and getattr(enhanced_bot, 'multi_client_manager', None):
+            clients = [client for client in enhanced_bot.multi_client_manager.clients.values() if client.connected]
+        titles = await chat_entity_cache.resolve_titles(chat_ids, clients)
+        
         updated_count = 0
         real_names_count = 0
-        
-        # 检查是否有可用的Telegram客户端
-        client_wrapper = None
-        if enhanced_bot and hasattr(enhanced_bot, 'multi_client_manager') and enhanced_bot.multi_client_manager:
-            client_manager = enhanced_bot.multi_client_manager
-            if hasattr(client_manager, 'client_wrappers') and client_manager.client_wrappers:
-                # 获取第一个可用的客户端
-                client_wrapper = next(iter(client_manager.client_wrappers.values()))
-                logger.info("🔗 找到可用的Telegram客户端，将获取真实聊天名称")
-            elif hasattr(client_manager, 'clients') and client_manager.clients:
-                # 兼容旧版本的属性名
-                client_wrapper = next(iter(client_manager.clients.values()))
-                logger.info("🔗 找到可用的Telegram客户端，将获取真实聊天名称")
-        
-        for rule_tuple in rules:
-            rule = rule_tuple[0]  # SQLAlchemy返回的是tuple
+        for rule in rules:
             updated_fields = {}
             
-            # 更新源聊天名称（包括占位符格式的名称）
-            needs_source_update = (
-                not rule.source_chat_name or 
-                rule.source_chat_name.strip() == '' or
-                rule.source_chat_name.startswith('聊天 ')  # 检查占位符格式
-            )
-            
-            if needs_source_update:
-                source_name = f"聊天 {rule.source_chat_id}"  # 默认占位符
-                
-                # 使用线程安全的方法获取真实聊天名称
-                if client_wrapper and rule.source_chat_id:
-                    try:
-                        # 使用新的线程安全方法
-                        source_title = client_wrapper.get_chat_title_sync(rule.source_chat_id)
-                        if not source_title.startswith("聊天 "):
-                            source_name = source_title
-                            real_names_count += 1
-                    except Exception as e:
-                        logger.warning(f"⚠️ 无法获取源聊天 {rule.source_chat_id} 的信息: {e}")
-                
-                updated_fields['source_chat_name'] = source_name
-            
-            # 更新目标聊天名称（包括占位符格式的名称）
-            needs_target_update = (
-                not rule.target_chat_name or 
-                rule.target_chat_name.strip() == '' or
-                rule.target_chat_name.startswith('聊天 ')  # 检查占位符格式
-            )
-            
-            if needs_target_update:
-                target_name = f"聊天 {rule.target_chat_id}"  # 默认占位符
-                
-                # 使用线程安全的方法获取真实聊天名称
-                if client_wrapper and rule.target_chat_id:
-                    try:
-                        # 使用新的线程安全方法
-                        target_title = client_wrapper.get_chat_title_sync(rule.target_chat_id)
-                        if not target_title.startswith("聊天 "):
-                            target_name = target_title
-                            real_names_count += 1
-                    except Exception as e:
-                        logger.warning(f"⚠️ 无法获取目标聊天 {rule.target_chat_id} 的信息: {e}")
-                
-                updated_fields['target_chat_name'] = target_name
+            for side in ('source', 'target'):
+                chat_id = getattr(rule, f'{side}_chat_id')
+                name = getattr(rule, f'{side}_chat_name')
+                if not is_placeholder(name):
+                    continue
+                title = titles.get(str(chat_id)) if chat_id else None
+                if title:
+                    real_names_count += 1
+                new_name = title or f"聊天 {chat_id}"  # 默认占位符
+                if new_name != name:
+                    updated_fields[f'{side}_chat_name'] = new_name
             
             if updated_fields:
                 await db.execute(
@@ -199,8 +164,8 @@ async def auto_update_chat_names(db, enhanced_bot=None):
                 logger.info(f"✅ 已为 {updated_count} 个规则更新聊天名称，其中 {real_names_count} 个获取了真实名称")
             else:
                 logger.info(f"✅ 已为 {updated_count} 个规则设置占位符聊天名称")
-                if not client_wrapper:
-                    logger.info("💡 提示: Telegram客户端未配置，使用了占位符名称")
+                if not clients:
+                    logger.info("💡 提示: 没有已连接的Telegram客户端，使用了占位符名称")
         
     except Exception as e:
         logger.error(f"❌ 自动更新聊天名称失败: {e}")
@@ -353,6 +318,14 @@ async def main():
         from datetime import datetime
         from fastapi.staticfiles import StaticFiles
         from fastapi.middleware.cors import CORSMiddleware
+        from rule_index import rule_index
+        from models import DELIVERY_MODES
+        from message_mapping import message_mapping
+        from dedup_guard import dedup_guard
+        from chat_entity_cache import chat_entity_cache
+        from services import MessageLogService
+        from stats_rollup import stats_rollup
+        from event_bus import event_bus
         
         # 再次确认数据库已准备就绪
         try:
@@ -479,39 +452,51 @@ async def main():
                     "message": f"获取客户端状态失败: {str(e)}"
                 }, status_code=500)
         
+        def build_enhanced_status() -> dict:
+            """增强版系统状态（状态接口与实时推送快照共用）"""
+            # 由于我们使用的是web_enhanced_clean.py，始终返回增强模式
+            if enhanced_bot and hasattr(enhanced_bot, 'get_client_status'):
+                clients_status = enhanced_bot.get_client_status()
+                return {
+                    "success": True,
+                    "enhanced_mode": True,
+                    "app_version": Config.APP_VERSION,
+                    "app_name": Config.APP_NAME,
+                    "app_description": Config.APP_DESCRIPTION,
+                    "clients": clients_status,
+                    "total_clients": len(clients_status),
+                    "running_clients": sum(1 for client in clients_status.values() if client.get("running", False)),
+                    "connected_clients": sum(1 for client in clients_status.values() if client.get("connected", False))
+                }
+            # 即使enhanced_bot为None，仍然返回增强模式为true
+            # 因为我们使用的是web_enhanced_clean.py
+            return {
+                "success": True,
+                "enhanced_mode": True,
+                "app_version": Config.APP_VERSION,
+                "app_name": Config.APP_NAME,
+                "app_description": Config.APP_DESCRIPTION,
+                "clients": {},
+                "total_clients": 0,
+                "running_clients": 0,
+                "connected_clients": 0,
+                "message": "增强模式已启用，正在初始化..."
+            }
+        
+        def collect_counters() -> dict:
+            """运行计数（实时推送定期采集）"""
+            if enhanced_bot and getattr(enhanced_bot, 'multi_client_manager', None):
+                return enhanced_bot.multi_client_manager.get_all_counters()
+            return {"clients": {}}
+        
+        event_bus.set_snapshot_provider(build_enhanced_status)
+        event_bus.set_counters_provider(collect_counters)
+        
         @app.get("/api/system/enhanced-status")
         async def get_enhanced_system_status():
             """获取增强版系统状态"""
             try:
-                # 由于我们使用的是web_enhanced_clean.py，始终返回增强模式
-                if enhanced_bot and hasattr(enhanced_bot, 'get_client_status'):
-                    clients_status = enhanced_bot.get_client_status()
-                    return JSONResponse(content={
-                        "success": True,
-                        "enhanced_mode": True,
-                        "app_version": Config.APP_VERSION,
-                        "app_name": Config.APP_NAME,
-                        "app_description": Config.APP_DESCRIPTION,
-                        "clients": clients_status,
-                        "total_clients": len(clients_status),
-                        "running_clients": sum(1 for client in clients_status.values() if client.get("running", False)),
-                        "connected_clients": sum(1 for client in clients_status.values() if client.get("connected", False))
-                    })
-                else:
-                    # 即使enhanced_bot为None，仍然返回增强模式为true
-                    # 因为我们使用的是web_enhanced_clean.py
-                    return JSONResponse(content={
-                        "success": True,
-                        "enhanced_mode": True,
-                        "app_version": Config.APP_VERSION,
-                        "app_name": Config.APP_NAME,
-                        "app_description": Config.APP_DESCRIPTION,
-                        "clients": {},
-                        "total_clients": 0,
-                        "running_clients": 0,
-                        "connected_clients": 0,
-                        "message": "增强模式已启用，正在初始化..."
-                    })
+                return JSONResponse(content=build_enhanced_status())
             except Exception as e:
                 logger.error(f"获取增强版系统状态失败: {e}")
                 return JSONResponse(content={
@@ -520,6 +505,74 @@ async def main():
                     "message": f"获取系统状态失败: {str(e)}"
                 }, status_code=500)
         
+        @app.get("/api/events")
+        async def server_events(request: Request, last_event_id: str = None):
+            """
+            实时推送（SSE）：客户端状态变化、新转发日志、运行计数
+            
+            断线后浏览器会通过 Last-Event-ID 请求头续传；无法续传时先推送完整快照
+            """
+            from fastapi.responses import StreamingResponse
+            
+            resume_id = request.headers.get("last-event-id") or last_event_id
+            return StreamingResponse(
+                event_bus.stream(resume_id, request.is_disconnected),
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    # 禁止 nginx 等反向代理缓冲推送内容
+                    "X-Accel-Buffering": "no"
+                }
+            )
+        
+        # 延迟投递API
+        @app.get("/api/deliveries")
+        async def get_pending_deliveries():
+            """获取待投递（forward_delay 尚未到期）的消息列表"""
+            try:
+                deliveries = []
+                if enhanced_bot and getattr(enhanced_bot, 'multi_client_manager', None):
+                    deliveries = enhanced_bot.multi_client_manager.get_pending_deliveries()
+                
+                for item in deliveries:
+                    compiled_rule = rule_index.get_rule(item["rule_id"])
+                    item["rule_name"] = compiled_rule.name if compiled_rule else None
+                    item["target_chat_id"] = compiled_rule.target_chat_id if compiled_rule else None
+                
+                return JSONResponse(content={
+                    "success": True,
+                    "deliveries": deliveries,
+                    "total": len(deliveries)
+                })
+            except Exception as e:
+                logger.error(f"获取待投递列表失败: {e}")
+                return JSONResponse(content={
+                    "success": False,
+                    "message": f"获取待投递列表失败: {str(e)}"
+                }, status_code=500)
+        
+        @app.delete("/api/deliveries/{delivery_id}")
+        async def cancel_pending_delivery(delivery_id: int):
+            """取消一次待投递"""
+            try:
+                if enhanced_bot and getattr(enhanced_bot, 'multi_client_manager', None):
+                    if enhanced_bot.multi_client_manager.cancel_delivery(delivery_id):
+                        return JSONResponse(content={
+                            "success": True,
+                            "message": f"已取消待投递 {delivery_id}"
+                        })
+                
+                return JSONResponse(content={
+                    "success": False,
+                    "message": "待投递不存在或已发送"
+                }, status_code=404)
+            except Exception as e:
+                logger.error(f"取消待投递失败: {e}")
+                return JSONResponse(content={
+                    "success": False,
+                    "message": f"取消待投递失败: {str(e)}"
+                }, status_code=500)
+        
         # 日志管理API
         @app.get("/api/system/logs/stats")
         async def get_log_stats():
@@ -767,9 +820,9 @@ async def main():
                         "id": rule.id,
                         "name": rule.name,
                         "source_chat_id": rule.source_chat_id,
-                        "source_chat_name": rule.source_chat_name,
+                        "source_chat_name": chat_entity_cache.display_name(rule.source_chat_id, rule.source_chat_name),
                         "target_chat_id": rule.target_chat_id,
-                        "target_chat_name": rule.target_chat_name,
+                        "target_chat_name": chat_entity_cache.display_name(rule.target_chat_id, rule.target_chat_name),
                         "is_active": rule.is_active,
                         "enable_keyword_filter": rule.enable_keyword_filter,
                         "enable_regex_replace": getattr(rule, 'enable_regex_replace', False),
@@ -791,6 +844,7 @@ async def main():
                         "forward_delay": getattr(rule, 'forward_delay', 0),
                         "max_message_length": getattr(rule, 'max_message_length', 4096),
                         "enable_link_preview": getattr(rule, 'enable_link_preview', True),
+                        "delivery_mode": getattr(rule, 'delivery_mode', None) or 'resend',
                         
                         # 时间过滤
                         "time_filter_type": getattr(rule, 'time_filter_type', 'after_start'),
@@ -831,6 +885,12 @@ async def main():
                             "message": f"缺少必需字段: {field}"
                         }, status_code=400)
                 
+                if data.get('delivery_mode', 'resend') not in DELIVERY_MODES:
+                    return JSONResponse(content={
+                        "success": False,
+                        "message": f"无效的投递方式: {data['delivery_mode']}"
+                    }, status_code=400)
+                
                 # 提取参数，排除必需字段和已明确传递的字段
                 excluded_fields = required_fields + ['source_chat_name', 'target_chat_name']
                 kwargs = {k: v for k, v in data.items() if k not in excluded_fields}
@@ -838,14 +898,15 @@ async def main():
                 rule = await ForwardRuleService.create_rule(
                     name=data['name'],
                     source_chat_id=data['source_chat_id'],
-                    source_chat_name=data.get('source_chat_name', ''),
+                    source_chat_name=data.get('source_chat_name') or chat_entity_cache.get_title(data['source_chat_id']) or '',
                     target_chat_id=data['target_chat_id'],
-                    target_chat_name=data.get('target_chat_name', ''),
+                    target_chat_name=data.get('target_chat_name') or chat_entity_cache.get_title(data['target_chat_id']) or '',
                     **kwargs
                 )
                 # 序列化规则数据
                 rule_data = None
                 if rule:
+                    await rule_index.refresh_rule(rule.id)
                     rule_data = {
                         "id": rule.id,
                         "name": rule.name,
@@ -874,6 +935,7 @@ async def main():
                         "forward_delay": getattr(rule, 'forward_delay', 0),
                         "max_message_length": getattr(rule, 'max_message_length', 4096),
                         "enable_link_preview": getattr(rule, 'enable_link_preview', True),
+                        "delivery_mode": getattr(rule, 'delivery_mode', None) or 'resend',
                         
                         # 时间过滤
                         "time_filter_type": getattr(rule, 'time_filter_type', 'after_start'),
@@ -938,6 +1000,7 @@ async def main():
                     "forward_delay": getattr(rule, 'forward_delay', 0),
                     "max_message_length": getattr(rule, 'max_message_length', 4096),
                     "enable_link_preview": getattr(rule, 'enable_link_preview', True),
+                    "delivery_mode": getattr(rule, 'delivery_mode', None) or 'resend',
                     
                     # 时间过滤
                     "time_filter_type": getattr(rule, 'time_filter_type', 'after_start'),
@@ -982,11 +1045,17 @@ async def main():
                     'is_active', 'enable_keyword_filter', 'enable_regex_replace', 'client_id', 'client_type',
                     'enable_text', 'enable_media', 'enable_photo', 'enable_video', 'enable_document',
                     'enable_audio', 'enable_voice', 'enable_sticker', 'enable_animation', 'enable_webpage',
-                    'forward_delay', 'max_message_length', 'enable_link_preview', 'time_filter_type',
-                    'start_time', 'end_time'
+                    'forward_delay', 'max_message_length', 'enable_link_preview', 'delivery_mode',
+                    'time_filter_type', 'start_time', 'end_time'
                 }
                 update_data = {k: v for k, v in data.items() if k in allowed_fields}
                 
+                if 'delivery_mode' in update_data and update_data['delivery_mode'] not in DELIVERY_MODES:
+                    return JSONResponse(content={
+                        "success": False,
+                        "message": f"无效的投递方式: {update_data['delivery_mode']}"
+                    }, status_code=400)
+                
                 # 检查是否是激活规则的操作（基于更新前的状态）
                 is_activating = (
                     'is_active' in update_data and 
@@ -1010,6 +1079,9 @@ async def main():
                         "message": "更新规则失败"
                     }, status_code=500)
                 
+                # 同步内存规则索引
+                await rule_index.refresh_rule(rule_id)
+                
                 # 获取更新后的规则
                 updated_rule = await ForwardRuleService.get_rule_by_id(rule_id)
                 
@@ -1053,6 +1125,7 @@ async def main():
                         "forward_delay": getattr(updated_rule, 'forward_delay', 0),
                         "max_message_length": getattr(updated_rule, 'max_message_length', 4096),
                         "enable_link_preview": getattr(updated_rule, 'enable_link_preview', True),
+                        "delivery_mode": getattr(updated_rule, 'delivery_mode', None) or 'resend',
                         
                         # 时间过滤
                         "time_filter_type": getattr(updated_rule, 'time_filter_type', 'after_start'),
@@ -1094,6 +1167,10 @@ async def main():
                         "message": "删除规则失败"
                     }, status_code=500)
                 
+                rule_index.remove_rule(rule_id)
+                await message_mapping.discard_rule(rule_id)
+                dedup_guard.discard_rule(rule_id)
+                
                 return JSONResponse(content={
                     "success": True,
                     "message": "规则删除成功"
@@ -1127,6 +1204,8 @@ async def main():
                             "rule_id": kw.rule_id,
                             "keyword": kw.keyword,
                             "is_blacklist": getattr(kw, 'is_exclude', False),
+                            "is_regex": getattr(kw, 'is_regex', False),
+                            "case_sensitive": getattr(kw, 'case_sensitive', False),
                             "created_at": kw.created_at.isoformat() if kw.created_at else None
                         })
                     
@@ -1155,12 +1234,15 @@ async def main():
                     keyword = Keyword(
                         rule_id=rule_id,
                         keyword=data.get('keyword'),
-                        is_exclude=data.get('is_blacklist', False)
+                        is_exclude=data.get('is_blacklist', False),
+                        is_regex=data.get('is_regex', False),
+                        case_sensitive=data.get('case_sensitive', False)
                     )
                     
                     db.add(keyword)
                     await db.commit()
                     await db.refresh(keyword)
+                    await rule_index.refresh_rule(rule_id)
                     
                     return JSONResponse({
                         "success": True,
@@ -1170,6 +1252,8 @@ async def main():
                             "rule_id": keyword.rule_id,
                             "keyword": keyword.keyword,
                             "is_blacklist": keyword.is_exclude,
+                            "is_regex": keyword.is_regex,
+                            "case_sensitive": keyword.case_sensitive,
                             "created_at": keyword.created_at.isoformat() if keyword.created_at else None
                         }
                     })
@@ -1208,9 +1292,14 @@ async def main():
                         keyword.keyword = data['keyword']
                     if 'is_blacklist' in data:
                         keyword.is_exclude = data['is_blacklist']
+                    if 'is_regex' in data:
+                        keyword.is_regex = data['is_regex']
+                    if 'case_sensitive' in data:
+                        keyword.case_sensitive = data['case_sensitive']
                     
                     await db.commit()
                     await db.refresh(keyword)
+                    await rule_index.refresh_rule(keyword.rule_id)
                     
                     return JSONResponse({
                         "success": True,
@@ -1220,6 +1309,8 @@ async def main():
                             "rule_id": keyword.rule_id,
                             "keyword": keyword.keyword,
                             "is_blacklist": keyword.is_exclude,
+                            "is_regex": keyword.is_regex,
+                            "case_sensitive": keyword.case_sensitive,
                             "created_at": keyword.created_at.isoformat() if keyword.created_at else None
                         }
                     })
@@ -1240,12 +1331,17 @@ async def main():
                 from sqlalchemy import select, delete
                 
                 async for db in get_db():
+                    owner_rule_id = (await db.execute(
+                        select(Keyword.rule_id).where(Keyword.id == keyword_id)
+                    )).scalar_one_or_none()
+                    
                     result = await db.execute(
                         delete(Keyword).where(Keyword.id == keyword_id)
                     )
                     await db.commit()
                     
                     if result.rowcount > 0:
+                        await rule_index.refresh_rule(owner_rule_id)
                         return JSONResponse({
                             "success": True,
                             "message": "关键词删除成功"
@@ -1279,6 +1375,10 @@ async def main():
                     )
                     replacements = result.scalars().all()
                     
+                    # 替换流水线的命中统计（规则未加载到索引时为空）
+                    from filters import RegexReplacer
+                    hit_stats = {item["id"]: item for item in RegexReplacer.get_chain_stats(rule_id)}
+                    
                     replacements_data = []
                     for rr in replacements:
                         replacements_data.append({
@@ -1290,6 +1390,8 @@ async def main():
                             "priority": rr.priority,
                             "is_regex": rr.is_regex,
                             "is_active": rr.is_active,
+                            "hit_count": hit_stats.get(rr.id, {}).get("hit_count", 0),
+                            "replace_count": hit_stats.get(rr.id, {}).get("replace_count", 0),
                             "created_at": rr.created_at.isoformat() if rr.created_at else None
                         })
                     
@@ -1309,8 +1411,9 @@ async def main():
         async def create_replacement(rule_id: int, request: Request):
             """创建替换规则"""
             try:
-                from models import ReplaceRule
+                from models import ReplaceRule, ForwardRule, get_local_now
                 from database import get_db
+                from sqlalchemy import update
                 
                 data = await request.json()
                 
@@ -1326,8 +1429,13 @@ async def main():
                     )
                     
                     db.add(replacement)
+                    # 更新所属规则的 updated_at，使替换流水线缓存失效
+                    await db.execute(
+                        update(ForwardRule).where(ForwardRule.id == rule_id).values(updated_at=get_local_now())
+                    )
                     await db.commit()
                     await db.refresh(replacement)
+                    await rule_index.refresh_rule(rule_id)
                     
                     return JSONResponse({
                         "success": True,
@@ -1356,9 +1464,9 @@ async def main():
         async def update_replacement(replacement_id: int, request: Request):
             """更新替换规则"""
             try:
-                from models import ReplaceRule
+                from models import ReplaceRule, ForwardRule, get_local_now
                 from database import get_db
-                from sqlalchemy import select
+                from sqlalchemy import select, update
                 
                 data = await request.json()
                 
@@ -1388,8 +1496,12 @@ async def main():
                     if 'is_active' in data:
                         replacement.is_active = data['is_active']
                     
+                    await db.execute(
+                        update(ForwardRule).where(ForwardRule.id == replacement.rule_id).values(updated_at=get_local_now())
+                    )
                     await db.commit()
                     await db.refresh(replacement)
+                    await rule_index.refresh_rule(replacement.rule_id)
                     
                     return JSONResponse({
                         "success": True,
@@ -1418,17 +1530,26 @@ async def main():
         async def delete_replacement(replacement_id: int):
             """删除替换规则"""
             try:
-                from models import ReplaceRule
+                from models import ReplaceRule, ForwardRule, get_local_now
                 from database import get_db
-                from sqlalchemy import select, delete
+                from sqlalchemy import select, delete, update
                 
                 async for db in get_db():
+                    owner_rule_id = (await db.execute(
+                        select(ReplaceRule.rule_id).where(ReplaceRule.id == replacement_id)
+                    )).scalar_one_or_none()
+                    
                     result = await db.execute(
                         delete(ReplaceRule).where(ReplaceRule.id == replacement_id)
                     )
+                    if owner_rule_id is not None:
+                        await db.execute(
+                            update(ForwardRule).where(ForwardRule.id == owner_rule_id).values(updated_at=get_local_now())
+                        )
                     await db.commit()
                     
                     if result.rowcount > 0:
+                        await rule_index.refresh_rule(owner_rule_id)
                         return JSONResponse({
                             "success": True,
                             "message": "替换规则删除成功"
@@ -1446,60 +1567,63 @@ async def main():
                     content={"success": False, "message": f"删除替换规则失败: {str(e)}"}
                 )
         
+        def connected_chat_clients(client_id: str = None):
+            """已连接的客户端（可按客户端ID筛选）"""
+            if not enhanced_bot or not enhanced_bot.multi_client_manager:
+                return []
+            return [
+                (cid, client_wrapper)
+                for cid, client_wrapper in enhanced_bot.multi_client_manager.clients.items()
+                if client_wrapper.connected and (not client_id or cid == client_id)
+            ]
+        
         @app.get("/api/chats")
-        async def get_chats():
-            """获取聊天列表"""
+        async def get_chats(search: str = None, chat_type: str = None, client_id: str = None,
+                            page: int = 1, limit: int = None):
+            """获取聊天列表（读取各客户端的会话缓存；传入 limit 时分页，不传返回全部）"""
             try:
-                # 从增强版机器人获取聊天列表
-                if enhanced_bot and enhanced_bot.multi_client_manager:
-                    all_chats = []
-                    clients_info = []
-                    
-                    for client_id, client_wrapper in enhanced_bot.multi_client_manager.clients.items():
-                        if client_wrapper.connected:
-                            try:
-                                # 使用线程安全方法获取聊天列表
-                                client_chats = client_wrapper.get_chats_sync()
-                                all_chats.extend(client_chats)
-                                
-                                # 收集客户端信息
-                                client_info = {
-                                    "client_id": client_id,
-                                    "client_type": client_wrapper.client_type,
-                                    "chat_count": len(client_chats),
-                                    "display_name": client_chats[0]["client_display_name"] if client_chats else f"{client_wrapper.client_type}: {client_id}"
-                                }
-                                clients_info.append(client_info)
-                                
-                            except Exception as e:
-                                logger.warning(f"获取客户端 {client_id} 聊天列表失败: {e}")
-                                continue
-                    
-                    # 按客户端分组聊天
-                    chats_by_client = {}
-                    for chat in all_chats:
-                        client_id = chat["client_id"]
-                        if client_id not in chats_by_client:
-                            chats_by_client[client_id] = []
-                        chats_by_client[client_id].append(chat)
-                    
-                    return JSONResponse(content={
-                        "success": True,
-                        "chats": all_chats,
-                        "chats_by_client": chats_by_client,
-                        "clients_info": clients_info,
-                        "total_chats": len(all_chats),
-                        "connected_clients": len(clients_info)
-                    })
-                else:
-                    return JSONResponse(content={
-                        "success": True,
-                        "chats": [],
-                        "chats_by_client": {},
-                        "clients_info": [],
-                        "total_chats": 0,
-                        "connected_clients": 0
+                all_chats = []
+                clients_info = []
+                last_updated = None
+                
+                for cid, client_wrapper in connected_chat_clients(client_id):
+                    client_chats, cache_info = await client_wrapper.query_chats(search, chat_type)
+                    all_chats.extend(client_chats)
+                    
+                    # 收集客户端信息
+                    clients_info.append({
+                        "client_id": cid,
+                        "client_type": client_wrapper.client_type,
+                        "chat_count": cache_info["chat_count"],
+                        "display_name": cache_info["display_name"],
+                        "loaded": cache_info["loaded"]
                     })
+                    refreshed = cache_info["last_refreshed"]
+                    if refreshed and (last_updated is None or refreshed > last_updated):
+                        last_updated = refreshed
+                
+                total_chats = len(all_chats)
+                page = max(1, page)
+                if limit is not None:
+                    limit = max(1, min(limit, 1000))
+                    all_chats = all_chats[(page - 1) * limit:page * limit]
+                
+                # 按客户端分组聊天
+                chats_by_client = {}
+                for chat in all_chats:
+                    chats_by_client.setdefault(chat["client_id"], []).append(chat)
+                
+                return JSONResponse(content={
+                    "success": True,
+                    "chats": all_chats,
+                    "chats_by_client": chats_by_client,
+                    "clients_info": clients_info,
+                    "total_chats": total_chats,
+                    "connected_clients": len(clients_info),
+                    "page": page,
+                    "limit": limit,
+                    "last_updated": datetime.fromtimestamp(last_updated).isoformat() if last_updated else None
+                })
             except Exception as e:
                 logger.error(f"获取聊天列表失败: {e}")
                 return JSONResponse(content={
@@ -1508,14 +1632,37 @@ async def main():
                 }, status_code=500)
         
         @app.post("/api/refresh-chats")
-        async def refresh_chats():
-            """刷新聊天列表"""
+        async def refresh_chats(client_id: str = None):
+            """从 Telegram 重新完整加载会话列表（平时由更新事件增量维护，无需手动刷新）"""
             try:
-                # 在增强模式下，聊天列表是实时的，无需特别刷新
+                clients = connected_chat_clients(client_id)
+                if not clients:
+                    return JSONResponse(content={
+                        "success": False,
+                        "message": "没有已连接的客户端"
+                    }, status_code=503)
+                
+                results = await asyncio.gather(
+                    *(client_wrapper.refresh_chats() for _cid, client_wrapper in clients),
+                    return_exceptions=True
+                )
+                
+                counts = {}
+                errors = {}
+                for (cid, _client_wrapper), result in zip(clients, results):
+                    if isinstance(result, Exception):
+                        logger.warning(f"刷新客户端 {cid} 聊天列表失败: {result}")
+                        errors[cid] = str(result) or type(result).__name__
+                    else:
+                        counts[cid] = result
+                
+                updated_count = sum(counts.values())
                 return JSONResponse(content={
-                    "success": True,
-                    "message": "聊天列表已刷新",
-                    "updated_count": 0
+                    "success": bool(counts),
+                    "message": f"聊天列表已刷新，共 {updated_count} 个聊天" if counts else "刷新聊天列表失败",
+                    "updated_count": updated_count,
+                    "clients": counts,
+                    "errors": errors
                 })
             except Exception as e:
                 logger.error(f"刷新聊天列表失败: {e}")
@@ -1531,19 +1678,13 @@ async def main():
                 from fastapi.responses import Response
                 import json
                 
-                # 从增强版机器人获取聊天列表
+                # 从各客户端的会话缓存获取聊天列表
                 if enhanced_bot and enhanced_bot.multi_client_manager:
                     all_chats = []
                     
-                    for client_id, client_wrapper in enhanced_bot.multi_client_manager.clients.items():
-                        if client_wrapper.connected:
-                            try:
-                                # 使用线程安全方法获取聊天列表
-                                client_chats = client_wrapper.get_chats_sync()
-                                all_chats.extend(client_chats)
-                            except Exception as e:
-                                logger.warning(f"获取客户端 {client_id} 聊天列表失败: {e}")
-                                continue
+                    for _client_id, client_wrapper in connected_chat_clients():
+                        client_chats, _cache_info = await client_wrapper.query_chats()
+                        all_chats.extend(client_chats)
                     
                     # 返回JSON文件
                     json_str = json.dumps(all_chats, ensure_ascii=False, indent=2)
@@ -1568,111 +1709,86 @@ async def main():
                     "message": f"导出失败: {str(e)}"
                 }, status_code=500)
         
+        @app.get("/api/stats")
+        async def get_stats(days: int = 7):
+            """转发统计（来自预聚合的 message_stats，耗时与日志总量无关）"""
+            try:
+                days = max(1, min(days, 90))
+                stats = await stats_rollup.get_summary(days=days)
+                return JSONResponse(content={"success": True, **stats})
+            except Exception as e:
+                logger.error(f"获取转发统计失败: {e}")
+                return JSONResponse(content={
+                    "success": False,
+                    "message": f"获取统计失败: {str(e)}"
+                }, status_code=500)
+        
         @app.get("/api/logs")
         async def get_logs(page: int = 1, limit: int = 20, status: str = None, 
-                          date: str = None, start_date: str = None, end_date: str = None):
-            """获取日志列表"""
+                          date: str = None, start_date: str = None, end_date: str = None,
+                          rule_id: int = None, cursor: str = None):
+            """获取日志列表（传入 cursor 时使用键集分页，深页耗时不随页码增长）"""
             try:
-                from models import MessageLog
-                from sqlalchemy import desc, select, and_, func
-                from database import get_db
-                from datetime import datetime, date as date_type
+                page = max(1, page)
+                limit = max(1, min(limit, 1000))
+                filters = dict(status=status, date=date, start_date=start_date,
+                               end_date=end_date, rule_id=rule_id)
                 
-                async for db in get_db():
-                    # 构建查询
-                    query = select(MessageLog)
-                    
-                    # 状态过滤
-                    if status:
-                        query = query.where(MessageLog.status == status)
-                    
-                    # 日期过滤
-                    if date:
-                        # 单日期筛选
-                        try:
-                            target_date = datetime.strptime(date, '%Y-%m-%d').date()
-                            query = query.where(func.date(MessageLog.created_at) == target_date)
-                        except ValueError:
-                            logger.warning(f"无效的日期格式: {date}")
-                    
-                    elif start_date or end_date:
-                        # 日期范围筛选
-                        date_conditions = []
-                        if start_date:
-                            try:
-                                start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
-                                date_conditions.append(func.date(MessageLog.created_at) >= start_dt)
-                            except ValueError:
-                                logger.warning(f"无效的开始日期格式: {start_date}")
-                        
-                        if end_date:
-                            try:
-                                end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
-                                date_conditions.append(func.date(MessageLog.created_at) <= end_dt)
-                            except ValueError:
-                                logger.warning(f"无效的结束日期格式: {end_date}")
-                        
-                        if date_conditions:
-                            query = query.where(and_(*date_conditions))
-                    
-                    # 排序（最新的在前）
-                    query = query.order_by(desc(MessageLog.created_at))
-                    
-                    # 分页
-                    offset = (page - 1) * limit
-                    paginated_query = query.offset(offset).limit(limit)
-                    
-                    # 执行查询，预加载规则信息
-                    from sqlalchemy.orm import joinedload
-                    paginated_query = paginated_query.options(joinedload(MessageLog.rule))
-                    result = await db.execute(paginated_query)
-                    logs = result.scalars().all()
-                    
-                    # 获取总数
-                    count_query = select(MessageLog)
-                    if status:
-                        count_query = count_query.where(MessageLog.status == status)
-                    count_result = await db.execute(count_query)
-                    total = len(count_result.scalars().all())
-                    
-                    # 序列化日志数据
-                    logs_data = []
-                    for log in logs:
-                        # 获取规则名称（通过预加载的关系）
-                        rule_name = None
-                        if log.rule and hasattr(log.rule, 'name'):
-                            rule_name = log.rule.name
-                        elif log.rule_id:
-                            rule_name = f"规则 #{log.rule_id}"
-                        
-                        log_data = {
-                            "id": log.id,
-                            "rule_id": log.rule_id,
-                            "rule_name": rule_name,
-                            # 前端期望的字段名映射
-                            "message_id": log.source_message_id,  # 前端期望 message_id
-                            "forwarded_message_id": log.target_message_id,  # 前端期望 forwarded_message_id
-                            "source_chat_id": log.source_chat_id,
-                            "source_chat_name": log.source_chat_name,
-                            "target_chat_id": log.target_chat_id,
-                            "target_chat_name": log.target_chat_name,
-                            "message_text": log.original_text,  # 前端期望 message_text
-                            "message_type": log.media_type or 'text',  # 前端期望 message_type
-                            "status": log.status,
-                            "error_message": log.error_message,
-                            "processing_time": log.processing_time,
-                            "created_at": log.created_at.isoformat() if log.created_at else None
-                        }
-                        logs_data.append(log_data)
-                    
+                try:
+                    logs, next_cursor = await MessageLogService.get_logs_page(
+                        limit=limit, page=page, cursor=cursor, **filters
+                    )
+                except ValueError as e:
                     return JSONResponse(content={
-                        "success": True,
-                        "items": logs_data,  # 前端期望 items 字段
-                        "total": total,
-                        "page": page,
-                        "limit": limit
-                    })
-                    
+                        "success": False,
+                        "message": str(e)
+                    }, status_code=400)
+                
+                # 获取总数（与列表相同的筛选条件）
+                total, total_approximate = await MessageLogService.count_logs(**filters)
+                
+                # 序列化日志数据
+                logs_data = []
+                for log in logs:
+                    # 获取规则名称（通过预加载的关系）
+                    rule_name = None
+                    if log.rule and hasattr(log.rule, 'name'):
+                        rule_name = log.rule.name
+                    elif log.rule_id:
+                        rule_name = f"规则 #{log.rule_id}"
+                    
+                    log_data = {
+                        "id": log.id,
+                        "rule_id": log.rule_id,
+                        "rule_name": rule_name,
+                        # 前端期望的字段名映射
+                        "message_id": log.source_message_id,  # 前端期望 message_id
+                        "forwarded_message_id": log.target_message_id,  # 前端期望 forwarded_message_id
+                        "source_chat_id": log.source_chat_id,
+                        "source_chat_name": log.source_chat_name,
+                        "target_chat_id": log.target_chat_id,
+                        "target_chat_name": log.target_chat_name,
+                        "message_text": log.original_text,  # 前端期望 message_text
+                        "message_type": log.media_type or 'text',  # 前端期望 message_type
+                        "status": log.status,
+                        "error_message": log.error_message,
+                        "processing_time": log.processing_time,
+                        "created_at": log.created_at.isoformat() if log.created_at else None
+                    }
+                    logs_data.append(log_data)
+                
+                return JSONResponse(content={
+                    "success": True,
+                    "items": logs_data,  # 前端期望 items 字段
+                    "total": total,
+                    "total_approximate": total_approximate,
+                    "page": page,
+                    "limit": limit,
+                    "pages": (total + limit - 1) // limit,
+                    "next_cursor": next_cursor,
+                    "has_more": next_cursor is not None
+                })
+                
             except Exception as e:
                 logger.error(f"获取日志失败: {e}")
                 return JSONResponse(content={
@@ -1700,9 +1816,8 @@ async def main():
                         # 尝试获取源聊天名称
                         if not rule.source_chat_name or rule.source_chat_name.strip() == '':
                             try:
-                                # 这里需要从Telegram客户端获取聊天信息
-                                # 暂时使用聊天ID作为占位符，实际应该调用Telegram API
-                                source_name = f"聊天 {rule.source_chat_id}"
+                                # 优先使用聊天实体缓存中的标题，没有时使用占位符
+                                source_name = chat_entity_cache.get_title(rule.source_chat_id) or f"聊天 {rule.source_chat_id}"
                                 updated_fields['source_chat_name'] = source_name
                                 logger.info(f"🔄 更新源聊天名称: {rule.source_chat_id} -> {source_name}")
                             except Exception as e:
@@ -1711,9 +1826,8 @@ async def main():
                         # 尝试获取目标聊天名称
                         if not rule.target_chat_name or rule.target_chat_name.strip() == '':
                             try:
-                                # 这里需要从Telegram客户端获取聊天信息
-                                # 暂时使用聊天ID作为占位符，实际应该调用Telegram API
-                                target_name = f"聊天 {rule.target_chat_id}"
+                                # 优先使用聊天实体缓存中的标题，没有时使用占位符
+                                target_name = chat_entity_cache.get_title(rule.target_chat_id) or f"聊天 {rule.target_chat_id}"
                                 updated_fields['target_chat_name'] = target_name
                                 logger.info(f"🔄 更新目标聊天名称: {rule.target_chat_id} -> {target_name}")
                             except Exception as e:
@@ -1833,6 +1947,7 @@ async def main():
                             'forward_delay': rule.forward_delay,
                             'max_message_length': rule.max_message_length,
                             'enable_link_preview': rule.enable_link_preview,
+                            'delivery_mode': rule.delivery_mode or 'resend',
                             'time_filter_type': rule.time_filter_type,
                             'start_time': rule.start_time.isoformat() if rule.start_time else None,
                             'end_time': rule.end_time.isoformat() if rule.end_time else None,
@@ -1926,6 +2041,7 @@ async def main():
                                 forward_delay=rule_data.get('forward_delay', 0),
                                 max_message_length=rule_data.get('max_message_length'),
                                 enable_link_preview=rule_data.get('enable_link_preview', True),
+                                delivery_mode=rule_data.get('delivery_mode', 'resend') if rule_data.get('delivery_mode') in DELIVERY_MODES else 'resend',
                                 time_filter_type=rule_data.get('time_filter_type', 'none'),
                                 start_time=datetime.fromisoformat(rule_data['start_time'].replace('Z', '+00:00')) if rule_data.get('start_time') else None,
                                 end_time=datetime.fromisoformat(rule_data['end_time'].replace('Z', '+00:00')) if rule_data.get('end_time') else None,
@@ -1954,7 +2070,7 @@ async def main():
                                         rule_id=new_rule.id,
                                         pattern=replacement_data.get('pattern'),
                                         replacement=replacement_data.get('replacement'),
-                                        is_regex=replacement_data.get('is_regex', False),
+                                        is_regex=replacement_data.get('is_regex', True),
                                         is_active=replacement_data.get('is_active', True)
                                     )
                                     db.add(new_replacement)
@@ -1969,6 +2085,10 @@ async def main():
                     
                     await db.commit()
                     
+                    # 导入可能涉及大量规则，直接全量重建索引
+                    if imported_count:
+                        await rule_index.rebuild()
+                    
                     return JSONResponse({
                         "success": True,
                         "message": f"导入完成：成功 {imported_count} 个，失败 {failed_count} 个",
@@ -2144,10 +2264,12 @@ async def main():
                     )
                     deleted_logs_info = logs_to_delete.fetchall()
                     
-                    # 批量删除
+                    # 批量删除（同一事务中扣减转发统计）
+                    await stats_rollup.subtract(db, [MessageLog.id.in_(existing_ids)])
                     delete_query = delete(MessageLog).where(MessageLog.id.in_(existing_ids))
                     result = await db.execute(delete_query)
                     await db.commit()
+                    MessageLogService.invalidate_count_cache()
                     
                     logger.info(f"批量删除了 {result.rowcount} 条日志")
                     for log_info in deleted_logs_info:
@@ -2168,84 +2290,43 @@ async def main():
         
         @app.post("/api/logs/export")
         async def export_logs(request: Request):
-            """导出日志"""
+            """导出日志（流式输出，支持 json/ndjson/csv 格式和 gzip 压缩）"""
             try:
-                from models import MessageLog
-                from sqlalchemy import select, and_, func
-                from database import get_db
                 from datetime import datetime
-                import json
-                from fastapi.responses import Response
+                from fastapi.responses import StreamingResponse
+                from log_export import LogExporter
                 
-                # 获取过滤条件
+                # 获取过滤条件和导出选项
                 try:
                     filters = await request.json()
                 except:
                     filters = {}
                 
-                async for db in get_db():
-                    # 构建查询
-                    query = select(MessageLog)
-                    
-                    # 应用过滤条件
-                    if filters.get('status'):
-                        query = query.where(MessageLog.status == filters['status'])
-                    
-                    if filters.get('date'):
-                        try:
-                            target_date = datetime.strptime(filters['date'], '%Y-%m-%d').date()
-                            query = query.where(func.date(MessageLog.created_at) == target_date)
-                        except ValueError:
-                            pass
-                    
-                    if filters.get('start_date') and filters.get('end_date'):
-                        try:
-                            start_date = datetime.strptime(filters['start_date'], '%Y-%m-%d')
-                            end_date = datetime.strptime(filters['end_date'], '%Y-%m-%d')
-                            query = query.where(and_(
-                                MessageLog.created_at >= start_date,
-                                MessageLog.created_at <= end_date
-                            ))
-                        except ValueError:
-                            pass
-                    
-                    # 执行查询
-                    result = await db.execute(query)
-                    logs = result.fetchall()
-                    
-                    # 转换为字典格式
-                    export_data = []
-                    for log_tuple in logs:
-                        log = log_tuple[0]
-                        export_data.append({
-                            'id': log.id,
-                            'rule_id': log.rule_id,
-                            'rule_name': log.rule_name,
-                            'source_chat_id': log.source_chat_id,
-                            'source_chat_name': log.source_chat_name,
-                            'target_chat_id': log.target_chat_id,
-                            'target_chat_name': log.target_chat_name,
-                            'source_message_id': log.source_message_id,
-                            'target_message_id': log.target_message_id,
-                            'original_text': log.original_text,
-                            'processed_text': log.processed_text,
-                            'media_type': log.media_type,
-                            'status': log.status,
-                            'error_message': log.error_message,
-                            'processing_time': log.processing_time,
-                            'created_at': log.created_at.isoformat() if log.created_at else None
-                        })
-                    
-                    # 返回JSON文件
-                    json_str = json.dumps(export_data, ensure_ascii=False, indent=2)
-                    
-                    return Response(
-                        content=json_str,
-                        media_type='application/json',
-                        headers={
-                            'Content-Disposition': f'attachment; filename="logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json"'
-                        }
+                try:
+                    exporter = LogExporter(
+                        fmt=filters.get('format') or request.query_params.get('format'),
+                        gzip=bool(filters.get('gzip')) or request.query_params.get('gzip') in ('1', 'true'),
+                        # 与日志列表相同的筛选口径
+                        filters=dict(
+                            status=filters.get('status'), date=filters.get('date'),
+                            start_date=filters.get('start_date'), end_date=filters.get('end_date'),
+                            rule_id=filters.get('rule_id')
+                        )
                     )
+                except ValueError as e:
+                    return JSONResponse({
+                        "success": False,
+                        "message": str(e)
+                    }, status_code=400)
+                
+                filename = exporter.filename(f"logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                return StreamingResponse(
+                    exporter.stream(),
+                    media_type=exporter.media_type,
+                    headers={
+                        'Content-Disposition': f'attachment; filename="{filename}"'
+                    }
+                )
                     
             except Exception as e:
                 logger.error(f"导出日志失败: {e}")
@@ -2255,87 +2336,49 @@ async def main():
                 }, status_code=500)
 
         @app.post("/api/logs/import")
-        async def import_logs(file: UploadFile = File(...)):
-            """导入日志"""
+        async def import_logs(file: UploadFile = File(...), background: bool = False):
+            """
+            导入日志（流式解析 JSON 数组 / NDJSON，可为 gzip 压缩）
+            
+            background=true 时立即返回导入任务ID，通过 /api/logs/import/{import_id} 查询进度
+            """
             try:
-                from models import MessageLog
-                from database import get_db
-                import json
-                from datetime import datetime
+                from log_import import log_importer, LogImporter
                 
-                # 读取上传的文件
-                content = await file.read()
-                try:
-                    import_data = json.loads(content.decode('utf-8'))
-                except json.JSONDecodeError as e:
-                    return JSONResponse({
-                        "success": False,
-                        "message": f"JSON格式错误: {str(e)}"
-                    }, status_code=400)
+                upload = file.file
+                upload.seek(0, 2)
+                total_bytes = upload.tell()
+                upload.seek(0)
                 
-                if not isinstance(import_data, list):
-                    return JSONResponse({
-                        "success": False,
-                        "message": "导入数据必须是数组格式"
-                    }, status_code=400)
+                job = log_importer.create_job(file.filename, total_bytes)
                 
-                async for db in get_db():
-                    from sqlalchemy import select, and_
-                    imported_count = 0
-                    skipped_count = 0
-                    
-                    for log_data in import_data:
-                        try:
-                            # 检查是否已存在相同的日志
-                            existing_log = await db.execute(
-                                select(MessageLog).where(
-                                    and_(
-                                        MessageLog.rule_id == log_data.get('rule_id'),
-                                        MessageLog.source_message_id == log_data.get('source_message_id'),
-                                        MessageLog.source_chat_id == log_data.get('source_chat_id')
-                                    )
-                                )
-                            )
-                            
-                            if existing_log.fetchone():
-                                skipped_count += 1
-                                continue
-                            
-                            # 创建新的日志记录
-                            new_log = MessageLog(
-                                rule_id=log_data.get('rule_id'),
-                                rule_name=log_data.get('rule_name'),
-                                source_chat_id=log_data.get('source_chat_id'),
-                                source_chat_name=log_data.get('source_chat_name'),
-                                target_chat_id=log_data.get('target_chat_id'),
-                                target_chat_name=log_data.get('target_chat_name'),
-                                source_message_id=log_data.get('source_message_id'),
-                                target_message_id=log_data.get('target_message_id'),
-                                original_text=log_data.get('original_text'),
-                                processed_text=log_data.get('processed_text'),
-                                media_type=log_data.get('media_type'),
-                                status=log_data.get('status', 'success'),
-                                error_message=log_data.get('error_message'),
-                                processing_time=log_data.get('processing_time'),
-                                created_at=datetime.fromisoformat(log_data['created_at'].replace('Z', '+00:00')) if log_data.get('created_at') else datetime.now()
-                            )
-                            
-                            db.add(new_log)
-                            imported_count += 1
-                            
-                        except Exception as e:
-                            logger.warning(f"导入单条日志失败: {e}")
-                            skipped_count += 1
-                            continue
-                    
-                    await db.commit()
-                    
+                if background:
+                    # 上传文件在请求结束后关闭，先复制到数据目录再后台导入
+                    path = await asyncio.to_thread(LogImporter.spool_to_disk, upload, file.filename)
+                    log_importer.run_in_background(job, path)
                     return JSONResponse({
                         "success": True,
-                        "message": f"导入完成：成功 {imported_count} 条，跳过 {skipped_count} 条",
-                        "imported": imported_count,
-                        "skipped": skipped_count
+                        "message": "导入任务已开始",
+                        "import_id": job.id,
+                        "job": job.to_dict()
                     })
+                
+                await log_importer.run(job, upload)
+                if job.status == 'failed':
+                    return JSONResponse({
+                        "success": False,
+                        "message": job.message,
+                        "import_id": job.id
+                    }, status_code=400 if job.invalid_file else 500)
+                
+                return JSONResponse({
+                    "success": True,
+                    "message": job.message,
+                    "import_id": job.id,
+                    "imported": job.imported,
+                    "skipped": job.skipped,
+                    "errors": job.errors
+                })
                     
             except Exception as e:
                 logger.error(f"导入日志失败: {e}")
@@ -2343,6 +2386,30 @@ async def main():
                     "success": False,
                     "message": f"导入失败: {str(e)}"
                 }, status_code=500)
+        
+        @app.get("/api/logs/import/jobs")
+        async def list_import_jobs():
+            """最近的日志导入任务"""
+            from log_import import log_importer
+            return JSONResponse({
+                "success": True,
+                "jobs": log_importer.list_jobs()
+            })
+        
+        @app.get("/api/logs/import/{import_id}")
+        async def get_import_job(import_id: int):
+            """查询日志导入进度"""
+            from log_import import log_importer
+            job = log_importer.get_job(import_id)
+            if job is None:
+                return JSONResponse({
+                    "success": False,
+                    "message": f"导入任务 {import_id} 不存在"
+                }, status_code=404)
+            return JSONResponse({
+                "success": True,
+                "job": job.to_dict()
+            })
 
         @app.post("/api/logs/clear")
         async def clear_logs(request: Request):
@@ -2352,47 +2419,25 @@ async def main():
                 
                 from models import MessageLog
                 from database import get_db
-                from sqlalchemy import delete, and_, func
-                from datetime import datetime
+                from sqlalchemy import delete, and_
                 
                 async for db in get_db():
-                    # 构建删除条件
-                    conditions = []
-                    
-                    # 状态过滤
-                    if data.get('status'):
-                        conditions.append(MessageLog.status == data['status'])
-                    
-                    # 日期过滤
-                    if data.get('date'):
-                        try:
-                            target_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-                            conditions.append(func.date(MessageLog.created_at) == target_date)
-                        except ValueError:
-                            logger.warning(f"无效的日期格式: {data['date']}")
-                    
-                    elif data.get('start_date') or data.get('end_date'):
-                        if data.get('start_date'):
-                            try:
-                                start_dt = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
-                                conditions.append(func.date(MessageLog.created_at) >= start_dt)
-                            except ValueError:
-                                pass
-                        
-                        if data.get('end_date'):
-                            try:
-                                end_dt = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
-                                conditions.append(func.date(MessageLog.created_at) <= end_dt)
-                            except ValueError:
-                                pass
+                    # 构建删除条件（与日志列表相同的口径）
+                    conditions = MessageLogService.build_log_filters(
+                        status=data.get('status'), date=data.get('date'),
+                        start_date=data.get('start_date'), end_date=data.get('end_date'),
+                        rule_id=data.get('rule_id')
+                    )
                     
-                    # 执行删除
+                    # 执行删除（同一事务中扣减转发统计）
+                    await stats_rollup.subtract(db, conditions)
                     delete_query = delete(MessageLog)
                     if conditions:
                         delete_query = delete_query.where(and_(*conditions))
                     
                     result = await db.execute(delete_query)
                     await db.commit()
+                    MessageLogService.invalidate_count_cache()
                     
                     logger.info(f"清空了 {result.rowcount} 条日志")
                     
@@ -2508,7 +2553,7 @@ async def main():
             """启动客户端"""
             try:
                 if enhanced_bot:
-                    success = enhanced_bot.multi_client_manager.start_client(client_id)
+                    success = await enhanced_bot.multi_client_manager.start_client_async(client_id)
                     if success:
                         return JSONResponse(content={
                             "success": True,
@@ -2536,7 +2581,8 @@ async def main():
             """停止客户端"""
             try:
                 if enhanced_bot:
-                    success = enhanced_bot.multi_client_manager.stop_client(client_id)
+                    # 停止时要等待客户端线程退出，放到线程池中执行，避免阻塞 Web 事件循环
+                    success = await asyncio.to_thread(enhanced_bot.multi_client_manager.stop_client, client_id)
                     if success:
                         return JSONResponse(content={
                             "success": True,
@@ -2564,7 +2610,8 @@ async def main():
             """删除客户端"""
             try:
                 if enhanced_bot:
-                    success = enhanced_bot.multi_client_manager.remove_client(client_id)
+                    # 停止时要等待客户端线程退出，放到线程池中执行，避免阻塞 Web 事件循环
+                    success = await asyncio.to_thread(enhanced_bot.multi_client_manager.remove_client, client_id)
                     if success:
                         return JSONResponse(content={
                             "success": True,
@@ -2681,7 +2728,7 @@ async def main():
                                 config_data=config_data
                             )
                             client.add_status_callback(enhanced_bot._notify_status_change)
-                            client.start()
+                            await client.start_async()
                             client_action_message = "，并已启动客户端"
                             logger.info(f"🔄 启用自动启动，已启动客户端: {client_id}")
                         except Exception as start_error:
@@ -2690,7 +2737,7 @@ async def main():
                     elif not client.running:
                         # 客户端存在但未运行，启动它
                         try:
-                            client.start()
+                            await client.start_async()
                             client_action_message = "，并已启动客户端"
                             logger.info(f"🔄 启用自动启动，已启动客户端: {client_id}")
                         except Exception as start_error:
@@ -3088,21 +3135,26 @@ async def main():
         traceback.print_exc()
         sys.exit(1)
 
+async def serve():
+    """创建应用并在同一个事件循环中运行Web服务器（启动时创建的后台任务和共享事件循环中的客户端继续运行）"""
+    # 创建应用实例
+    app = await main()
+    
+    if app:
+        # 启动Web服务器
+        import uvicorn
+        from config import Config
+        server = uvicorn.Server(uvicorn.Config(
+            app,
+            host=Config.WEB_HOST,
+            port=Config.WEB_PORT,
+            log_level="info"
+        ))
+        await server.serve()
+
 if __name__ == "__main__":
     try:
-        # 创建应用实例
-        app = asyncio.run(main())
-        
-        if app:
-            # 启动Web服务器
-            import uvicorn
-            from config import Config
-            uvicorn.run(
-                app,
-                host=Config.WEB_HOST,
-                port=Config.WEB_PORT,
-                log_level="info"
-            )
+        asyncio.run(serve())
     except KeyboardInterrupt:
         logger.info("👋 程序被用户中断")
     except Exception as e:
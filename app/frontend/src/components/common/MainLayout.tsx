@@ -20,6 +20,7 @@ import {
   UserOutlined,
 } from '@ant-design/icons';
 import ThemeSwitcher from '../ThemeSwitcher';
+import { useServerEvents } from '../../hooks/useServerEvents';
 
 const { Header, Sider } = Layout;
 const { Text } = Typography;
@@ -88,9 +89,12 @@ const MainLayout: React.FC = () => {
       const response = await fetch('/api/system/enhanced-status');
       return response.json();
     },
-    refetchInterval: 30000, // 每30秒刷新一次
+    // 客户端状态变化由实时推送更新，不再轮询
   });
 
+  // 实时推送（客户端状态、新日志、运行计数）
+  useServerEvents();
+
   // 菜单点击处理
   const handleMenuClick = (key: string) => {
     const item = menuItems.find(item => item.key === key);
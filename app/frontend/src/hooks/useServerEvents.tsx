@@ -0,0 +1,132 @@
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import type { QueryClient } from '@tanstack/react-query';
+
+// 服务端实时推送（SSE）：客户端状态、新转发日志、运行计数
+export type ServerEventType = 'snapshot' | 'client_status' | 'logs' | 'counters';
+
+export interface LogsEvent {
+  items: any[];
+  counts: Record<string, number>;
+  truncated: number;
+}
+
+type Listener = (data: any) => void;
+
+const listeners = new Map<ServerEventType, Set<Listener>>();
+
+// 增强版系统状态在不同页面使用了不同的查询键
+const ENHANCED_STATUS_KEYS = [['enhanced-status'], ['system-enhanced-status'], ['systemInfo']];
+
+// 页面订阅推送事件，返回取消订阅函数
+export const subscribeServerEvent = (type: ServerEventType, listener: Listener) => {
+  if (!listeners.has(type)) {
+    listeners.set(type, new Set());
+  }
+  listeners.get(type)!.add(listener);
+  return () => {
+    listeners.get(type)?.delete(listener);
+  };
+};
+
+const withTotals = (status: any) => {
+  const clients = Object.values(status.clients || {}) as any[];
+  return {
+    ...status,
+    total_clients: clients.length,
+    running_clients: clients.filter(client => client.running).length,
+    connected_clients: clients.filter(client => client.connected).length,
+  };
+};
+
+const updateEnhancedStatus = (queryClient: QueryClient, update: (clients: Record<string, any>) => Record<string, any>) => {
+  ENHANCED_STATUS_KEYS.forEach(key => {
+    queryClient.setQueryData(key, (old: any) => old ? withTotals({ ...old, clients: update(old.clients || {}) }) : old);
+  });
+};
+
+const applyClientStatus = (queryClient: QueryClient, clientId: string, status: any) => {
+  updateEnhancedStatus(queryClient, clients => ({ ...clients, [clientId]: status }));
+
+  const clientsData: any = queryClient.getQueryData(['clients']);
+  if (!clientsData?.clients?.[clientId]) {
+    // 新客户端：客户端列表还包含数据库配置（如自动启动），重新获取一次
+    queryClient.invalidateQueries({ queryKey: ['clients'] });
+    return;
+  }
+  queryClient.setQueryData(['clients'], {
+    ...clientsData,
+    clients: {
+      ...clientsData.clients,
+      [clientId]: { ...clientsData.clients[clientId], ...status },
+    },
+  });
+};
+
+const applyCounters = (queryClient: QueryClient, counters: any) => {
+  const merge = (clients: Record<string, any>) => {
+    const merged = { ...clients };
+    Object.entries(counters.clients || {}).forEach(([clientId, values]) => {
+      if (merged[clientId]) {
+        merged[clientId] = { ...merged[clientId], ...(values as any) };
+      }
+    });
+    return merged;
+  };
+  updateEnhancedStatus(queryClient, merge);
+  queryClient.setQueryData(['clients'], (old: any) => old?.clients ? { ...old, clients: merge(old.clients) } : old);
+};
+
+// 新日志直接累加到仪表盘的今日计数
+const applyLogCounts = (queryClient: QueryClient, counts: Record<string, number>) => {
+  queryClient.setQueryData(['stats'], (old: any) => {
+    if (!old) return old;
+    const added = Object.values(counts).reduce((sum, count) => sum + count, 0);
+    const todayMessages = old.today_messages + added;
+    const successMessages = old.success_messages + (counts.success || 0);
+    return {
+      ...old,
+      today_messages: todayMessages,
+      success_messages: successMessages,
+      failed_messages: (old.failed_messages || 0) + (counts.failed || 0),
+      success_rate: todayMessages ? Math.round(successMessages / todayMessages * 1000) / 10 : 0,
+    };
+  });
+};
+
+// 在布局中调用一次：建立推送连接，把事件写入 react-query 缓存，替代轮询
+export const useServerEvents = () => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (typeof EventSource === 'undefined') return;
+
+    // 断线后 EventSource 会自动重连，并通过 Last-Event-ID 续传
+    const source = new EventSource('/api/events');
+
+    const handle = (type: ServerEventType, apply: (data: any) => void) => {
+      source.addEventListener(type, (event) => {
+        try {
+          const data = JSON.parse((event as MessageEvent).data);
+          apply(data);
+          listeners.get(type)?.forEach(listener => listener(data));
+        } catch (error) {
+          console.error(`处理推送事件 ${type} 失败:`, error);
+        }
+      });
+    };
+
+    handle('snapshot', (data) => {
+      ENHANCED_STATUS_KEYS.forEach(key => queryClient.setQueryData(key, data));
+      // 快照意味着可能错过了事件，重新获取依赖增量更新的数据
+      queryClient.invalidateQueries({ queryKey: ['clients'] });
+      queryClient.invalidateQueries({ queryKey: ['stats'] });
+      queryClient.invalidateQueries({ queryKey: ['today-recent-logs'] });
+    });
+    handle('client_status', (data) => applyClientStatus(queryClient, data.client_id, data.status));
+    handle('counters', (data) => applyCounters(queryClient, data));
+    handle('logs', (data: LogsEvent) => applyLogCounts(queryClient, data.counts || {}));
+
+    return () => source.close();
+  }, [queryClient]);
+};
@@ -70,7 +70,7 @@ const ClientManagement: React.FC = () => {
     queryFn: async () => {
       return await clientsApi.getClients();
     },
-    refetchInterval: 5000, // 5秒刷新一次
+    // 状态变化由实时推送（useServerEvents）写入缓存，不再轮询
   });
 
   // 获取系统状态
@@ -79,7 +79,6 @@ const ClientManagement: React.FC = () => {
     queryFn: async () => {
       return await clientsApi.getEnhancedStatus();
     },
-    refetchInterval: 5000,
   });
 
   // 启动客户端
@@ -1,4 +1,4 @@
-import React, { useMemo, memo } from 'react';
+import React, { useMemo, useEffect, memo } from 'react';
 import { Row, Col, Card, Typography, Space, Button, Spin, Table } from 'antd';
 import {
   MessageOutlined,
@@ -9,15 +9,17 @@ import {
   BarChartOutlined,
   UnorderedListOutlined,
 } from '@ant-design/icons';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 import { useNavigate } from 'react-router-dom';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, PieChart, Pie, Cell, Legend } from 'recharts';
 import dayjs from 'dayjs';
 import { useTheme } from '../../hooks/useTheme';
+import { subscribeServerEvent } from '../../hooks/useServerEvents';
+import type { LogsEvent } from '../../hooks/useServerEvents';
 
 // Services
 // import { systemApi } from '../../services/system';
-// import { dashboardApi } from '../../services/dashboard';
+import { dashboardApi } from '../../services/dashboard';
 import { rulesApi } from '../../services/rules';
 import { logsApi } from '../../services/logs';
 
@@ -68,6 +70,7 @@ const logTableColumns = [
 
 const Dashboard: React.FC = () => {
   const navigate = useNavigate();
+  const queryClient = useQueryClient();
   const { themeConfig } = useTheme();
 
   // 根据主题获取字体颜色
@@ -100,21 +103,12 @@ const Dashboard: React.FC = () => {
   // 性能优化：使用useCallback包装导航函数
   // const navigateToLogs = useCallback(() => navigate('/logs'), [navigate]);
   
-  // 统计数据查询 - 优化查询配置
+  // 统计数据查询 - 后端预聚合的转发统计（今日、近七日、各规则）
   const { data: stats, isLoading: statsLoading, refetch: refetchStats, error: statsError } = useQuery({
     queryKey: ['stats'],
-    queryFn: async () => {
-      // 返回模拟数据，避免404错误
-      return {
-        active_rules: 0,
-        total_rules: 0,
-        success_rate: 0,
-        today_messages: 0,
-      };
-    },
+    queryFn: () => dashboardApi.getStats(7),
     refetchInterval: 60000, // 优化：减少到60秒刷新
     retry: 1,
-    enabled: false, // 禁用这个查询
     staleTime: 30000, // 30秒内数据视为新鲜
   });
 
@@ -142,7 +136,7 @@ const Dashboard: React.FC = () => {
       const response = await fetch('/api/system/enhanced-status');
       return response.json();
     },
-    refetchInterval: 15000,
+    // 客户端状态变化由实时推送更新，不再轮询
     retry: 1,
   });
 
@@ -165,188 +159,119 @@ const Dashboard: React.FC = () => {
     retry: 1,
   });
 
-  // 近七日统计查询
-  const { data: weeklyStats, isLoading: weeklyStatsLoading, error: logsError } = useQuery({
-    queryKey: ['weekly-stats'],
-    queryFn: async () => {
-      const days: string[] = [];
-      const statsData: any[] = [];
-      
-      // 获取过去7天的数据
-      for (let i = 6; i >= 0; i--) {
-        const date = dayjs().subtract(i, 'day').format('YYYY-MM-DD');
-        days.push(date);
-        
-        try {
-          const dayLogs = await logsApi.list({
-            page: 1,
-            limit: 1000,
-            start_date: date,
-            end_date: date,
-          });
-          
-          statsData.push({
-            date,
-            day: dayjs(date).format('MM-DD'),
-            weekday: dayjs(date).format('ddd'),
-            total: dayLogs.items.length,
-            success: dayLogs.items.filter(log => log.status === 'success').length,
-            failed: dayLogs.items.filter(log => log.status === 'failed').length,
-          });
-        } catch (error) {
-          console.error(`获取 ${date} 数据失败:`, error);
-          statsData.push({
-            date,
-            day: dayjs(date).format('MM-DD'),
-            weekday: dayjs(date).format('ddd'),
-            total: 0,
-            success: 0,
-            failed: 0,
-          });
-        }
+  // 近七日统计：由统计接口的分天、分规则数据生成图表数据
+  const weeklyStats = useMemo(() => {
+    if (!stats) return undefined;
+
+    const dayStats = stats.daily.map(dayData => ({
+      date: dayData.date,
+      day: dayjs(dayData.date).format('MM-DD'),
+      weekday: dayjs(dayData.date).format('ddd'),
+      total: dayData.total,
+      success: dayData.success,
+      failed: dayData.failed,
+    }));
+    const rulesWithData = stats.rules.filter(rule => rule.week_messages > 0);
+
+    // 生成图表数据 - 只显示有数据的规则（过滤掉0值）
+    const chartData = dayStats.flatMap((dayData, index) => {
+      if (rulesWithData.length === 0) {
+        // 如果没有真实数据，生成固定的示例数据（避免随机数导致的不一致）
+        const sampleData = [
+          { type: '示例规则A', baseCount: 8 },
+          { type: '示例规则B', baseCount: 5 },
+          { type: '示例规则C', baseCount: 3 },
+        ];
+
+        return sampleData.map(sample => ({
+          day: String(dayData.day),
+          count: sample.baseCount + Math.floor(Math.sin(dayData.day.charCodeAt(0)) * 5), // 基于日期的固定变化
+          type: sample.type,
+          weekday: String(dayData.weekday),
+        }));
       }
-      
-      // 等待所有异步操作完成，然后生成图表数据
-      const enhancedStats = await Promise.all(statsData.map(async dayData => {
-        try {
-          const dayLogs = await logsApi.list({
-            page: 1,
-            limit: 1000,
-            start_date: dayData.date,
-            end_date: dayData.date,
-          });
-          
-          const dayRuleStats: { [rule: string]: number } = {};
-          console.log(`${dayData.date} 获取到 ${dayLogs.items.length} 条日志`);
-          dayLogs.items.forEach(log => {
-            const ruleName = log.rule_name || '未知规则';
-            console.log(`日志规则: ${ruleName}`);
-            dayRuleStats[ruleName] = (dayRuleStats[ruleName] || 0) + 1;
-          });
-          console.log(`${dayData.date} 规则统计:`, dayRuleStats);
-          
-          return {
-            ...dayData,
-            ruleStats: dayRuleStats,
-          };
-        } catch (error) {
-          console.error(`处理 ${dayData.date} 规则统计失败:`, error);
-          return {
-            ...dayData,
-            ruleStats: {},
-          };
-        }
-      }));
-      
-      // 收集所有规则名称
-      const allRulesSet = new Set<string>();
-      enhancedStats.forEach(dayData => {
-        Object.keys(dayData.ruleStats).forEach(rule => allRulesSet.add(rule));
-      });
-      
-      const allRulesList = Array.from(allRulesSet);
-      
-      // 生成图表数据 - 确保数据格式正确
-      const chartData = enhancedStats.flatMap(dayData => {
-        if (allRulesList.length === 0) {
-          // 如果没有真实数据，生成固定的示例数据（避免随机数导致的不一致）
-          const sampleData = [
-            { type: '示例规则A', baseCount: 8 },
-            { type: '示例规则B', baseCount: 5 },
-            { type: '示例规则C', baseCount: 3 },
-          ];
-          
-          return sampleData.map(sample => ({
-            day: String(dayData.day),
-            count: sample.baseCount + Math.floor(Math.sin(dayData.day.charCodeAt(0)) * 5), // 基于日期的固定变化
-            type: sample.type,
-            weekday: String(dayData.weekday),
-          }));
-        }
-        
-        // 有真实数据时，只显示有数据的规则（过滤掉0值）
-        return allRulesList
-          .map(ruleName => ({
-            day: String(dayData.day),
-            count: Number(dayData.ruleStats[ruleName] || 0),
-            type: String(ruleName),
-            weekday: String(dayData.weekday),
-          }))
-          .filter(item => item.count > 0); // 只显示有数据的项目
-      });
-      
-      console.log('所有规则:', allRulesList);
-      console.log('图表数据:', chartData);
-      
-      return {
-        days,
-        stats: enhancedStats,
-        chartData,
-        allRules: allRulesList,
-      };
-    },
-    refetchInterval: 300000, // 5分钟刷新
-    retry: 1,
-  });
 
-  // 获取今日统计数据
-  const { data: todayStats, isLoading: todayStatsLoading } = useQuery({
-    queryKey: ['today-stats'],
-    queryFn: async () => {
+      return rulesWithData
+        .map(rule => ({
+          day: String(dayData.day),
+          count: Number(rule.daily[index] || 0),
+          type: String(rule.rule_name || `规则 #${rule.rule_id}`),
+          weekday: String(dayData.weekday),
+        }))
+        .filter(item => item.count > 0);
+    });
+
+    return {
+      days: dayStats.map(dayData => dayData.date),
+      stats: dayStats,
+      chartData,
+      allRules: rulesWithData.map(rule => rule.rule_name),
+    };
+  }, [stats]);
+  const weeklyStatsLoading = statsLoading;
+
+  // 今日最近日志（只取列表展示需要的20条）
+  const { data: recentLogs, isLoading: recentLogsLoading, error: logsError } = useQuery({
+    queryKey: ['today-recent-logs'],
+    queryFn: () => {
       const today = dayjs().format('YYYY-MM-DD');
-      const allLogs = await logsApi.list({
+      return logsApi.list({
         page: 1,
-        limit: 1000, // 获取更多数据用于统计
+        limit: 20,
         start_date: today,
         end_date: today,
       });
-      
-      // 按规则统计消息数量
-      const ruleStats = allLogs.items.reduce((acc: Record<string, number>, log: any) => {
-        const ruleName = log.rule_name || '未知规则';
-        acc[ruleName] = (acc[ruleName] || 0) + 1;
-        return acc;
-      }, {});
-
-      // 转换为图表数据格式
-      const chartData = Object.entries(ruleStats).map(([rule, count]) => ({
-        rule: String(rule),
-        count: Number(count),
-        type: '消息数量',
-      }));
-
-      console.log('🔍 调试 chartData (20250917-111351):', chartData);
-      chartData.forEach((item, index) => {
-        console.log(`🔍 数据项 ${index}:`, {
-          rule: item.rule,
-          count: item.count,
-          ruleType: typeof item.rule,
-          countType: typeof item.count
-        });
-      });
-
-      // console.log('🔍 今日统计原始数据:', { ruleStats, chartData });
-
-      return {
-        totalMessages: allLogs.items.length,
-        ruleStats,
-        chartData,
-        logs: allLogs.items.slice(0, 20), // 最近20条用于显示
-      };
     },
-    refetchInterval: 60000, // 60秒刷新
     retry: 1,
   });
 
+  // 新日志由实时推送插入最近日志列表
+  useEffect(() => subscribeServerEvent('logs', (data: LogsEvent) => {
+    if (!data.items?.length) return;
+    queryClient.setQueryData(['today-recent-logs'], (old: any) => {
+      if (!old) return old;
+      const known = new Set(old.items.map((log: any) => log.id));
+      const fresh = data.items.filter(log => !known.has(log.id)).reverse();
+      return { ...old, items: [...fresh, ...old.items].slice(0, 20), total: old.total + fresh.length };
+    });
+  }), [queryClient]);
+
+  // 今日统计：各规则的今日消息数
+  const todayStats = useMemo(() => {
+    if (!stats) return undefined;
+
+    const ruleStats = stats.rules.reduce((acc: Record<string, number>, rule) => {
+      if (rule.today_messages > 0) {
+        acc[rule.rule_name || `规则 #${rule.rule_id}`] = rule.today_messages;
+      }
+      return acc;
+    }, {});
+
+    // 转换为图表数据格式
+    const chartData = Object.entries(ruleStats).map(([rule, count]) => ({
+      rule: String(rule),
+      count: Number(count),
+      type: '消息数量',
+    }));
+
+    return {
+      totalMessages: stats.today_messages,
+      ruleStats,
+      chartData,
+      logs: recentLogs?.items || [],
+    };
+  }, [stats, recentLogs]);
+  const todayStatsLoading = statsLoading || recentLogsLoading;
+
   // 性能优化：使用useMemo缓存计算结果
   const computedStats = useMemo(() => {
-    const activeRules = (stats as any)?.active_rules || (rules as any[]).filter((rule: any) => rule.is_active).length;
-    const totalRules = (stats as any)?.total_rules || (rules as any[]).length;
-    const successRate = (stats as any)?.success_rate || 0;
-    const todayMessages = todayStats?.totalMessages || 0;
+    const activeRules = stats?.active_rules ?? (rules as any[]).filter((rule: any) => rule.is_active).length;
+    const totalRules = stats?.total_rules ?? (rules as any[]).length;
+    const successRate = stats?.success_rate || 0;
+    const todayMessages = stats?.today_messages || 0;
     
     return { activeRules, totalRules, successRate, todayMessages };
-  }, [stats, rules, todayStats]);
+  }, [stats, rules]);
   
   const { activeRules, totalRules, successRate, todayMessages } = computedStats;
 
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useMemo, useRef } from 'react';
 import { 
   Card, 
   Table, 
@@ -11,6 +11,7 @@ import {
   Typography,
   Tooltip,
   Upload,
+  Dropdown,
   message
 } from 'antd';
 import { 
@@ -25,7 +26,8 @@ import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { logsApi } from '../../services/logs';
 import { chatsApi } from '../../services/chats';
 import { useCustomModal } from '../../hooks/useCustomModal';
-import type { MessageLog, LogFilters } from '../../types/rule';
+import { subscribeServerEvent } from '../../hooks/useServerEvents';
+import type { MessageLog, LogFilters, LogExportOptions, LogExportFormat } from '../../types/rule';
 import dayjs from 'dayjs';
 
 const { Title } = Typography;
@@ -41,13 +43,54 @@ const LogsPage: React.FC = () => {
     limit: 20,
   });
   const [selectedRowKeys, setSelectedRowKeys] = useState<React.Key[]>([]);
+  // 键集分页游标：页码 -> 读取该页使用的游标（顺序翻页时不再使用 OFFSET）
+  const [pageCursors, setPageCursors] = useState<Record<number, string>>({});
+
+  // 筛选条件（不含页码）变化时游标失效
+  const filterKey = useMemo(() => JSON.stringify({ ...filters, page: undefined }), [filters]);
+  useEffect(() => {
+    setPageCursors({});
+  }, [filterKey]);
+
+  const currentCursor = filters.page && filters.page > 1 ? pageCursors[filters.page] : undefined;
 
   // 获取日志列表
   const { data: logsData, isLoading, refetch } = useQuery({
-    queryKey: ['logs', filters],
-    queryFn: () => logsApi.list(filters),
+    queryKey: ['logs', filters, currentCursor],
+    queryFn: () => logsApi.list({ ...filters, cursor: currentCursor }),
   });
 
+  // 实时日志：停留在第一页时，新日志推送触发刷新（最多每3秒一次），翻页后不打扰
+  const isFirstPage = (filters.page || 1) === 1;
+  const liveRefreshTimer = useRef<ReturnType<typeof setTimeout> | undefined>(undefined);
+  useEffect(() => {
+    if (!isFirstPage) return;
+    const scheduleRefresh = () => {
+      if (liveRefreshTimer.current) return;
+      liveRefreshTimer.current = setTimeout(() => {
+        liveRefreshTimer.current = undefined;
+        queryClient.invalidateQueries({ queryKey: ['logs'] });
+      }, 3000);
+    };
+    const unsubscribeLogs = subscribeServerEvent('logs', scheduleRefresh);
+    const unsubscribeSnapshot = subscribeServerEvent('snapshot', scheduleRefresh);
+    return () => {
+      unsubscribeLogs();
+      unsubscribeSnapshot();
+      clearTimeout(liveRefreshTimer.current);
+      liveRefreshTimer.current = undefined;
+    };
+  }, [isFirstPage, queryClient]);
+
+  // 记录下一页的游标
+  useEffect(() => {
+    const nextCursor = logsData?.nextCursor;
+    const page = filters.page || 1;
+    if (nextCursor) {
+      setPageCursors(prev => (prev[page + 1] === nextCursor ? prev : { ...prev, [page + 1]: nextCursor }));
+    }
+  }, [logsData, filters.page]);
+
   // 获取聊天列表
   const { data: chatsData } = useQuery({
     queryKey: ['chats'],
@@ -82,13 +125,13 @@ const LogsPage: React.FC = () => {
 
   // 导出日志
   const exportMutation = useMutation({
-    mutationFn: logsApi.export,
-    onSuccess: (blob: Blob) => {
+    mutationFn: (options: LogExportOptions) => logsApi.export({ ...filters, ...options }),
+    onSuccess: (blob: Blob, options: LogExportOptions) => {
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.style.display = 'none';
       a.href = url;
-      a.download = `logs_${dayjs().format('YYYY-MM-DD_HH-mm-ss')}.json`;
+      a.download = `logs_${dayjs().format('YYYY-MM-DD_HH-mm-ss')}.${options.format || 'json'}${options.gzip ? '.gz' : ''}`;
       document.body.appendChild(a);
       a.click();
       window.URL.revokeObjectURL(url);
@@ -102,8 +145,15 @@ const LogsPage: React.FC = () => {
 
   // 导入日志
   const importMutation = useMutation({
-    mutationFn: logsApi.import,
+    mutationFn: (formData: FormData) => logsApi.import(formData, job => {
+      message.loading({
+        key: 'log-import',
+        content: `正在导入 ${job.progress}%：已处理 ${job.processed} 条（成功 ${job.imported}，跳过 ${job.skipped}）`,
+        duration: 0,
+      });
+    }),
     onSuccess: (response: any) => {
+      message.destroy('log-import');
       if (response.success) {
         message.success(response.message);
         queryClient.invalidateQueries({ queryKey: ['logs'] });
@@ -113,6 +163,7 @@ const LogsPage: React.FC = () => {
       }
     },
     onError: (error: any) => {
+      message.destroy('log-import');
       message.error(`导入失败: ${error.message || '网络错误'}`);
     },
   });
@@ -373,7 +424,7 @@ const LogsPage: React.FC = () => {
           </Space>
           <Space>
             <Upload
-              accept=".json"
+              accept=".json,.ndjson,.gz"
               showUploadList={false}
               beforeUpload={(file) => {
                 const formData = new FormData();
@@ -389,13 +440,29 @@ const LogsPage: React.FC = () => {
                 导入
               </Button>
             </Upload>
-            <Button
-              icon={<ExportOutlined />}
-              onClick={() => exportMutation.mutate(filters)}
-              loading={exportMutation.isPending}
+            <Dropdown
+              menu={{
+                items: [
+                  { key: 'json', label: 'JSON（可重新导入）' },
+                  { key: 'ndjson', label: 'NDJSON' },
+                  { key: 'csv', label: 'CSV' },
+                  { key: 'ndjson.gz', label: 'NDJSON（gzip 压缩）' },
+                  { key: 'csv.gz', label: 'CSV（gzip 压缩）' },
+                ],
+                onClick: ({ key }) => {
+                  const [format, compression] = key.split('.');
+                  exportMutation.mutate({ format: format as LogExportFormat, gzip: compression === 'gz' });
+                },
+              }}
+              trigger={['click']}
             >
-              导出
-            </Button>
+              <Button
+                icon={<ExportOutlined />}
+                loading={exportMutation.isPending}
+              >
+                导出
+              </Button>
+            </Dropdown>
           </Space>
         </div>
 
@@ -431,7 +498,7 @@ const LogsPage: React.FC = () => {
             total: logsData?.total || 0,
             showSizeChanger: true,
             showQuickJumper: true,
-            showTotal: (total) => `共 ${total} 条日志`,
+            showTotal: (total) => logsData?.totalApproximate ? `超过 ${total} 条日志` : `共 ${total} 条日志`,
             onChange: (page, pageSize) => {
               setFilters(prev => ({ ...prev, page, limit: pageSize }));
             },
@@ -105,7 +105,7 @@ const ReplacementsPage: React.FC = () => {
     form.resetFields();
     form.setFieldsValue({
       priority: 1,
-      is_regex: false,
+      is_regex: true,
       is_active: true,
     });
     setIsModalVisible(true);
@@ -113,6 +113,7 @@ const RuleForm: React.FC = () => {
         forward_delay: ruleData.forward_delay,
         max_message_length: ruleData.max_message_length,
         enable_link_preview: ruleData.enable_link_preview,
+        delivery_mode: ruleData.delivery_mode || 'resend',
         enable_text: ruleData.enable_text,
         enable_photo: ruleData.enable_photo,
         enable_video: ruleData.enable_video,
@@ -197,6 +198,7 @@ const RuleForm: React.FC = () => {
         forward_delay: values.forward_delay || 0,
         max_message_length: values.max_message_length || 4096,
         enable_link_preview: values.enable_link_preview !== false,
+        delivery_mode: values.delivery_mode || 'resend',
         
         // 时间过滤
         time_filter_type: values.time_filter_type || 'after_start',
@@ -269,6 +271,7 @@ const RuleForm: React.FC = () => {
           enable_animation: true,
           enable_webpage: true,
           enable_link_preview: true,
+          delivery_mode: 'resend',
           max_message_length: 4096,
           forward_delay: 0,
           client_id: 'main_user',
@@ -507,6 +510,29 @@ const RuleForm: React.FC = () => {
           </Col>
         </Row>
 
+        <Row gutter={24}>
+          <Col span={8}>
+            <Form.Item
+              label="投递方式"
+              name="delivery_mode"
+              tooltip={
+                <div style={{ maxWidth: '400px' }}>
+                  <div><strong>重新发送</strong>：下载后重新发送，支持正则替换和长度截断</div>
+                  <div><strong>无来源复制</strong>：原生复制消息，不显示来源，速度快且不占用流量</div>
+                  <div><strong>原生转发</strong>：保留"转发自"标记的原生转发</div>
+                  <div style={{ marginTop: '8px' }}>消息内容需要改写时自动改为重新发送；短时间内发往同一目标的消息会合并为一次请求</div>
+                </div>
+              }
+            >
+              <Select>
+                <Option value="resend">重新发送</Option>
+                <Option value="copy">无来源复制</Option>
+                <Option value="forward">原生转发</Option>
+              </Select>
+            </Form.Item>
+          </Col>
+        </Row>
+
         <Form.Item
           noStyle
           shouldUpdate={(prevValues, currentValues) =>
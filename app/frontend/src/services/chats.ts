@@ -5,10 +5,20 @@ export interface ChatGroups {
   [key: string]: Chat[];
 }
 
+export interface ChatQueryParams {
+  search?: string;
+  chat_type?: 'user' | 'group' | 'channel';
+  client_id?: string;
+  page?: number;
+  limit?: number;
+}
+
 export interface RefreshChatsResponse {
   success: boolean;
   message: string;
   updated_count: number;
+  clients?: Record<string, number>;
+  errors?: Record<string, string>;
 }
 
 export const chatsApi = {
@@ -18,9 +28,19 @@ export const chatsApi = {
     return response;
   },
 
-  // 刷新聊天列表
-  refreshChats: async (): Promise<RefreshChatsResponse> => {
-    const response: any = await api.post('/api/refresh-chats');
+  // 服务端筛选、搜索、分页查询聊天列表（不传 limit 返回全部）
+  queryChats: async (params: ChatQueryParams): Promise<ChatsResponse> => {
+    const response: any = await api.get('/api/chats', { params });
+    return response;
+  },
+
+  // 从 Telegram 重新加载聊天列表（可只刷新指定客户端）
+  refreshChats: async (clientId?: string): Promise<RefreshChatsResponse> => {
+    const response: any = await api.post('/api/refresh-chats', null, {
+      params: clientId ? { client_id: clientId } : undefined,
+      // 会话很多的账号完整加载需要较长时间
+      timeout: 120000,
+    });
     return response;
   },
 
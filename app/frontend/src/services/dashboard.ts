@@ -1,11 +1,41 @@
 import { api } from './api';
 
+export interface StatsFigures {
+  total: number;
+  success: number;
+  failed: number;
+  success_rate: number;
+  avg_processing_time: number;
+  max_processing_time: number;
+}
+
+export interface RuleStats {
+  rule_id: number;
+  rule_name: string;
+  is_active: boolean;
+  today_messages: number;
+  today_success: number;
+  today_failed: number;
+  week_messages: number;
+  week_success: number;
+  success_rate: number;
+  avg_processing_time: number;
+  max_processing_time: number;
+  daily: number[];  // 与 DashboardStats.daily 按日期一一对应
+}
+
 export interface DashboardStats {
   total_rules: number;
   active_rules: number;
   today_messages: number;
   success_rate: number;
   success_messages: number;
+  failed_messages: number;
+  avg_processing_time: number;
+  max_processing_time: number;
+  hourly: (StatsFigures & { hour: string })[];
+  daily: (StatsFigures & { date: string })[];
+  rules: RuleStats[];
 }
 
 export interface RecentRule {
@@ -50,9 +80,9 @@ export interface TelegramStatus {
 }
 
 export const dashboardApi = {
-  // 获取统计数据
-  getStats: async (): Promise<DashboardStats> => {
-    const response: any = await api.get('/api/stats');
+  // 获取统计数据（来自后端预聚合的转发统计）
+  getStats: async (days = 7): Promise<DashboardStats> => {
+    const response: any = await api.get('/api/stats', { days });
     return response;
   },
 
@@ -1,5 +1,5 @@
 import { api } from './api';
-import type { MessageLog, LogFilters } from '../types/rule';
+import type { MessageLog, LogFilters, LogExportOptions, LogImportJob } from '../types/rule';
 import type { PaginatedResponse } from '../types/api';
 
 // 消息日志API
@@ -15,6 +15,7 @@ export const logsApi = {
       if (filters?.end_date) params.set('end_date', filters.end_date);
       if (filters?.rule_id) params.set('rule_id', filters.rule_id.toString());
       if (filters?.status) params.set('status', filters.status);
+      if (filters?.cursor) params.set('cursor', filters.cursor);
       
       const response: any = await api.get(`/api/logs?${params.toString()}`);
       const data = response;
@@ -25,6 +26,8 @@ export const logsApi = {
         page: data.page || 1,
         pageSize: data.limit || 10,
         totalPages: data.pages || 0,
+        nextCursor: data.next_cursor || null,
+        totalApproximate: data.total_approximate || false,
       };
     } catch (error) {
       console.error('获取日志列表失败:', error);
@@ -56,8 +59,8 @@ export const logsApi = {
     return api.post<void>('/api/logs/clear', filters);
   },
 
-  // 导出日志
-  export: async (filters?: LogFilters): Promise<Blob> => {
+  // 导出日志（服务端流式输出）
+  export: async (filters?: LogFilters & LogExportOptions): Promise<Blob> => {
     try {
       const response = await fetch('/api/logs/export', {
         method: 'POST',
@@ -78,9 +81,25 @@ export const logsApi = {
     }
   },
 
-  // 导入日志
-  import: async (formData: FormData): Promise<any> => {
-    return api.post('/api/logs/import', formData);
+  // 导入日志（后台导入，轮询进度直到完成）
+  import: async (formData: FormData, onProgress?: (job: LogImportJob) => void): Promise<any> => {
+    const started: any = await api.post('/api/logs/import?background=true', formData);
+    if (!started.success || !started.import_id) {
+      return started;
+    }
+
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const response: any = await api.get(`/api/logs/import/${started.import_id}`);
+      const job: LogImportJob = response.job;
+      if (!job) {
+        return response;
+      }
+      onProgress?.(job);
+      if (job.status !== 'running') {
+        return { success: job.status === 'completed', message: job.message, ...job };
+      }
+    }
   },
 
   // 获取日志统计
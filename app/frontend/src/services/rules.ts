@@ -7,6 +7,7 @@ import type {
   CreateKeywordDto,
   ReplaceRule,
   CreateReplaceRuleDto,
+  PendingDelivery,
 } from '../types/rule';
 // import type { PaginatedResponse } from '../types/api';
 
@@ -180,3 +181,22 @@ export const replaceRulesApi = {
     return api.patch<void>(`/api/replacements/${id}`, { is_active: enabled });
   },
 };
+
+// 延迟投递API（forward_delay 尚未到期的消息）
+export const deliveriesApi = {
+  // 获取待投递列表
+  list: async (): Promise<PendingDelivery[]> => {
+    try {
+      const response: any = await api.get('/api/deliveries');
+      return response.deliveries || [];
+    } catch (error) {
+      console.error('获取待投递列表失败:', error);
+      return [];
+    }
+  },
+
+  // 取消待投递
+  cancel: async (id: number): Promise<void> => {
+    return api.delete<void>(`/api/deliveries/${id}`);
+  },
+};
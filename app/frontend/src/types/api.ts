@@ -13,6 +13,8 @@ export interface PaginatedResponse<T> {
   page: number;
   pageSize: number;
   totalPages: number;
+  nextCursor?: string | null;      // 键集分页：下一页游标
+  totalApproximate?: boolean;      // total 为近似值（超过计数上限）
 }
 
 // 聊天类型
@@ -44,6 +46,7 @@ export interface ClientInfo {
   client_type: 'user' | 'bot';
   chat_count: number;
   display_name: string;
+  loaded?: boolean;
 }
 
 export interface ChatsResponse {
@@ -52,6 +55,8 @@ export interface ChatsResponse {
   clients_info: ClientInfo[];
   total_chats: number;
   connected_clients: number;
+  page?: number;
+  limit?: number | null;
   last_updated?: string;
 }
 
@@ -1,5 +1,8 @@
 // 转发规则相关类型定义
 
+// 投递方式：重新发送 / 无来源复制 / 原生转发
+export type DeliveryMode = 'resend' | 'copy' | 'forward';
+
 export interface ForwardRule {
   id: number;
   name: string;
@@ -33,6 +36,7 @@ export interface ForwardRule {
   forward_delay: number;
   max_message_length: number;
   enable_link_preview: boolean;
+  delivery_mode: DeliveryMode;
   
   // 时间过滤设置
   time_filter_type: 'after_start' | 'all_messages' | 'today_only' | 'from_time' | 'time_range';
@@ -69,6 +73,21 @@ export interface ReplaceRule {
   created_at: string;
 }
 
+// 待投递记录（延迟转发尚未到期）
+export interface PendingDelivery {
+  id: number;
+  client_id: string;
+  rule_id: number;
+  rule_name?: string;
+  source_chat_id: string;
+  target_chat_id?: string;
+  message_ids: number[];
+  kind: 'message' | 'album';
+  created_at: string;
+  due_at: string;
+  remaining_seconds: number;
+}
+
 // 表单数据类型
 export interface CreateRuleDto {
   name: string;
@@ -102,6 +121,7 @@ export interface CreateRuleDto {
   forward_delay?: number;
   max_message_length?: number;
   enable_link_preview?: boolean;
+  delivery_mode?: DeliveryMode;
   
   // 时间过滤设置
   time_filter_type?: 'always' | 'after_start' | 'time_range' | 'from_time' | 'today_only' | 'business_hours' | 'non_business_hours';
@@ -167,6 +187,33 @@ export interface LogFilters {
   page?: number;
   limit?: number;
   pageSize?: number;
+  cursor?: string;
+}
+
+// 日志导出选项
+export type LogExportFormat = 'json' | 'ndjson' | 'csv';
+
+export interface LogExportOptions {
+  format?: LogExportFormat;
+  gzip?: boolean;
+}
+
+// 日志导入任务进度
+export interface LogImportJob {
+  id: number;
+  filename: string;
+  format: 'json' | 'ndjson' | null;
+  status: 'running' | 'completed' | 'failed';
+  message: string;
+  total_bytes: number;
+  bytes_read: number;
+  progress: number;
+  processed: number;
+  imported: number;
+  skipped: number;
+  errors: number;
+  elapsed_seconds: number;
+  rows_per_second: number;
 }
 
 // 客户端相关类型
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+客户端运行方式基准测试（CLIENT_LOOP_MODE=thread / shared）
+
+分别以两种方式启动 N 个客户端，测量每个账号增加的内存（RSS、Python 堆）、客户端线程数，
+以及从主事件循环调用客户端（TelegramClientManager.call）的延迟。
+
+不连接 Telegram：用不联网的 TelethonClient 对象代替登录过程，其余启动、调用路径与实际运行一致。
+每种方式在独立子进程中运行，互不影响内存统计。
+
+用法:
+    python benchmark_client_loops.py                  # 默认 20 个客户端
+    python benchmark_client_loops.py --clients 50 --calls 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+# 添加 app/backend 到路径
+sys.path.append('app/backend')
+
+CONCURRENT_BATCH = 50
+
+
+def rss_bytes() -> int:
+    """当前进程常驻内存（Linux 读取 /proc，其他平台用峰值近似）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run_mode(mode: str, clients: int, calls: int) -> dict:
+    """在当前进程中以指定方式启动客户端并测量"""
+    os.environ['CLIENT_LOOP_MODE'] = mode
+    from loguru import logger
+    logger.remove()
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from telethon import TelegramClient
+    from telethon.sessions import MemorySession
+    from config import Config
+    from telegram_client_manager import TelegramClientManager
+
+    async def offline_run_client(self):
+        """代替 _run_client：创建客户端对象后保持运行，直到基准测试结束"""
+        self._call_semaphore = asyncio.Semaphore(max(1, Config.CLIENT_CALL_CONCURRENCY))
+        self.startup_timeline = {"started_at": None, "phases": {}}
+        phase_start = time.perf_counter()
+        self.client = TelegramClient(MemorySession(), 1, '0' * 32)
+        self._record_phase("session_load", phase_start)
+        self._bench_stop = asyncio.Event()
+        self.connected = True
+        self.running = True
+        # 通知 start() 启动完成（线程模式下 start() 等待该信号）
+        self._finish_startup()
+        try:
+            await self._bench_stop.wait()
+        finally:
+            self.running = False
+            self.connected = False
+
+    TelegramClientManager._run_client = offline_run_client
+
+    async def noop():
+        return None
+
+    # 预热导入和事件循环，避免计入第一个客户端
+    warm = TelegramClientManager("warmup")
+    await asyncio.sleep(0)
+    del warm
+
+    tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0]
+    rss_before = rss_bytes()
+
+    managers = [TelegramClientManager(f"bench_{i}") for i in range(clients)]
+    start_time = time.perf_counter()
+    for manager in managers:
+        # 线程模式下 start() 会同步等待，放到线程池中执行，与实际调用方式一致
+        await asyncio.to_thread(manager.start) if mode == 'thread' else manager.start()
+    while not all(manager.running for manager in managers):
+        await asyncio.sleep(0.01)
+    startup = time.perf_counter() - start_time
+
+    rss_after = rss_bytes()
+    heap_after = tracemalloc.get_traced_memory()[0]
+    client_threads = sum(1 for thread in threading.enumerate() if thread.name.startswith('TelegramClient-'))
+    tracemalloc.stop()
+
+    # 顺序调用延迟
+    sequential = []
+    for index in range(calls):
+        manager = managers[index % clients]
+        call_start = time.perf_counter()
+        await manager.call(noop())
+        sequential.append((time.perf_counter() - call_start) * 1e6)
+
+    # 并发调用：每批 CONCURRENT_BATCH 个调用同时发出，记录整批完成时间
+    concurrent = []
+    for batch in range(max(1, calls // CONCURRENT_BATCH)):
+        batch_start = time.perf_counter()
+        await asyncio.gather(*(managers[(batch + i) % clients].call(noop()) for i in range(CONCURRENT_BATCH)))
+        concurrent.append((time.perf_counter() - batch_start) * 1e6)
+
+    for manager in managers:
+        if manager.loop_mode == 'shared':
+            manager._bench_stop.set()
+        else:
+            manager.loop.call_soon_threadsafe(manager._bench_stop.set)
+    for manager in managers:
+        if manager.thread:
+            await asyncio.to_thread(manager.thread.join, 5)
+
+    return {
+        "mode": mode,
+        "clients": clients,
+        "startup_s": startup,
+        "rss_per_client_kb": (rss_after - rss_before) / clients / 1024,
+        "heap_per_client_kb": (heap_after - heap_before) / clients / 1024,
+        "client_threads": client_threads,
+        "call_p50_us": statistics.median(sequential),
+        "call_p99_us": percentile(sequential, 0.99),
+        "batch_p50_us": statistics.median(concurrent),
+    }
+
+
+def print_results(results):
+    print(f"\n{'指标':<28}" + "".join(f"{result['mode']:>14}" for result in results))
+    rows = [
+        ("每账号常驻内存 (KB)", "rss_per_client_kb", "{:.0f}"),
+        ("每账号 Python 堆 (KB)", "heap_per_client_kb", "{:.0f}"),
+        ("客户端线程数", "client_threads", "{:d}"),
+        ("启动耗时 (s)", "startup_s", "{:.2f}"),
+        ("单次调用 p50 (µs)", "call_p50_us", "{:.1f}"),
+        ("单次调用 p99 (µs)", "call_p99_us", "{:.1f}"),
+        (f"{CONCURRENT_BATCH} 个并发调用 p50 (µs)", "batch_p50_us", "{:.1f}"),
+    ]
+    for label, key, fmt in rows:
+        print(f"{label:<28}" + "".join(f"{fmt.format(result[key]):>14}" for result in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="客户端运行方式基准测试")
+    parser.add_argument("--clients", type=int, default=20, help="客户端数量")
+    parser.add_argument("--calls", type=int, default=2000, help="调用次数")
+    parser.add_argument("--modes", nargs="+", default=["thread", "shared"], choices=["thread", "shared"])
+    parser.add_argument("--run-mode", choices=["thread", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        result = asyncio.run(run_mode(args.run_mode, args.clients, args.calls))
+        print(json.dumps(result))
+        return
+
+    results = []
+    for mode in args.modes:
+        print(f"⏱️  测试 {mode} 模式（{args.clients} 个客户端）...")
+        output = subprocess.run(
+            [sys.executable, __file__, "--run-mode", mode, "--clients", str(args.clients), "--calls", str(args.calls)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+日志/规则查询索引基准测试
+
+生成指定行数的 message_logs 测试数据，分别在无索引和应用 INDEX_MIGRATIONS 之后
+测量常用查询的耗时（取多次执行的中位数），并打印查询计划。
+
+用法:
+    python benchmark_log_indexes.py                      # 默认 1M 行
+    python benchmark_log_indexes.py --rows 1000000 10000000
+    python benchmark_log_indexes.py --rows 10000000 --db /tmp/bench.db
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 添加 app/backend 到路径
+sys.path.append('app/backend')
+
+RULE_COUNT = 200
+STATUSES = ['success'] * 95 + ['failed'] * 4 + ['filtered']
+
+
+def create_schema(db_path: str):
+    """用模型定义建表，然后删除版本化索引，得到"迁移前"的数据库"""
+    from sqlalchemy import create_engine
+    from models import Base
+    from database import INDEX_MIGRATIONS
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    for _version, _description, statements in INDEX_MIGRATIONS:
+        for statement in statements:
+            name = statement.split("IF NOT EXISTS ")[1].split()[0]
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    conn.close()
+
+
+def populate(db_path: str, rows: int):
+    """生成测试数据：RULE_COUNT 个规则，日志时间覆盖最近 180 天"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    conn.executemany(
+        "INSERT INTO forward_rules (id, name, source_chat_id, target_chat_id, is_active) VALUES (?, ?, ?, ?, ?)",
+        [(i, f"rule {i}", str(-1000000000000 - i % 50), str(-1002000000000 - i), i % 5 != 0)
+         for i in range(1, RULE_COUNT + 1)]
+    )
+
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=180)
+    step = 180 * 86400 / rows
+    next_message_id = {}
+    chunk = []
+    for i in range(rows):
+        rule_id = rng.randint(1, RULE_COUNT)
+        message_id = next_message_id.get(rule_id, 0) + 1
+        next_message_id[rule_id] = message_id
+        created_at = (start + timedelta(seconds=i * step)).strftime('%Y-%m-%d %H:%M:%S.%f')
+        chunk.append((rule_id, f"rule {rule_id}", str(-1000000000000 - rule_id % 50), message_id,
+                      str(-1002000000000 - rule_id), "text", rng.choice(STATUSES), created_at))
+        if len(chunk) >= 50000:
+            _insert_logs(conn, chunk)
+            chunk = []
+    if chunk:
+        _insert_logs(conn, chunk)
+    conn.commit()
+    conn.close()
+    return next_message_id
+
+
+def _insert_logs(conn, chunk):
+    conn.executemany(
+        "INSERT INTO message_logs (rule_id, rule_name, source_chat_id, source_message_id, target_chat_id, "
+        "original_text, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        chunk
+    )
+
+
+def build_queries(last_message_ids):
+    """与应用中实际查询形状一致的查询集合"""
+    rule_id = 7
+    chat_id = str(-1000000000000 - rule_id % 50)
+    message_id = max(1, last_message_ids.get(rule_id, 1) // 2)
+    day_start = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d 00:00:00')
+    day_end = (datetime.now() - timedelta(days=29)).strftime('%Y-%m-%d 00:00:00')
+    return [
+        ("日志列表首页", "SELECT * FROM message_logs ORDER BY created_at DESC LIMIT 20", ()),
+        ("按状态筛选首页", "SELECT * FROM message_logs WHERE status = ? ORDER BY created_at DESC LIMIT 20",
+         ('failed',)),
+        ("按状态计数", "SELECT COUNT(*) FROM message_logs WHERE status = ?", ('failed',)),
+        ("时间范围首页", "SELECT * FROM message_logs WHERE created_at >= ? AND created_at < ? "
+                         "ORDER BY created_at DESC LIMIT 20", (day_start, day_end)),
+        ("时间范围计数", "SELECT COUNT(*) FROM message_logs WHERE created_at >= ? AND created_at < ?",
+         (day_start, day_end)),
+        ("规则最近日志", "SELECT * FROM message_logs WHERE rule_id = ? ORDER BY created_at DESC LIMIT 100",
+         (rule_id,)),
+        ("按规则计数", "SELECT rule_id, COUNT(id) FROM message_logs GROUP BY rule_id", ()),
+        ("源消息查重", "SELECT id FROM message_logs WHERE rule_id = ? AND source_chat_id = ? "
+                       "AND source_message_id = ? LIMIT 1", (rule_id, chat_id, message_id)),
+        ("按源聊天查规则", "SELECT id FROM forward_rules WHERE source_chat_id = ? AND is_active = 1",
+         (chat_id,)),
+    ]
+
+
+def measure(conn, sql, params, repeat: int) -> float:
+    """返回多次执行耗时的中位数（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def query_plan(conn, sql, params) -> str:
+    return "; ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall())
+
+
+def apply_indexes(db_path: str) -> float:
+    """执行与启动迁移相同的索引语句和 ANALYZE，返回耗时（秒）"""
+    from database import INDEX_MIGRATIONS
+
+    conn = sqlite3.connect(db_path)
+    started = time.perf_counter()
+    for _version, _description, statements in INDEX_MIGRATIONS:
+        for statement in statements:
+            conn.execute(statement)
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return time.perf_counter() - started
+
+
+def run(rows: int, db_path: str, repeat: int):
+    print(f"\n=== {rows:,} 行日志 ===")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    started = time.perf_counter()
+    create_schema(db_path)
+    last_message_ids = populate(db_path, rows)
+    print(f"📦 生成测试数据耗时 {time.perf_counter() - started:.1f}s")
+
+    queries = build_queries(last_message_ids)
+
+    conn = sqlite3.connect(db_path)
+    before = [measure(conn, sql, params, repeat) for _name, sql, params in queries]
+    conn.close()
+
+    print(f"🔧 创建索引 + ANALYZE 耗时 {apply_indexes(db_path):.1f}s")
+
+    conn = sqlite3.connect(db_path)
+    after = [measure(conn, sql, params, repeat) for _name, sql, params in queries]
+
+    print(f"{'查询':<14}{'索引前(ms)':>12}{'索引后(ms)':>12}{'加速':>10}")
+    for (name, sql, params), b, a in zip(queries, before, after):
+        speedup = f"{b / a:.0f}x" if a > 0 else "-"
+        print(f"{name:<14}{b:>12.2f}{a:>12.2f}{speedup:>10}")
+        print(f"    计划: {query_plan(conn, sql, params)}")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志/规则查询索引基准测试")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000], help="测试数据行数，可指定多个")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "bench_log_indexes.db"),
+                        help="测试数据库路径（会被覆盖）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询执行次数")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.db, args.repeat)
+
+
+if __name__ == "__main__":
+    main()